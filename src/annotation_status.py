@@ -0,0 +1,97 @@
+# Author: Tao Wen
+# Description:
+#   classify the annotation of every item in the background,
+#   reading only the annotation text, never the images.
+
+from enum import Enum
+from tkinter import Misc
+from typing import Callable
+from typing_ import DataLoaderProtocol
+import threading
+
+
+class AnnotationStatus(Enum):
+    ANNOTATED = "annotated"
+    UNANNOTATED = "unannotated"
+    EMPTY = "empty"
+    MALFORMED = "malformed"
+
+
+def classify_annotation(text: str | None) -> AnnotationStatus:
+    """Check a YOLO annotation: every non-blank line must be `class_id x y w h`,
+    with a non-negative integer `class_id`."""
+    if text is None:
+        return AnnotationStatus.UNANNOTATED
+    if not text.strip():
+        return AnnotationStatus.EMPTY
+    for line in text.splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        if len(parts) != 5:
+            return AnnotationStatus.MALFORMED
+        try:
+            if int(parts[0]) < 0:
+                return AnnotationStatus.MALFORMED
+            for value in parts[1:]:
+                float(value)
+        except ValueError:
+            return AnnotationStatus.MALFORMED
+    return AnnotationStatus.ANNOTATED
+
+
+StatusCallback = Callable[[int, list[AnnotationStatus]], None]
+
+
+class AnnotationStatusScanner:
+    """Scan annotation status of all items in a background thread.
+
+    Results are delivered in chunks as `callback(start_index, statuses)`
+    on the Tk thread through `master.after()`.
+    """
+
+    def __init__(
+        self,
+        master: Misc,
+        data_loader: DataLoaderProtocol,
+        callback: StatusCallback,
+        chunk_size: int = 2000,
+    ):
+        self._master = master
+        self._data_loader = data_loader
+        self._callback = callback
+        self._chunk_size = chunk_size
+        self._cancelled = threading.Event()
+        self._delivered = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def finished(self) -> bool:
+        """Whether every status has been delivered."""
+        return self._delivered >= len(self._data_loader)
+
+    def _run(self):
+        read_annotation = self._data_loader.read_annotation
+        total = len(self._data_loader)
+        for start in range(0, total, self._chunk_size):
+            statuses = [
+                classify_annotation(read_annotation(index))
+                for index in range(start, min(start + self._chunk_size, total))
+            ]
+            if self._cancelled.is_set():
+                return
+            try:
+                self._master.after(0, self._deliver, start, statuses)
+            except RuntimeError:
+                return  # main loop is gone
+
+    def _deliver(self, start: int, statuses: list[AnnotationStatus]):
+        if not self._cancelled.is_set():
+            self._delivered = start + len(statuses)
+            self._callback(start, statuses)
@@ -4,27 +4,104 @@
 #   i.e., put everything together.
 
 from tkinter import (
-    Tk, Frame, Button, Listbox, Scrollbar, 
+    Tk, Frame, Button, Scrollbar, Entry, Spinbox,
     filedialog, Label, PanedWindow
 )
-from PIL import ImageTk, Image  # Add Image import
+from typing import TYPE_CHECKING
 from typing_ import DataLoaderProtocol
-from data_loader import FolderLoader, ZipLoader
-from visualizer import AnnotatedImageVisualizer
+from profiler import PROFILER, stage
+from prefetch import PrefetchScheduler
+from playback import PlaybackScheduler
+from frame_cache import FrameCache
+from annotation_status import AnnotationStatus, AnnotationStatusScanner
+from ui import DuplicatesPanel, StatsPanel, ThumbnailGrid, VirtualList, ZoomView
+import os
+import re
+import threading
+
+# Modules pulling in NumPy, PIL or multiprocessing are imported where they are
+# first used, mostly in background threads, so the window shows up right away.
+if TYPE_CHECKING:
+    from batch import BatchProgress
+    from data_loader import FolderLoader
+    from folder_watch import FolderChanges, FolderWatcher
+    from search_index import SearchIndex
+    from thumbnail_cache import ThumbnailCache, ThumbnailLoader
+    from visualizer import AnnotatedImageVisualizer
 
 
 class ImageBrowser:
+    STATUS_COLORS = {
+        AnnotationStatus.UNANNOTATED: "red",
+        AnnotationStatus.EMPTY: "orange",
+        AnnotationStatus.MALFORMED: "purple",
+    }
+    RESIZE_SETTLE_MS = 150  # quiet time after the last resize before the full-quality redraw
+    HUD_INTERVAL_MS = 500
+    DEDUP_METHOD = "dhash"
+    DEDUP_MAX_DISTANCE = 4  # bits of the 64-bit hash, 0 finds exact duplicates only
+    ZOOM_MAX_SIDE = 16384  # larger images are zoomed at reduced resolution, see `bound_decoding`
+    WATCH_INTERVAL_MS = 1000  # between the end of a folder poll and the next
+    WATCH_UPDATE_ITEMS = 200  # changed items re-read on the Tk thread, more start a rescan and reindex
+
     def __init__(self, master: Tk):
         self.master = master
         self.master.title("Image Browser")
+        self.master.protocol("WM_DELETE_WINDOW", self.close)
         
         self._create_ui()
         self._bind_events()
 
         self.data_loader: DataLoaderProtocol = None
-        self.visualizer = AnnotatedImageVisualizer()
+        self.base_loader: DataLoaderProtocol = None  # the opened dataset, unfiltered
+        self.dataset_path: str | None = None
+        self.search_index: "SearchIndex | None" = None
+        self.visualizer: "AnnotatedImageVisualizer | None" = None  # created with the first dataset
+        self.open_cancel: threading.Event | None = None  # set to stop opening or listing a dataset
         self.current_image_index = 0
         self.last_label_size = None  # Track label size
+        self.resize_timer: str | None = None  # pending full-quality redraw after resizing
+        self.preview_pending = False
+        self.scroll_direction = 1  # +1 for next, -1 for previous
+        self.frame_cache = FrameCache()
+        self.status_scanner: AnnotationStatusScanner | None = None
+        self.batch_cancel: threading.Event | None = None  # set while a batch is running
+        self.prefetcher: PrefetchScheduler | None = None
+        self.player: PlaybackScheduler | None = None
+        self._start_render_pools()
+        self.thumbnail_cache: "ThumbnailCache | None" = None
+        self.thumbnail_loader: "ThumbnailLoader | None" = None
+        self.view_mode = "single"  # "single", "grid" or "zoom"
+        self.zoom_generation = 0  # bumped to drop pyramids of items no longer shown
+        self.list_generation = 0  # bumped when folder changes move items to other indices
+        self.watched_loader: "FolderLoader | None" = None  # the folder being watched for changes
+        self.watch_timer: str | None = None  # the next poll of the watched folder
+        self.listed_loader: "FolderLoader | None" = None  # the folder whose walk has finished
+
+    def _start_render_pools(self):
+        """Create the prefetch and playback thread pools, shutting down the previous ones."""
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown()
+            self.player.shutdown()
+        self.prefetcher = PrefetchScheduler(self.master, self._render_frame)
+        self.player = PlaybackScheduler(self.master, self._render_frame, self._on_playback_frame)
+        self.player.on_end = self._on_playback_end
+
+    def close(self):
+        """Stop all background work and close the window."""
+        self.stop_watch()
+        self.cancel_open()
+        if self.batch_cancel is not None:
+            self.batch_cancel.set()
+        if self.status_scanner is not None:
+            self.status_scanner.cancel()
+        if self.thumbnail_loader is not None:
+            self.thumbnail_loader.shutdown()
+        self.prefetcher.shutdown()
+        self.player.shutdown()
+        self.zoom_view.clear()  # removes the pyramid's temporary files
+        self.frame_cache.clear()
+        self.master.destroy()
 
     def _create_ui(self):
         # Control buttons frame
@@ -40,6 +117,48 @@ class ImageBrowser:
         self.batch_process_button = Button(self.button_frame, text="Batch Process")
         self.batch_process_button.pack(side="left")
 
+        self.stats_button = Button(self.button_frame, text="Statistics")
+        self.stats_button.pack(side="left")
+
+        self.duplicates_button = Button(self.button_frame, text="Duplicates")
+        self.duplicates_button.pack(side="left")
+
+        self.watch_button = Button(self.button_frame, text="Watch")
+        self.watch_button.pack(side="left")
+
+        self.backend_button = Button(self.button_frame, text="Backend")
+        self.backend_button.pack(side="left")
+
+        self.profile_button = Button(self.button_frame, text="Profile")
+        self.profile_button.pack(side="left")
+
+        # shown while profiling
+        self.trace_button = Button(self.button_frame, text="Save Trace")
+
+        self.grid_button = Button(self.button_frame, text="Grid View")
+        self.grid_button.pack(side="left")
+
+        self.zoom_button = Button(self.button_frame, text="Zoom")
+        self.zoom_button.pack(side="left")
+
+        self.play_button = Button(self.button_frame, text="Play")
+        self.play_button.pack(side="left")
+        self.fps_spinbox = Spinbox(self.button_frame, from_=1, to=120, width=4)
+        self.fps_spinbox.delete(0, "end")
+        self.fps_spinbox.insert(0, "30")
+        self.fps_spinbox.pack(side="left")
+        Label(self.button_frame, text="fps").pack(side="left")
+
+        Label(self.button_frame, text="Filter:").pack(side="left", padx=(10, 0))
+        self.filter_entry = Entry(self.button_frame, width=30)
+        self.filter_entry.pack(side="left")
+
+        self.status_label = Label(self.button_frame, anchor="e")
+        self.status_label.pack(side="right", padx=5)
+
+        # shown while a dataset is being opened
+        self.cancel_open_button = Button(self.button_frame, text="Cancel")
+
         # Paned window to allow resizing
         paned = PanedWindow(self.master, orient="horizontal")
         paned.pack(fill="both", expand=True)
@@ -49,7 +168,7 @@ class ImageBrowser:
         self.list_frame.pack_propagate(False)  # Prevent frame from shrinking
         paned.add(self.list_frame)
 
-        self.image_list = Listbox(self.list_frame)
+        self.image_list = VirtualList(self.list_frame)
         self.image_list.pack(side="left", fill="both", expand=True)
 
         self.scrollbar = Scrollbar(self.list_frame)
@@ -90,10 +209,26 @@ class ImageBrowser:
         )
         self.image_label.pack(side="top", fill="both", expand=True)
 
+        # Rolling stage timings, shown at the bottom while profiling
+        self.hud_label = Label(image_frame, anchor="w", font=("TkFixedFont", 9))
+
+        # Thumbnail grid, shown instead of the image label in grid view
+        self.thumbnail_frame = Frame(image_frame)
+        self.thumbnail_grid = ThumbnailGrid(self.thumbnail_frame)
+        self.thumbnail_grid.pack(side="left", fill="both", expand=True)
+        self.thumbnail_scrollbar = Scrollbar(self.thumbnail_frame)
+        self.thumbnail_scrollbar.pack(side="right", fill="y")
+
+        # Zoom and pan over a tile pyramid, shown instead of the image label in zoom view
+        self.zoom_view = ZoomView(image_frame)
+
     def _bind_events(self):
         # Configure scrollbar and listbox to work together
-        self.image_list.config(yscrollcommand=self.scrollbar.set)
+        self.image_list.yscrollcommand = self.scrollbar.set
         self.scrollbar.config(command=self.image_list.yview)
+        self.thumbnail_grid.yscrollcommand = self.thumbnail_scrollbar.set
+        self.thumbnail_scrollbar.config(command=self.thumbnail_grid.yview)
+        self.thumbnail_grid.on_select = self._on_select_thumbnail
 
         # Bind list click event
         self.image_list.bind('<<ListboxSelect>>', self._on_select_listbox)
@@ -101,14 +236,30 @@ class ImageBrowser:
         # Bind control button click events
         self.load_button.config(command=self.load_folder)
         self.load_zip_button.config(command=self.load_zipfile)
+        self.batch_process_button.config(command=self.batch_process)
+        self.stats_button.config(command=self.show_statistics)
+        self.duplicates_button.config(command=self.find_duplicates)
+        self.watch_button.config(command=self.toggle_watch)
+        self.backend_button.config(command=self.benchmark_backends)
+        self.cancel_open_button.config(command=self.cancel_open)
+        self.profile_button.config(command=self.toggle_profiling)
+        self.trace_button.config(command=self.save_trace)
+        self.master.bind('<F2>', lambda e: self.toggle_profiling())
+        self.grid_button.config(command=self.toggle_grid_view)
+        self.zoom_button.config(command=self.toggle_zoom_view)
+        self.play_button.config(command=self.toggle_playback)
+        self.filter_entry.bind('<Return>', self.apply_filter)
         self.prev_button.config(command=self.show_previous_image)
         self.next_button.config(command=self.show_next_image)
 
-        # Bind keyboard events
-        self.master.bind('<Left>', lambda e: self.show_previous_image())
-        self.master.bind('<Up>', lambda e: self.show_previous_image())
-        self.master.bind('<Right>', lambda e: self.show_next_image())
-        self.master.bind('<Down>', lambda e: self.show_next_image())
+        # Bind keyboard events, except while typing a filter
+        def navigate(action):
+            return lambda e: None if e.widget is self.filter_entry else action()
+        self.master.bind('<Left>', navigate(self.show_previous_image))
+        self.master.bind('<Up>', navigate(self.show_previous_image))
+        self.master.bind('<Right>', navigate(self.show_next_image))
+        self.master.bind('<Down>', navigate(self.show_next_image))
+        self.master.bind('<space>', lambda e: None if e.widget is self.fps_spinbox else navigate(self.toggle_playback)(e))
         
         # Bind mouse wheel events
         self.master.bind('<MouseWheel>', self._on_mousewheel)  # Windows
@@ -121,6 +272,7 @@ class ImageBrowser:
         self.image_list.bind('<Button-5>', lambda e: self._on_list_scroll(e, -120))  # Linux
     
         self.image_label.bind('<Configure>', self._on_label_resize)
+        self.image_label.bind('<Double-Button-1>', lambda e: self.toggle_zoom_view())
 
         # Bind enter listbox event to show the full name of the item
         self.image_list.bind('<Enter>', lambda e: self.image_list.bind('<Motion>', self._on_listbox_motion))
@@ -131,7 +283,36 @@ class ImageBrowser:
         if self.last_label_size != (event.width, event.height):
             self.last_label_size = (event.width, event.height)
             if hasattr(self, 'current_original_image'):
-                self.show_image()
+                # scale the shown frame while resizing, render properly once it settles
+                if not self.preview_pending:
+                    self.preview_pending = True
+                    self.master.after_idle(self._show_resize_preview)
+                if self.resize_timer is not None:
+                    self.master.after_cancel(self.resize_timer)
+                self.resize_timer = self.master.after(self.RESIZE_SETTLE_MS, self._on_resize_settled)
+
+    def _show_resize_preview(self):
+        """Fast preview of the shown frame at the new label size, i.e., a cheap resample."""
+        from PIL import Image, ImageTk
+        from data_loader import fit_size
+
+        self.preview_pending = False
+        size = self._label_size()
+        if size is None or self.resize_timer is None:
+            return
+        image = self.current_original_image
+        preview = image.resize(fit_size(image.size, size), Image.Resampling.BILINEAR)
+        photo = ImageTk.PhotoImage(preview)
+        self.image_label.config(image=photo)
+        self.image_label.image = photo
+
+    def _on_resize_settled(self):
+        self.resize_timer = None
+        self.prefetcher.reset()
+        if self.player.playing:
+            self.start_playback()  # render the coming frames at the new size
+        else:
+            self.show_image()
 
     def _on_mousewheel(self, event):
         # Check if mouse is over list frame
@@ -156,6 +337,7 @@ class ImageBrowser:
         
         # Select first or last visible item based on scroll direction,
         # If view range is not changed, increment/decrement current index
+        self.scroll_direction = -1 if scroll_delta > 0 else 1
         if scroll_delta > 0:  # Scrolling up
             if first_visible <= 0:
                 self.current_image_index = max(0, self.current_image_index - 1)
@@ -178,6 +360,8 @@ class ImageBrowser:
     def _on_select_listbox(self, event):
         selection = self.image_list.curselection()
         if selection:
+            self.stop_playback()
+            self.scroll_direction = 1 if selection[0] >= self.current_image_index else -1
             self.current_image_index = selection[0]
             self.show_image()
 
@@ -189,52 +373,795 @@ class ImageBrowser:
     def load_folder(self):
         folder_path = filedialog.askdirectory()
         if folder_path:
-            self.data_loader = FolderLoader(folder_path)
-            self.update_image_list()
-            self.current_image_index = 0  # Reset to first image
-            self.show_image()  # Show the first image
-    
+            self.open_dataset(folder_path)
+
     def load_zipfile(self):
         zip_path = filedialog.askopenfilename(filetypes=[("ZIP files", "*.zip")])
         if zip_path:
-            self.data_loader = ZipLoader(zip_path)
+            self.open_dataset(zip_path)
+
+    def open_dataset(self, path: str):
+        """Open a folder or zip archive in a background thread, with progress and a Cancel button.
+
+        Indexing a large archive and walking a large folder never block the
+        Tk thread; the current dataset stays browsable until the new one is ready.
+        """
+        self.cancel_open()
+        cancel = self.open_cancel = threading.Event()
+        self.cancel_open_button.pack(side="right")
+        self.status_label.config(text=f"Opening {os.path.basename(path)}...")
+
+        def progress(done: int, total: int):
+            self.master.after(0, lambda: self.status_label.config(text=f"Indexing: {done}/{total}"))
+
+        def run():
+            from data_loader import open_data_loader
+            from zip_index import Cancelled
+
+            try:
+                # a plain folder is listed by `_start_folder_scan`
+                data_loader = open_data_loader(path, progress, cancel, eager=False)
+                message = None
+            except Cancelled:
+                return  # reported by `cancel_open`
+            except Exception as error:
+                data_loader, message = None, f"Open failed: {error}"
+            self.master.after(0, self._on_dataset_opened, path, data_loader, cancel, message)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def cancel_open(self):
+        if self.open_cancel is not None:
+            self.open_cancel.set()
+            self.open_cancel = None
+            self.status_label.config(text="Open cancelled")
+        self.cancel_open_button.pack_forget()
+
+    def _on_dataset_opened(self, path: str, data_loader, cancel: threading.Event, message: str | None):
+        if cancel is not self.open_cancel:
+            return  # cancelled, or superseded by another dataset
+        if data_loader is None:
+            self.open_cancel = None
+            self.cancel_open_button.pack_forget()
+            self.status_label.config(text=message)
+            return
+        self.stop_playback()
+        self.stop_watch()
+        from data_loader import FolderLoader
+        from image_backend import get_backend
+        from visualizer import AnnotatedImageVisualizer
+
+        if self.visualizer is None:
+            self.visualizer = AnnotatedImageVisualizer()
+            self.backend_button.config(text=f"Backend: {get_backend().name}")
+        self.base_loader = self.data_loader = data_loader
+        self.dataset_path = path
+        self.search_index = None
+        self._start_render_pools()  # renders of the previous dataset still running do not hold up this one
+        self.frame_cache.clear()
+        self.current_image_index = 0  # Reset to first image
+        if isinstance(data_loader, FolderLoader):
+            self.image_list.set_items(data_loader.data_item_name_list)
+            if self.view_mode == "grid":
+                self.update_thumbnail_grid()
+            self._start_folder_scan(data_loader, cancel)
+        else:
+            self.open_cancel = None
+            self.cancel_open_button.pack_forget()
+            self.status_label.config(text=f"Opened {len(data_loader)} items")
             self.update_image_list()
-            self.current_image_index = 0  # Reset to first image
+            self._start_search_index(data_loader)
             self.show_image()  # Show the first image
+
+    def _start_folder_scan(self, data_loader: "FolderLoader", cancel: threading.Event):
+        """Walk the folder in a background thread, listing items as they are found.
+
+        Cancelling stops the walk and keeps the items listed so far.
+        """
+        def scan():
+            try:
+                for batch_index, _ in enumerate(data_loader.scan()):
+                    if data_loader is not self.base_loader:
+                        return  # another dataset was opened
+                    self.master.after(0, self._on_folder_batch, data_loader, batch_index == 0)
+                    if cancel.is_set():
+                        break
+                self.master.after(0, self._on_folder_scanned, data_loader, cancel)
+            except RuntimeError:
+                pass  # main loop is gone
+
+        threading.Thread(target=scan, daemon=True).start()
+
+    def _on_folder_batch(self, data_loader: "FolderLoader", is_first_batch: bool):
+        if data_loader is not self.base_loader:
+            return
+        self.status_label.config(text=f"Listing: {len(data_loader)} images")
+        # rows are read from the loader's list, which the walk has already extended
+        self.image_list.refresh()
+        if self.view_mode == "grid":
+            self.thumbnail_grid.refresh()
+        if is_first_batch:
+            self.show_image()  # Show the first image while the walk goes on
+
+    def _on_folder_scanned(self, data_loader: "FolderLoader", cancel: threading.Event):
+        if data_loader is self.base_loader:
+            if cancel is self.open_cancel:
+                self.cancel_open_button.pack_forget()
+                self.open_cancel = None
+            stopped = " (listing stopped)" if cancel.is_set() else ""
+            self.status_label.config(text=f"Opened {len(data_loader)} items{stopped}")
+            self.listed_loader = data_loader
+            self.start_status_scan()
+            self._start_search_index(data_loader)
     
-    def update_image_list(self):
-        self.image_list.delete(0, 'end')
-        for idx, name in enumerate(self.data_loader.data_item_name_list):
-            self.image_list.insert('end', name)
-            # NOTE: this could be slow 
-            # Check if the item has annotation
-            # item = self.data_loader.get_item_by_index(idx)
-            # if getattr(item, "annotation", None) is None:
-            #     self.image_list.itemconfig(idx, fg='red')
-    
-    def _resize_to_fit(self, image, width, height):
-        # Calculate scaling factor to fit in label while maintaining aspect ratio
-        img_width, img_height = image.size
-        scale = min(width/img_width, height/img_height)
-        new_size = (int(img_width * scale), int(img_height * scale))
-        return image.resize(new_size, Image.Resampling.LANCZOS)
+    def toggle_watch(self):
+        if self.watched_loader is not None:
+            self.stop_watch()
+        else:
+            self.start_watch()
 
-    def show_image(self):
+    def start_watch(self):
+        """Poll the opened folder, merging images and annotations written meanwhile into the list.
+
+        The snapshot and every poll run in a background thread; the next poll
+        is scheduled once the changes of the last one have been merged.
+        """
+        data_loader = self.base_loader
+        if data_loader is None or data_loader is not self.listed_loader:
+            self.status_label.config(text="Watch: open a folder and wait until it is listed")
+            return
+        self.watched_loader = data_loader
+        self.watch_button.config(text="Stop Watch")
+        self.status_label.config(text="Watch: taking a snapshot...")
+
+        def run():
+            watcher, changes = data_loader.watch()
+            try:
+                self.master.after(0, self._on_folder_changes, data_loader, watcher, changes)
+            except RuntimeError:
+                pass  # main loop is gone
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def stop_watch(self):
+        if self.watch_timer is not None:
+            self.master.after_cancel(self.watch_timer)
+            self.watch_timer = None
+        self.watched_loader = None
+        self.watch_button.config(text="Watch")
+
+    def _poll_folder(self, data_loader: "FolderLoader", watcher: "FolderWatcher"):
+        self.watch_timer = None
+
+        def run():
+            changes = watcher.poll()
+            try:
+                self.master.after(0, self._on_folder_changes, data_loader, watcher, changes)
+            except RuntimeError:
+                pass  # main loop is gone
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _on_folder_changes(self, data_loader: "FolderLoader", watcher: "FolderWatcher", changes: "FolderChanges"):
+        if data_loader is not self.watched_loader:
+            return  # stopped, or another dataset was opened
+        try:
+            if changes:
+                self._merge_folder_changes(data_loader, changes)
+            elif self.status_label.cget("text") == "Watch: taking a snapshot...":
+                self.status_label.config(text="Watch: no changes")
+        except Exception as error:
+            self._reset_after_failed_merge(data_loader)
+            self.status_label.config(text=f"Watch: merging changes failed, list reloaded: {error}")
+        finally:
+            # keep watching, e.g., a file still being written is complete by the next poll
+            self.watch_timer = self.master.after(
+                self.WATCH_INTERVAL_MS, self._poll_folder, data_loader, watcher
+            )
+
+    def _reset_after_failed_merge(self, data_loader: "FolderLoader"):
+        """Drop everything kept by item index, as a merge that failed halfway may have moved the items."""
+        self.list_generation += 1
+        self.prefetcher.reset()
+        self.frame_cache.clear()
+        self.data_loader = data_loader  # a filtered view may hold stale indices
+        self.current_image_index = min(self.current_image_index, max(0, len(data_loader) - 1))
+        self.image_list.set_items(data_loader.data_item_name_list)
+        self.start_status_scan()
+        self.search_index = None
+        self._start_search_index(data_loader)
+        if self.view_mode == "grid":
+            self.update_thumbnail_grid()
+        elif len(data_loader):
+            self.show_image()
+
+    def _merge_folder_changes(self, data_loader: "FolderLoader", changes: "FolderChanges"):
+        """Merge changes into the list, following the shown items to their new indices.
+
+        Only cache entries, row colors and thumbnails of the changed items are
+        dropped; the current item and the scroll positions stay in place.
+        """
+        import numpy as np
+        from annotation_status import classify_annotation
+        from search_index import LoaderView
+
+        status_pending = self.status_scanner is not None and not self.status_scanner.finished
+        mapping, touched = data_loader.apply_changes(changes)
+        self.list_generation += 1  # frames rendered meanwhile are not cached under stale indices
+        self.prefetcher.reset()
+        self.frame_cache.remap(mapping)
+        self.frame_cache.invalidate(touched)
+        if changes.added or changes.removed:
+            self.stop_playback()
+
+        # rows of the browsed loader, i.e., of a filtered view if any
+        if isinstance(self.data_loader, LoaderView):
+            indices = mapping[np.asarray(self.data_loader.indices, dtype=np.int64)]
+            kept = indices >= 0
+            row_mapping = np.full(len(indices), -1, dtype=np.int64)
+            row_mapping[kept] = np.arange(np.count_nonzero(kept))
+            self.data_loader = LoaderView(data_loader, indices[kept])
+            row_touched = np.flatnonzero(np.isin(indices[kept], touched)).tolist()
+        else:
+            row_mapping, row_touched = mapping, touched
+
+        # the current item, or the next one left if it was removed
+        old_index = self.current_image_index
+        if old_index < len(row_mapping) and row_mapping[old_index] >= 0:
+            index = int(row_mapping[old_index])
+            current_changed = index in row_touched
+        else:
+            later = row_mapping[old_index:]
+            later = later[later >= 0]
+            index = int(later[0]) if len(later) else max(0, len(self.data_loader) - 1)
+            current_changed = True
+        self.current_image_index = index
+
+        # annotations of the changed items, read once for the row colors and the search index
+        annotations = {}
+        if len(touched) <= self.WATCH_UPDATE_ITEMS:
+            for base_index in touched:
+                try:
+                    annotations[base_index] = data_loader.read_annotation(base_index)
+                except (OSError, ValueError):
+                    # removed again or still being written, e.g., cut in a UTF-8 sequence; found by the next poll
+                    annotations[base_index] = None
+
+        self.image_list.set_items(self.data_loader.data_item_name_list, row_mapping)
+        if status_pending or len(annotations) < len(touched):
+            self.start_status_scan()
+        else:
+            for row in row_touched:
+                status = classify_annotation(annotations[self._cache_key(self.data_loader, row)[1]])
+                self.image_list.itemconfig(row, fg=self.STATUS_COLORS.get(status))
+        if len(self.data_loader):
+            self.image_list.selection_set(index)
+        if self.view_mode == "grid":
+            self.update_thumbnail_grid(row_mapping, row_touched)
+        elif current_changed:
+            if len(self.data_loader):
+                self.show_image()
+            else:
+                self.image_label.config(image="")
+                self.image_label.image = None
+                self.filename_label.config(text="")
+
+        # while the index is being built, it is rebuilt when done, see `_on_search_index`
+        if self.search_index is not None and len(annotations) == len(touched):
+            self.search_index.remap(mapping, len(data_loader))
+            for base_index, annotation in annotations.items():
+                self.search_index.update_item(base_index, annotation)
+        elif self.search_index is not None:
+            self.search_index = None
+            self._start_search_index(data_loader)
+        self.status_label.config(
+            text=f"Watch: +{len(changes.added)} -{len(changes.removed)} ~{len(changes.modified)}"
+            f", {len(data_loader)} items"
+        )
+
+    def batch_process(self):
+        """Export all items with their annotations, or cancel the running export."""
+        if self.batch_cancel is not None:
+            self.batch_cancel.set()
+            return
         if not self.data_loader:
             return
+        output_path = filedialog.asksaveasfilename(
+            title="Export to a folder, or a .zip file",
+            filetypes=[("ZIP files", "*.zip"), ("Folder", "*")],
+        )
+        if not output_path:
+            return
 
-        item = self.data_loader.get_item_by_index(self.current_image_index)
-        image = self.visualizer.to_drawn_image(item)
-        self.current_original_image = image  # Store original for resizing
-        
-        # Get current label size
+        self.batch_cancel = threading.Event()
+        self.batch_process_button.config(text="Cancel Batch")
+        data_loader, cancel = self.data_loader, self.batch_cancel
+
+        def run():
+            from batch import export_dataset
+
+            try:
+                result = export_dataset(
+                    data_loader,
+                    output_path,
+                    progress=lambda p: self.master.after(0, self._on_batch_progress, p),
+                    cancel=cancel,
+                )
+                message = f"Exported {result.exported} images to {output_path}"
+                if result.failed:
+                    message += f", {len(result.failed)} failed: {result.failed_names()}"
+            except Exception as error:
+                message = f"Batch failed: {error}"
+            self.master.after(0, self._on_batch_done, message)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _on_batch_progress(self, progress: "BatchProgress"):
+        self.status_label.config(text=f"Batch: {progress}")
+
+    def _on_batch_done(self, message: str):
+        self.batch_cancel = None
+        self.batch_process_button.config(text="Batch Process")
+        self.status_label.config(text=message)
+
+    def show_statistics(self):
+        """Compute annotation statistics in the background and show them in a panel."""
+        if not self.data_loader:
+            return
+        data_loader, dataset_path = self.base_loader, self.dataset_path
+        self.stats_button.config(state="disabled")
+        self.status_label.config(text="Statistics: scanning annotations...")
+
+        def run():
+            from dataset_stats import DatasetStatistics, stats_cache_path
+
+            try:
+                stats = DatasetStatistics.compute(
+                    data_loader,
+                    cache_path=stats_cache_path(dataset_path),
+                    progress=lambda done, total: self.master.after(
+                        0, lambda: self.status_label.config(text=f"Statistics: {done}/{total}")
+                    ),
+                )
+                result = stats.to_dict()
+                message = f"Statistics: {stats.rescanned} of {stats.n_items} items rescanned"
+            except Exception as error:
+                result, message = None, f"Statistics failed: {error}"
+            self.master.after(0, self._on_statistics_done, result, message)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _on_statistics_done(self, stats: dict | None, message: str):
+        self.stats_button.config(state="normal")
+        self.status_label.config(text=message)
+        if stats is not None:
+            StatsPanel(self.master, stats, title=f"Statistics - {self.dataset_path}")
+
+    def find_duplicates(self):
+        """Hash the images in the background and list groups of (near-)duplicates."""
+        if not self.data_loader:
+            return
+        data_loader, dataset_path = self.base_loader, self.dataset_path
+        self.duplicates_button.config(state="disabled")
+        self.status_label.config(text="Duplicates: hashing images...")
+
+        def run():
+            from dedup import compute_hashes, find_duplicates, hash_cache_path
+
+            try:
+                hashes, valid = compute_hashes(
+                    data_loader,
+                    self.DEDUP_METHOD,
+                    cache_path=hash_cache_path(dataset_path, self.DEDUP_METHOD),
+                    progress=lambda done, total: self.master.after(
+                        0, lambda: self.status_label.config(text=f"Duplicates: {done}/{total}")
+                    ),
+                )
+                groups = find_duplicates(hashes, valid, self.DEDUP_MAX_DISTANCE)
+                message = f"Duplicates: {len(groups)} groups"
+            except Exception as error:
+                groups, message = None, f"Duplicates failed: {error}"
+            self.master.after(0, self._on_duplicates_done, data_loader, groups, message)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _on_duplicates_done(self, data_loader: DataLoaderProtocol, groups: list | None, message: str):
+        self.duplicates_button.config(state="normal")
+        self.status_label.config(text=message)
+        if groups is not None and data_loader is self.base_loader:
+            DuplicatesPanel(
+                self.master, groups, data_loader.data_item_name_list,
+                lambda indices: self.show_items(data_loader, indices),
+                title=f"Duplicates - {self.dataset_path}",
+            )
+
+    def show_items(self, data_loader: DataLoaderProtocol, indices):
+        """Browse only the items `indices` of the opened dataset, e.g., a group of duplicates."""
+        from search_index import LoaderView
+
+        if data_loader is not self.base_loader:
+            self.status_label.config(text="Another dataset has been opened since")
+            return
+        self.stop_playback()
+        self.data_loader = LoaderView(self.base_loader, indices)
+        self.prefetcher.reset()
+        self.current_image_index = 0
+        self.update_image_list()
+        self.status_label.config(text=f"Showing {len(indices)} of {len(self.base_loader)} items")
+        self.show_image()
+
+    def benchmark_backends(self):
+        """Time PIL and OpenCV on a sample of the open dataset and switch to the faster one."""
+        if not self.data_loader:
+            return
+        data_loader, size = self.data_loader, self._label_size()
+        self.backend_button.config(state="disabled")
+        self.status_label.config(text="Backend: benchmarking...")
+
+        def run():
+            from image_backend import benchmark_backends
+
+            try:
+                timings = benchmark_backends(data_loader, self.visualizer, size)
+                message = None
+            except Exception as error:
+                timings, message = None, f"Backend benchmark failed: {error}"
+            self.master.after(0, self._on_backend_benchmark, timings, message)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _on_backend_benchmark(self, timings: dict[str, float] | None, message: str | None):
+        from image_backend import get_backend, set_backend
+
+        self.backend_button.config(state="normal")
+        if timings is None:
+            self.status_label.config(text=message)
+            return
+        fastest = min(timings, key=timings.get)
+        if fastest != get_backend().name:
+            set_backend(fastest)
+            # decoded items differ between backends, e.g., in reduced size, so decode them again
+            self.frame_cache.originals.clear()
+        self.backend_button.config(text=f"Backend: {fastest}")
+        self.status_label.config(text="Backend: " + ", ".join(
+            f"{name} {seconds * 1000:.1f} ms" for name, seconds in timings.items()
+        ))
+
+    def toggle_profiling(self):
+        """Time the loading and drawing stages, with p50/p95 in a HUD under the image."""
+        PROFILER.enabled = not PROFILER.enabled
+        if PROFILER.enabled:
+            PROFILER.reset()
+            self.profile_button.config(text="Stop Profile")
+            self.trace_button.pack(side="left", after=self.profile_button)
+            self.hud_label.pack(side="bottom", fill="x", before=self.filename_label)
+            self._update_hud()
+        else:
+            self.profile_button.config(text="Profile")
+            self.trace_button.pack_forget()
+            self.hud_label.pack_forget()
+
+    def _update_hud(self):
+        if not PROFILER.enabled:
+            return
+        self.hud_label.config(text=PROFILER.format_summary() or "p50/p95: waiting for frames...")
+        self.master.after(self.HUD_INTERVAL_MS, self._update_hud)
+
+    def save_trace(self):
+        """Export the recorded stages as a Chrome trace, e.g., for chrome://tracing or Perfetto."""
+        path = filedialog.asksaveasfilename(
+            defaultextension=".json", filetypes=[("Trace files", "*.json")]
+        )
+        if path:
+            PROFILER.export_chrome_trace(path)
+            self.status_label.config(text=f"Trace: saved {path}")
+
+    def _start_search_index(self, data_loader: DataLoaderProtocol):
+        """Build the class/box-count/name index in the background for filtering."""
+        dataset_path = self.dataset_path
+        generation = self.list_generation
+
+        def run():
+            from dataset_stats import stats_cache_path
+            from search_index import SearchIndex
+
+            try:
+                search_index = SearchIndex.build(data_loader, cache_path=stats_cache_path(dataset_path))
+            except Exception as error:
+                self.master.after(0, lambda: self.status_label.config(
+                    text=f"Filter: indexing failed: {error}"
+                ))
+                return
+            self.master.after(0, self._on_search_index, data_loader, search_index, generation)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _on_search_index(self, data_loader: DataLoaderProtocol, search_index: "SearchIndex", generation: int):
+        if data_loader is not self.base_loader:
+            return
+        if generation != self.list_generation:
+            self._start_search_index(data_loader)  # the folder changed while indexing
+            return
+        self.search_index = search_index
+
+    def apply_filter(self, event=None):
+        """Show only the items matching the filter, e.g., `class:7 boxes>50`."""
+        if self.base_loader is None:
+            return
+        text = self.filter_entry.get().strip()
+        if not text:
+            data_loader = self.base_loader
+        elif self.search_index is None:
+            self.status_label.config(text="Filter: index is still being built")
+            return
+        else:
+            try:
+                indices = self.search_index.query(text)
+            except (ValueError, re.error) as error:
+                self.status_label.config(text=f"Filter: {error}")
+                return
+            from search_index import LoaderView
+
+            data_loader = LoaderView(self.base_loader, indices)
+
+        self.stop_playback()
+        self.data_loader = data_loader
+        self.prefetcher.reset()  # the frame cache is keyed by dataset index, keep it
+        self.current_image_index = 0
+        self.update_image_list()
+        self.status_label.config(text=f"Filter: {len(data_loader)} of {len(self.base_loader)} items")
+        self.show_image()
+
+    def set_view_mode(self, mode: str):
+        """Show the single image, the thumbnail grid or the zoom view in the right pane."""
+        if mode == self.view_mode:
+            return
+        self.stop_playback()
+        panes = {"single": self.image_label, "grid": self.thumbnail_frame, "zoom": self.zoom_view}
+        panes[self.view_mode].pack_forget()
+        panes[mode].pack(side="top", fill="both", expand=True)
+        if self.view_mode == "zoom":
+            self.zoom_generation += 1
+            self.zoom_view.clear()  # release the pyramid and its temporary files
+        self.view_mode = mode
+        self.grid_button.config(text="Single View" if mode == "grid" else "Grid View")
+        self.zoom_button.config(text="Single View" if mode == "zoom" else "Zoom")
+        if mode == "grid":
+            self.update_thumbnail_grid()
+        else:
+            self.show_image()
+
+    def toggle_grid_view(self):
+        self.set_view_mode("single" if self.view_mode == "grid" else "grid")
+
+    def toggle_zoom_view(self):
+        self.set_view_mode("single" if self.view_mode == "zoom" else "zoom")
+
+    def update_thumbnail_grid(self, mapping=None, touched=()):
+        """Point the grid at the current loader, with a fresh thumbnail loader.
+
+        `mapping` and `touched` keep the tiles of items that moved, see `ThumbnailGrid.set_source`.
+        """
+        if self.thumbnail_loader is not None:
+            self.thumbnail_loader.shutdown()
+            self.thumbnail_loader = None
+        if not self.data_loader:
+            return
+        from thumbnail_cache import ThumbnailCache, ThumbnailLoader
+
+        if self.thumbnail_cache is None:
+            self.thumbnail_cache = ThumbnailCache()
+        self.thumbnail_loader = ThumbnailLoader(
+            self.master, self.data_loader, self.dataset_path, self.thumbnail_cache
+        )
+        self.thumbnail_grid.set_source(
+            self.data_loader.data_item_name_list,
+            self.thumbnail_loader.request,
+            self.thumbnail_loader.cancel_except,
+            mapping,
+            touched,
+        )
+        self.thumbnail_grid.selection_set(self.current_image_index)
+        self.thumbnail_grid.see(self.current_image_index)
+
+    def toggle_playback(self):
+        if self.player.playing:
+            self.stop_playback()
+        else:
+            self.start_playback()
+
+    def start_playback(self):
+        """Play the items from the current one as a sequence at the FPS in the spinbox."""
+        if not self.data_loader or self.current_image_index >= len(self.data_loader) - 1:
+            return
+        try:
+            fps = min(max(float(self.fps_spinbox.get()), 1.0), 120.0)
+        except ValueError:
+            fps = 30.0
+        self.set_view_mode("single")
+        self.prefetcher.reset()  # the player has its own decode-ahead queue
+        self.player.fps = fps
+        self.player.start(self.current_image_index, len(self.data_loader), self._label_size())
+        self.play_button.config(text="Pause")
+
+    def stop_playback(self):
+        if self.player.playing:
+            self.player.stop()
+            self._on_playback_end()
+
+    def _on_playback_end(self):
+        self.play_button.config(text="Play")
+        self.status_label.config(
+            text=f"Played at {self.player.achieved_fps():.1f} fps, {self.player.dropped} dropped"
+        )
+
+    def _on_playback_frame(self, index: int, frame):
+        self.current_image_index = index
+        self._display_frame(index, frame)
+        self.image_list.selection_set(index)
+        self.image_list.see(index)
+        self.status_label.config(
+            text=f"Playing: {self.player.achieved_fps():.1f}/{self.player.fps:g} fps, {self.player.dropped} dropped"
+        )
+
+    def _on_select_thumbnail(self, index: int):
+        self.current_image_index = index
+        self.image_list.selection_set(index)
+        self.image_list.see(index)
+        self.set_view_mode("single")
+
+    def update_image_list(self):
+        self.image_list.set_items(self.data_loader.data_item_name_list)
+        self.start_status_scan()
+        if self.view_mode == "grid":
+            self.update_thumbnail_grid()
+
+    def start_status_scan(self):
+        # Color rows progressively as the background scan reports annotation status
+        if self.status_scanner is not None:
+            self.status_scanner.cancel()
+        self.status_scanner = AnnotationStatusScanner(
+            self.master, self.data_loader, self._on_annotation_status
+        )
+        self.status_scanner.start()
+
+    def _on_annotation_status(self, start: int, statuses: list[AnnotationStatus]):
+        for index, status in enumerate(statuses, start):
+            # annotated rows are reset, e.g., a watched folder got their annotation
+            self.image_list.itemconfig(index, fg=self.STATUS_COLORS.get(status))
+    
+    def _label_size(self) -> tuple[int, int] | None:
         label_width = self.image_label.winfo_width()
         label_height = self.image_label.winfo_height()
-
         # Only resize if we have valid dimensions
         if label_width > 50 and label_height > 50 and label_width * label_height > 5000:
-            image = self._resize_to_fit(image, label_width, label_height)
-            photo = ImageTk.PhotoImage(image)
+            return label_width, label_height
+        return None
+
+    def _cache_key(self, data_loader: DataLoaderProtocol, index: int) -> tuple[DataLoaderProtocol, int]:
+        """The opened dataset and item index, i.e., through a filtered view, caches are keyed by."""
+        if hasattr(data_loader, "base_index"):  # a filtered `LoaderView`
+            return data_loader.base, data_loader.base_index(index)
+        return data_loader, index
+
+    def _load_item(
+        self, base_loader: DataLoaderProtocol, index: int, size: tuple[int, int] | None, generation: int
+    ):
+        from data_loader import is_decoded_for
+
+        item = self.frame_cache.originals.get(index)
+        if item is None or not is_decoded_for(item.image, size):
+            with stage("read"):
+                item = base_loader.get_item_by_index(index, target_size=size)
+            with stage("decode"):
+                item.image.load()  # decode now, so the cached item holds pixels
+            # not stale after opening another dataset, or items moving in a watched folder
+            if base_loader is self.base_loader and generation == self.list_generation:
+                self.frame_cache.originals.put(index, item)
+        return item
+
+    def _render_frame(self, index: int, size: tuple[int, int] | None):
+        """Load, draw and resize an item. Runs in the prefetch worker threads.
+
+        Hits and misses of the rendered frames are counted by `show_image`,
+        i.e., per displayed item; lookups here, for a miss there or a
+        neighbor prefetched, are not counted.
+        """
+        generation = self.list_generation
+        base_loader, base_index = self._cache_key(self.data_loader, index)
+        frame = self.frame_cache.rendered.peek((base_index, size))
+        if frame is not None:
+            return frame
+        with stage("render"):
+            item = self._load_item(base_loader, base_index, size, generation)
+            image = self.visualizer.to_drawn_image(item, size)
+        frame = (item, image)
+        if base_loader is self.base_loader and generation == self.list_generation:
+            self.frame_cache.rendered.put((base_index, size), frame)
+        return frame
+
+    def show_image(self):
+        if not self.data_loader:
+            return
+
+        if self.view_mode == "zoom":
+            self.show_zoomed_image()
+            return
+
+        index = self.current_image_index
+        size = self._label_size()
+        _, base_index = self._cache_key(self.data_loader, index)
+        frame = self.frame_cache.rendered.get((base_index, size))
+        if frame is not None:
+            self._display_frame(index, frame)
+        else:
+            self.prefetcher.request(
+                index, size, lambda frame: self._display_frame(index, frame)
+            )
+        self.prefetcher.schedule(index, size, self.scroll_direction, len(self.data_loader))
+
+    def show_zoomed_image(self):
+        """Build a tile pyramid of the current item at full resolution, off the Tk thread.
+
+        The image bypasses the frame cache and is released once its pixels are
+        in the pyramid's memory-mapped levels. Images larger than `ZOOM_MAX_SIDE`
+        are reduced to fit it, JPEG already while decoding by DCT scaling; other
+        formats are decoded whole first, but only the reduced bitmap is kept.
+        """
+        self.zoom_generation += 1
+        generation = self.zoom_generation
+        index = self.current_image_index
+        base_loader, base_index = self._cache_key(self.data_loader, index)
+        self.filename_label.config(text=f"{self.data_loader.data_item_name_list[index]} (building tiles...)")
+
+        def run():
+            from image_backend import bound_decoding
+            from tile_pyramid import BoxGrid, TilePyramid
+
+            try:
+                with bound_decoding((self.ZOOM_MAX_SIDE, self.ZOOM_MAX_SIDE)):
+                    item = base_loader.get_item_by_index(base_index)
+                pyramid = TilePyramid(item.image)
+                item.image = None
+                pyramid.level(pyramid.n_levels - 1)  # coarse levels for the fit view, off the Tk thread
+                boxes = getattr(item, "box_array", None)
+                box_grid = BoxGrid(boxes) if boxes is not None else None
+                result, message = (item, pyramid, box_grid), None
+            except Exception as error:
+                result, message = None, f"Zoom failed: {error}"
+            self.master.after(0, self._on_pyramid, generation, result, message)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _on_pyramid(self, generation: int, result, message: str | None):
+        if result is None:
+            if generation == self.zoom_generation:
+                self.filename_label.config(text=message, fg="red")
+            return
+        item, pyramid, box_grid = result
+        if generation != self.zoom_generation:
+            pyramid.close()  # user has moved on
+            return
+        self.zoom_view.set_pyramid(pyramid, box_grid, self.visualizer.draw_boxes)
+        width, height = pyramid.size
+        reduced = "" if pyramid.full_size is None else " of {}x{}".format(*pyramid.full_size)
+        self.filename_label.config(
+            text=f"{item.name} ({width}x{height}{reduced})",
+            fg="red" if getattr(item, "annotation", None) is None else "black",
+        )
+
+    def _display_frame(self, index: int, frame):
+        from PIL import ImageTk
+
+        if index != self.current_image_index:
+            return  # user has moved on, drop the stale frame
+
+        item, image = frame
+        self.current_original_image = image  # Mark that an image is shown
+
+        if self._label_size() is not None:
+            with stage("photoimage"):
+                photo = ImageTk.PhotoImage(image)
             self.image_label.config(image=photo)
             self.image_label.image = photo
         else:
@@ -248,7 +1175,9 @@ class ImageBrowser:
 
     def show_previous_image(self):
         if self.data_loader:
+            self.stop_playback()
             self.current_image_index = (self.current_image_index - 1) % len(self.data_loader)
+            self.scroll_direction = -1
             self.show_image()
             # Update listbox selection
             self.image_list.selection_clear(0, "end")
@@ -257,7 +1186,9 @@ class ImageBrowser:
 
     def show_next_image(self):
         if self.data_loader:
+            self.stop_playback()
             self.current_image_index = (self.current_image_index + 1) % len(self.data_loader)
+            self.scroll_direction = 1
             self.show_image()
             # Update listbox selection
             self.image_list.selection_clear(0, "end")
@@ -0,0 +1,244 @@
+# Author: Tao Wen
+# Description:
+#   export every item of a dataset as an annotated image,
+#   rendered in a process pool and written to a folder or a zip file.
+#   Usage: python src/batch.py DATASET OUTPUT [--size 1280x720] [--format png] [--backend opencv]
+
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+from typing_ import DataLoaderProtocol
+import argparse
+import io
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import zipfile
+
+FORMAT_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png"}
+
+
+@dataclass
+class BatchProgress:
+    done: int  # exported or failed
+    total: int
+    elapsed: float
+    failed: list[tuple[str, str]] = field(default_factory=list)  # (name, error) of items not exported
+
+    @property
+    def exported(self) -> int:
+        return self.done - len(self.failed)
+
+    @property
+    def eta(self) -> float | None:
+        """Estimated seconds left, or None before the first item is done."""
+        if self.done == 0:
+            return None
+        return self.elapsed / self.done * (self.total - self.done)
+
+    @property
+    def throughput(self) -> float:
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        eta = "--:--" if self.eta is None else time.strftime("%H:%M:%S", time.gmtime(self.eta))
+        failed = f", {len(self.failed)} failed" if self.failed else ""
+        return f"{self.done}/{self.total} ({self.throughput:.1f} img/s, ETA {eta}{failed})"
+
+    def failed_names(self, limit: int = 3) -> str:
+        """Names of the first `limit` failed items, e.g., for a status line."""
+        names = ", ".join(name for name, _ in self.failed[:limit])
+        return names + (", ..." if len(self.failed) > limit else "")
+
+
+def output_name(name: str, image_format: str) -> str:
+    """Name of the exported image, i.e., the item name with the new extension."""
+    return name.rsplit('.', 1)[0] + FORMAT_EXTENSIONS[image_format]
+
+
+class FolderWriter:
+    def __init__(self, folder_path: str):
+        self._folder_path = folder_path
+
+    def write(self, name: str, data: bytes):
+        path = os.path.join(self._folder_path, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def close(self):
+        pass
+
+
+class ZipWriter:
+    def __init__(self, zip_path: str):
+        # images are already compressed, store them as they are
+        self._zip_ref = zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED)
+
+    def write(self, name: str, data: bytes):
+        self._zip_ref.writestr(name.replace(os.sep, "/"), data)
+
+    def close(self):
+        self._zip_ref.close()
+
+
+def open_writer(output_path: str) -> FolderWriter | ZipWriter:
+    if output_path.lower().endswith(".zip"):
+        return ZipWriter(output_path)
+    os.makedirs(output_path, exist_ok=True)
+    return FolderWriter(output_path)
+
+
+# Per-process state of the pool workers, set by `_init_worker`
+_worker_state: dict = {}
+
+
+def _init_worker(
+    data_loader: DataLoaderProtocol,
+    size: tuple[int, int] | None,
+    image_format: str,
+    quality: int,
+):
+    from visualizer import AnnotatedImageVisualizer
+
+    _worker_state.update(
+        data_loader=data_loader,
+        visualizer=AnnotatedImageVisualizer(),
+        size=size,
+        image_format=image_format,
+        quality=quality,
+    )
+
+
+def _render_chunk(indices: range) -> tuple[list[tuple[str, bytes]], list[tuple[str, str]]]:
+    """Encoded images of the items, and (name, error) of those that failed, e.g., corrupt images."""
+    data_loader = _worker_state["data_loader"]
+    visualizer = _worker_state["visualizer"]
+    size = _worker_state["size"]
+    image_format = _worker_state["image_format"]
+
+    results, failed = [], []
+    for index in indices:
+        try:
+            item = data_loader.get_item_by_index(index, target_size=size)
+            image = visualizer.to_drawn_image(item, size)
+            if image_format == "JPEG" and image.mode != "RGB":
+                image = image.convert("RGB")
+            buffer = io.BytesIO()
+            if image_format == "JPEG":
+                image.save(buffer, image_format, quality=_worker_state["quality"])
+            else:
+                image.save(buffer, image_format)
+        except Exception as error:
+            failed.append((data_loader.data_item_name_list[index], f"{type(error).__name__}: {error}"))
+            continue
+        results.append((output_name(item.name, image_format), buffer.getvalue()))
+    return results, failed
+
+
+def export_dataset(
+    data_loader: DataLoaderProtocol,
+    output_path: str,
+    size: tuple[int, int] | None = None,
+    image_format: str = "JPEG",
+    quality: int = 90,
+    workers: int | None = None,
+    chunk_size: int = 16,
+    progress: Callable[[BatchProgress], None] | None = None,
+    cancel: threading.Event | None = None,
+) -> BatchProgress:
+    """Render every item with its annotation and write it to a folder or `.zip` file.
+
+    Items are rendered in a process pool in chunks of `chunk_size`; at most
+    two chunks per worker are in flight, so memory stays bounded however fast
+    the writer is. The loader is pickled once into each worker.
+    Items that fail to render, e.g., corrupt images, are skipped and listed.
+    Return the final progress, with the exported and failed items.
+    """
+    workers = workers or os.cpu_count() or 1
+    total = len(data_loader)
+    chunks: Iterator[range] = (
+        range(start, min(start + chunk_size, total))
+        for start in range(0, total, chunk_size)
+    )
+    done = 0
+    failed: list[tuple[str, str]] = []
+    start_time = time.perf_counter()
+
+    writer = open_writer(output_path)
+    # spawn, as forking a process that runs Tk is not safe
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(data_loader, size, image_format, quality),
+        ) as executor:
+            pending: set[Future] = set()
+            while True:
+                while len(pending) < 2 * workers and not (cancel and cancel.is_set()):
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    pending.add(executor.submit(_render_chunk, chunk))
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    results, chunk_failed = future.result()
+                    for name, data in results:
+                        writer.write(name, data)
+                    failed.extend(chunk_failed)
+                    done += len(results) + len(chunk_failed)
+                if progress is not None:
+                    progress(BatchProgress(done, total, time.perf_counter() - start_time, list(failed)))
+    finally:
+        writer.close()
+    return BatchProgress(done, total, time.perf_counter() - start_time, failed)
+
+
+def parse_size(text: str) -> tuple[int, int]:
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main(argv: list[str] | None = None):
+    from data_loader import open_data_loader
+    from image_backend import BACKENDS, set_backend
+
+    parser = argparse.ArgumentParser(description="Export annotated images of a dataset.")
+    parser.add_argument("dataset", help="dataset folder or .zip file")
+    parser.add_argument("output", help="output folder or .zip file")
+    parser.add_argument("--size", type=parse_size, default=None,
+                        help="fit images in WIDTHxHEIGHT, e.g., 1280x720 (default: full size)")
+    parser.add_argument("--format", choices=["jpg", "png"], default="jpg")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG quality")
+    parser.add_argument("--workers", type=int, default=None, help="default: number of CPUs")
+    parser.add_argument("--backend", choices=list(BACKENDS), default=None,
+                        help="decode, resize and draw with PIL or OpenCV (default: $IMAGE_BACKEND or pil)")
+    args = parser.parse_args(argv)
+    if args.backend is not None:
+        set_backend(args.backend)  # also for the worker processes
+
+    data_loader = open_data_loader(args.dataset)
+    result = export_dataset(
+        data_loader,
+        args.output,
+        size=args.size,
+        image_format="JPEG" if args.format == "jpg" else "PNG",
+        quality=args.quality,
+        workers=args.workers,
+        progress=lambda p: print(f"\r{p}", end="", file=sys.stderr, flush=True),
+    )
+    print(f"\nExported {result.exported} images to {args.output}", file=sys.stderr)
+    if result.failed:
+        print(f"{len(result.failed)} items failed and were skipped:", file=sys.stderr)
+        for name, error in result.failed:
+            print(f"  {name}: {error}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
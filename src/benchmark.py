@@ -0,0 +1,268 @@
+# Author: Tao Wen
+# Description:
+#   headless benchmarks of the loaders, box parsing and rendering
+#   on synthetic datasets, written as JSON to compare across commits.
+#   Usage: python src/benchmark.py [--images 200] [--resolution 1920x1080]
+#          [--boxes 20] [--output results.json] [--compare baseline.json]
+
+from data_item import BoxArray
+from data_loader import FolderLoader, ZipLoader
+from image_backend import get_backend, set_backend, BACKENDS
+from visualizer import AnnotatedImageVisualizer
+from PIL import Image
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+import numpy as np
+
+DISPLAY_SIZE = (1280, 720)
+STARTUP_TARGET_MS = 100  # importing the browser, i.e., main.py until the window is built
+
+
+def make_image(rng: np.random.Generator, size: tuple[int, int]) -> bytes:
+    """A JPEG with gradients and noise, compressing about like a photo."""
+    width, height = size
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pixels = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=2)
+    pixels += rng.normal(0, 12, (height, width, 1)).astype(np.float32)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels.clip(0, 255).astype(np.uint8)).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def make_annotation(rng: np.random.Generator, n_boxes: int) -> str:
+    """YOLO lines, i.e., `class x_center y_center w h`, with `n_boxes` boxes."""
+    w = rng.uniform(0.02, 0.3, n_boxes)
+    h = rng.uniform(0.02, 0.3, n_boxes)
+    rows = np.stack([
+        rng.integers(0, 80, n_boxes),
+        rng.uniform(w / 2, 1 - w / 2),
+        rng.uniform(h / 2, 1 - h / 2),
+        w,
+        h,
+    ], axis=1)
+    return "".join(f"{int(c)} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n" for c, x, y, w, h in rows)
+
+
+def make_datasets(root: str, n_images: int, resolution: tuple[int, int], n_boxes: int, seed: int = 0) -> dict[str, str]:
+    """Write the same synthetic items as a folder, a stored zip and a deflated zip."""
+    rng = np.random.default_rng(seed)
+    folder = os.path.join(root, "folder")
+    os.makedirs(folder)
+    members = []
+    for index in range(n_images):
+        # only 8 distinct images are encoded, so large datasets are generated quickly
+        image = make_image(rng, resolution) if index < 8 else members[(index % 8) * 2][1]
+        members.append((f"frame_{index}.jpg", image))
+        members.append((f"frame_{index}.txt", make_annotation(rng, n_boxes).encode("utf-8")))
+
+    for name, data in members:
+        with open(os.path.join(folder, name), "wb") as f:
+            f.write(data)
+    paths = {"folder": folder}
+    for label, compression in (("zip_stored", zipfile.ZIP_STORED), ("zip_deflated", zipfile.ZIP_DEFLATED)):
+        paths[label] = os.path.join(root, f"{label}.zip")
+        with zipfile.ZipFile(paths[label], "w", compression) as zip_ref:
+            for name, data in members:
+                zip_ref.writestr(name, data)
+    return paths
+
+
+def percentiles(samples: list[float], prefix: str) -> dict[str, float]:
+    milliseconds = np.array(samples) * 1000
+    return {
+        f"{prefix}_p50_ms": float(np.percentile(milliseconds, 50)),
+        f"{prefix}_p95_ms": float(np.percentile(milliseconds, 95)),
+        f"{prefix}_max_ms": float(milliseconds.max()),
+    }
+
+
+def timed(function, *args, **kwargs) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def bench_loader(label: str, path: str, samples: int) -> dict[str, float]:
+    results = {}
+    if label == "folder":
+        results["open_ms"], data_loader = timed(FolderLoader, path)
+    else:
+        # first open builds and saves the index, later opens reuse it
+        results["open_cold_ms"], data_loader = timed(ZipLoader, path)
+        results["open_ms"], data_loader = timed(ZipLoader, path)
+    results = {f"{label}.{key}": seconds * 1000 for key, seconds in results.items()}
+
+    indices = random.Random(0).choices(range(len(data_loader)), k=samples)
+    for size_label, size in (("full", None), ("display", DISPLAY_SIZE)):
+        latencies = []
+        for index in indices:
+            seconds, item = timed(data_loader.get_item_by_index, index, size)
+            seconds += timed(item.image.load)[0]  # decoding is lazy, include it
+            latencies.append(seconds)
+        results.update(percentiles(latencies, f"{label}.get_item_{size_label}"))
+    return results
+
+
+def bench_boxes(n_boxes: int, repeat: int = 200) -> dict[str, float]:
+    annotation = make_annotation(np.random.default_rng(1), n_boxes)
+    seconds, _ = timed(lambda: [BoxArray.from_yolo(annotation) for _ in range(repeat)])
+    box_array = BoxArray.from_yolo(annotation)
+    to_boxes_seconds, _ = timed(lambda: [box_array.to_boxes() for _ in range(repeat)])
+    return {
+        "boxes.from_yolo_per_s": repeat * n_boxes / seconds,
+        "boxes.to_boxes_per_s": repeat * n_boxes / to_boxes_seconds,
+    }
+
+
+def bench_render(path: str, samples: int) -> dict[str, float]:
+    data_loader = FolderLoader(path)
+    visualizer = AnnotatedImageVisualizer()
+    items = [data_loader.get_item_by_index(index) for index in range(min(samples, len(data_loader)))]
+    for item in items:
+        item.image.load()
+
+    results = {}
+    backend = get_backend()
+    for size_label, size in (("full", None), ("display", DISPLAY_SIZE)):
+        latencies = [timed(visualizer.to_drawn_image, item, size)[0] for item in items]
+        results.update(percentiles(latencies, f"render.{backend.name}.draw_{size_label}"))
+    latencies = [timed(backend.resize, item.image, DISPLAY_SIZE)[0] for item in items]
+    results.update(percentiles(latencies, f"render.{backend.name}.resize"))
+    return results
+
+
+def bench_startup(repeat: int = 5) -> dict[str, float]:
+    """Best of `repeat` fresh interpreters importing `app`, which must not load NumPy or PIL."""
+    code = (
+        "import sys, time; start = time.perf_counter(); import app; "
+        "print(time.perf_counter() - start, int('numpy' in sys.modules or 'PIL' in sys.modules))"
+    )
+    samples, heavy = [], 0
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.split()
+        samples.append(float(output[0]))
+        heavy |= int(output[1])
+    return {"startup.import_app_ms": min(samples) * 1000, "startup.heavy_imports": heavy}
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident memory of this process, or None where unavailable, e.g., on Windows."""
+    try:
+        import resource  # Unix only
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(n_images: int, resolution: tuple[int, int], n_boxes: int, samples: int, backends: list[str]) -> dict:
+    results = bench_startup()
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as root:
+        paths = make_datasets(root, n_images, resolution, n_boxes)
+        for label, path in paths.items():
+            results.update(bench_loader(label, path, samples))
+        results.update(bench_boxes(n_boxes))
+        for name in backends:
+            set_backend(name)
+            results.update(bench_render(paths["folder"], samples))
+    peak_rss = peak_rss_mb()
+    if peak_rss is not None:
+        results["peak_rss_mb"] = peak_rss
+    else:
+        print("peak_rss_mb: unavailable on this platform", file=sys.stderr)
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "images": n_images,
+            "resolution": list(resolution),
+            "boxes": n_boxes,
+            "samples": samples,
+            "startup_target_ms": STARTUP_TARGET_MS,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Print the change of every metric and return those worse by more than `threshold`."""
+    regressions = []
+    for key, value in current["results"].items():
+        old = baseline["results"].get(key)
+        if not old:
+            continue
+        change = value / old - 1
+        higher_is_better = key.endswith("_per_s")
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSION" if worse > threshold else ""
+        print(f"{key:45} {old:12.2f} -> {value:12.2f} ({change:+.1%}){flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv: list[str] | None = None):
+    from batch import parse_size
+
+    parser = argparse.ArgumentParser(description="Benchmark loaders and rendering on synthetic datasets.")
+    parser.add_argument("--images", type=int, default=200, help="images per dataset")
+    parser.add_argument("--resolution", type=parse_size, default=(1920, 1080), help="WIDTHxHEIGHT")
+    parser.add_argument("--boxes", type=int, default=20, help="boxes per image")
+    parser.add_argument("--samples", type=int, default=50, help="items timed per measurement")
+    parser.add_argument("--backend", choices=list(BACKENDS), action="append",
+                        help="render with these backends (default: the selected one)")
+    parser.add_argument("--output", help="write the results as JSON here (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON to compare with; exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.1, help="tolerated slowdown, e.g., 0.1 = 10%%")
+    args = parser.parse_args(argv)
+
+    report = run(args.images, args.resolution, args.boxes, args.samples, args.backend or [get_backend().name])
+    startup_ms = report["results"]["startup.import_app_ms"]
+    if startup_ms > STARTUP_TARGET_MS or report["results"]["startup.heavy_imports"]:
+        print(f"Startup: importing app took {startup_ms:.0f} ms (target {STARTUP_TARGET_MS} ms)"
+              " or loaded NumPy/PIL eagerly", file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions over {args.threshold:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
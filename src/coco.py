@@ -0,0 +1,410 @@
+# Author: Tao Wen
+# Description:
+#   COCO detection annotations, i.e., one `instances.json` for a folder
+#   or zip of images, parsed once by a streaming parser into a compact
+#   image -> boxes index and cached, so reopening does not parse it again.
+
+from typing import Any, Callable, Iterator
+from typing_ import DataLoaderProtocol
+from data_item import AnnotatedImageItem, BoxArray
+from data_loader import FolderLoader, ZipLoader, content_stamp
+from image_backend import Size
+from zip_index import CACHE_DIR, Cancelled, archive_stamp
+from array import array
+import codecs
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+import numpy as np
+
+CACHE_VERSION = 1
+NUMBER_TAIL = re.compile(r"[0-9eE+\-.]*")
+
+
+class JSONReader:
+    """Incremental reader of JSON text from a binary stream, one value at a time."""
+
+    def __init__(self, stream, chunk_size: int = 1 << 20):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._text = ""
+        self._position = 0
+        self._eof = False
+        self.bytes_read = 0
+
+    def _fill(self) -> bool:
+        """Append the next chunk, dropping the text already consumed."""
+        if self._eof:
+            return False
+        data = self._stream.read(self._chunk_size)
+        self.bytes_read += len(data)
+        self._eof = not data
+        self._text = self._text[self._position:] + self._decoder.decode(data, final=self._eof)
+        self._position = 0
+        return True
+
+    def peek(self) -> str:
+        """The next non-whitespace character, without consuming it, or "" at the end."""
+        while True:
+            text, position = self._text, self._position
+            while position < len(text) and text[position] in " \t\r\n":
+                position += 1
+            self._position = position
+            if position < len(text):
+                return text[position]
+            if not self._fill():
+                return ""
+
+    def take(self, expected: str):
+        found = self.peek()
+        if found != expected:
+            raise ValueError(f"Expected {expected!r} in JSON, found {found!r}")
+        self._position += 1
+
+    def value(self) -> Any:
+        """Decode the next complete value, reading more text until it is buffered."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._text, self._position)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # a number at the end of the buffer may continue in the next chunk,
+            # e.g., "2" or "2." of "2.5e10", as long as only number characters follow
+            if (
+                isinstance(value, (int, float))
+                and NUMBER_TAIL.match(self._text, end).end() == len(self._text)
+                and self._fill()
+            ):
+                continue
+            self._position = end
+            return value
+
+
+def iter_top_level(reader: JSONReader) -> Iterator[tuple[str, Any]]:
+    """(key, value) of the top-level object, with arrays yielded element by element.
+
+    Only one element of e.g. `annotations` is in memory at a time, so
+    peak memory does not grow with the size of the file.
+    """
+    reader.take("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value()
+        reader.take(":")
+        if reader.peek() == "[":
+            reader.take("[")
+            if reader.peek() == "]":
+                reader.take("]")
+            else:
+                while True:
+                    yield key, reader.value()
+                    if reader.peek() == "]":
+                        reader.take("]")
+                        break
+                    reader.take(",")
+        else:
+            yield key, reader.value()
+        if reader.peek() == "}":
+            return
+        reader.take(",")
+
+
+class CocoIndex:
+    """Images of a COCO file and their boxes, grouped per image in CSR arrays.
+
+    The boxes of image `i` are rows `offsets[i]:offsets[i + 1]` of `class_ids`
+    and `boxes` (left, top, width, height in pixels), so looking them up is
+    O(1) and no per-image objects are kept. Class ids are the positions of
+    the category ids in sorted order, i.e., 0 to n_categories - 1.
+    """
+
+    def __init__(
+        self,
+        file_names: list[str],
+        sizes: np.ndarray,
+        offsets: np.ndarray,
+        class_ids: np.ndarray,
+        boxes: np.ndarray,
+        category_names: list[str],
+    ):
+        self.file_names = file_names
+        self.sizes = sizes  # (n_images, 2) int32, width and height
+        self.offsets = offsets  # (n_images + 1,) int64
+        self.class_ids = class_ids  # (n_boxes,) int32
+        self.boxes = boxes  # (n_boxes, 4) float32
+        self.category_names = category_names
+
+    @classmethod
+    def parse(
+        cls,
+        stream,
+        total_bytes: int = 0,
+        progress: Callable[[int, int], None] | None = None,
+        cancel: threading.Event | None = None,
+        report_every: int = 50000,
+    ) -> "CocoIndex":
+        """Stream `images`, `annotations` and `categories` into flat arrays.
+
+        Every `report_every` elements, `progress(bytes_read, total_bytes)` is
+        called and setting `cancel` raises `Cancelled`.
+        """
+        image_ids, widths, heights = array("q"), array("i"), array("i")
+        file_names: list[str] = []
+        box_image_ids, category_ids, boxes = array("q"), array("q"), array("f")
+        categories: dict[int, str] = {}
+
+        reader = JSONReader(stream)
+        for count, (key, value) in enumerate(iter_top_level(reader)):
+            if count % report_every == 0:
+                if cancel is not None and cancel.is_set():
+                    raise Cancelled()
+                if progress is not None:
+                    progress(reader.bytes_read, total_bytes)
+            if key == "annotations":
+                bbox = value.get("bbox")
+                if bbox is None or len(bbox) != 4:
+                    continue  # e.g., a keypoint or caption annotation
+                box_image_ids.append(value["image_id"])
+                category_ids.append(value["category_id"])
+                boxes.extend(bbox)
+            elif key == "images":
+                image_ids.append(value["id"])
+                file_names.append(value["file_name"])
+                widths.append(value.get("width") or 0)
+                heights.append(value.get("height") or 0)
+            elif key == "categories":
+                categories[value["id"]] = value.get("name", str(value["id"]))
+
+        image_ids = np.frombuffer(image_ids, np.int64)
+        box_image_ids = np.frombuffer(box_image_ids, np.int64)
+        category_ids = np.frombuffer(category_ids, np.int64)
+        boxes = np.frombuffer(boxes, np.float32).reshape(-1, 4)
+
+        # image of every box as a row of `images`, dropping boxes of unknown images
+        if len(image_ids):
+            id_order = np.argsort(image_ids, kind="stable")
+            sorted_ids = image_ids[id_order]
+            rows = np.minimum(np.searchsorted(sorted_ids, box_image_ids), len(sorted_ids) - 1)
+            known = sorted_ids[rows] == box_image_ids
+            box_rows = id_order[rows[known]]
+        else:
+            known = np.zeros(len(box_image_ids), bool)
+            box_rows = np.zeros(0, np.int64)
+        box_order = np.argsort(box_rows, kind="stable")
+
+        category_order = np.array(sorted(set(categories) | set(np.unique(category_ids).tolist())), np.int64)
+        class_ids = np.searchsorted(category_order, category_ids[known][box_order]).astype(np.int32)
+        counts = np.bincount(box_rows, minlength=len(image_ids))
+        return cls(
+            file_names=file_names,
+            sizes=np.stack([np.frombuffer(widths, np.int32), np.frombuffer(heights, np.int32)], axis=1),
+            offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            class_ids=class_ids,
+            boxes=boxes[known][box_order],
+            category_names=[categories.get(int(c), str(c)) for c in category_order.tolist()],
+        )
+
+    def box_array(self, row: int) -> BoxArray:
+        """Boxes of image `row`, normalized with the top-left corner as (x, y)."""
+        start, end = self.offsets[row], self.offsets[row + 1]
+        width, height = self.sizes[row].tolist()
+        boxes = self.boxes[start:end].astype(np.float64) / [width, height, width, height]
+        return BoxArray(
+            self.class_ids[start:end], boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+        )
+
+    def yolo_text(self, row: int) -> str | None:
+        """Boxes of image `row` as YOLO lines, or None without the image size to normalize them."""
+        if not self.sizes[row].all():
+            return None
+        box_array = self.box_array(row)
+        return "".join(
+            f"{c} {x + w / 2:.6f} {y + h / 2:.6f} {w:.6f} {h:.6f}\n"
+            for c, x, y, w, h in zip(
+                box_array.class_id.tolist(), box_array.x.tolist(), box_array.y.tolist(),
+                box_array.w.tolist(), box_array.h.tolist(),
+            )
+        )
+
+    def save(self, path: str, stamp: tuple[int, int]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            temp_path,
+            version=CACHE_VERSION,
+            stamp=np.array(stamp, np.int64),
+            file_names=np.frombuffer("\0".join(self.file_names).encode("utf-8"), np.uint8),
+            category_names=np.frombuffer("\0".join(self.category_names).encode("utf-8"), np.uint8),
+            sizes=self.sizes,
+            offsets=self.offsets,
+            class_ids=self.class_ids,
+            boxes=self.boxes,
+        )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str, stamp: tuple[int, int]) -> "CocoIndex | None":
+        """Load a saved index, or return None if it is missing or `stamp` has changed."""
+        try:
+            with np.load(path) as data:
+                if int(data["version"]) != CACHE_VERSION or tuple(data["stamp"].tolist()) != tuple(stamp):
+                    return None
+                names = data["file_names"].tobytes().decode("utf-8")
+                categories = data["category_names"].tobytes().decode("utf-8")
+                return cls(
+                    file_names=names.split("\0") if names else [],
+                    sizes=data["sizes"],
+                    offsets=data["offsets"],
+                    class_ids=data["class_ids"],
+                    boxes=data["boxes"],
+                    category_names=categories.split("\0") if categories else [],
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def is_coco_name(name: str) -> bool:
+    """Whether a JSON file looks like COCO annotations, e.g., `annotations/instances_val2017.json`."""
+    directory, file_name = os.path.split(name.replace("\\", "/"))
+    return file_name.lower().endswith(".json") and (
+        file_name.startswith("instances") or os.path.basename(directory) == "annotations"
+    )
+
+
+def find_coco_json(dataset_path: str) -> str | None:
+    """A COCO file at the top of a folder or in its `annotations` directory, or None."""
+    for directory in (dataset_path, os.path.join(dataset_path, "annotations")):
+        try:
+            with os.scandir(directory) as entries:
+                names = sorted(entry.path for entry in entries if entry.is_file())
+        except OSError:
+            continue
+        for name in names:
+            if is_coco_name(os.path.relpath(name, dataset_path)):
+                return name
+    return None
+
+
+def coco_cache_path(dataset_path: str, annotation_path: str) -> str:
+    key = f"{os.path.abspath(dataset_path)}\0{annotation_path}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"coco-{digest}.npz")
+
+
+class CocoLoader(DataLoaderProtocol):
+    """Images of a folder or zip archive with boxes from one COCO file.
+
+    Images are read by the `FolderLoader` or `ZipLoader` of the dataset and
+    listed in its order; images without a COCO entry are left out. Items are
+    the usual `AnnotatedImageItem`s: the annotation is given as YOLO text, so
+    statistics and search work unchanged, and the boxes are set directly.
+    """
+
+    def __init__(
+        self,
+        dataset_path: str,
+        annotation_path: str | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        cancel: threading.Event | None = None,
+    ):
+        """Open `dataset_path` with `annotation_path`, a JSON file on disk or a
+        member of the archive, found by `find_coco_json`/`is_coco_name` if not given.
+        """
+        self._dataset_path = dataset_path
+        if os.path.isdir(dataset_path):
+            self._base = FolderLoader(dataset_path)
+            annotation_path = annotation_path or find_coco_json(dataset_path)
+        else:
+            self._base = ZipLoader(dataset_path, progress, cancel)
+            annotation_path = annotation_path or next(
+                (name for name in self._base.json_names if is_coco_name(name)), None
+            )
+        if annotation_path is None:
+            raise ValueError(f"No COCO annotations found in {dataset_path}")
+        self._annotation_path = annotation_path
+        self.index = self._open_index(progress, cancel)
+
+        # rows of the index in the order of the dataset, matched by path or else file name
+        row_of = {}
+        for row, file_name in enumerate(self.index.file_names):
+            row_of[file_name] = row
+            row_of.setdefault(os.path.basename(file_name), row)
+        base_names = self._base.data_item_name_list
+        matched = [
+            (position, row_of.get(name, row_of.get(os.path.basename(name), -1)))
+            for position, name in enumerate(base_names)
+        ]
+        matched = [(position, row) for position, row in matched if row >= 0]
+        self._base_index = np.array([position for position, _ in matched], np.int64)
+        self._rows = np.array([row for _, row in matched], np.int64)
+        self._file_name_list = [base_names[position] for position, _ in matched]
+
+    def _open_index(self, progress, cancel) -> CocoIndex:
+        """Load the cached index if the COCO file is unchanged, otherwise parse it."""
+        if isinstance(self._base, ZipLoader):
+            stamp = archive_stamp(self._dataset_path)
+        else:
+            stat = os.stat(self._annotation_path)
+            stamp = (stat.st_size, stat.st_mtime_ns)
+        cache_path = coco_cache_path(self._dataset_path, self._annotation_path)
+        index = CocoIndex.load(cache_path, stamp)
+        if index is not None:
+            return index
+
+        if isinstance(self._base, ZipLoader):
+            stream = self._base.open_json(self._annotation_path)
+            total = getattr(stream, "size", 0)
+        else:
+            stream = open(self._annotation_path, "rb")
+            total = stamp[0]
+        with stream:
+            index = CocoIndex.parse(stream, total, progress, cancel)
+        try:
+            index.save(cache_path, stamp)
+        except OSError:
+            pass  # e.g., no writable cache, parse again next time
+        return index
+
+    @property
+    def data_item_name_list(self) -> list[str]:
+        return self._file_name_list
+
+    def get_item_by_index(self, index: int, target_size: Size | None = None) -> AnnotatedImageItem:
+        item = self._base.get_item_by_index(int(self._base_index[index]), target_size)
+        row = int(self._rows[index])
+        item.annotation = self.index.yolo_text(row)
+        if item.annotation is not None:
+            item.box_array = self.index.box_array(row)  # set the cached property, nothing to parse
+        return item
+
+    def read_annotation(self, index: int) -> str | None:
+        return self.index.yolo_text(int(self._rows[index]))
+
+    def annotation_stamp(self, index: int) -> int:
+        row = int(self._rows[index])
+        start, end = self.index.offsets[row], self.index.offsets[row + 1]
+        checksum = zlib.crc32(self.index.class_ids[start:end].tobytes())
+        checksum = zlib.crc32(self.index.boxes[start:end].tobytes(), checksum)
+        return content_stamp(int(end - start), checksum, *self.index.sizes[row].tolist())
+
+    def image_stamp(self, index: int) -> int:
+        return self._base.image_stamp(int(self._base_index[index]))
+
+    def __len__(self) -> int:
+        return len(self._file_name_list)
+
+    def __getstate__(self) -> dict:
+        # reopened from the cached index in worker processes
+        return {"dataset_path": self._dataset_path, "annotation_path": self._annotation_path}
+
+    def __setstate__(self, state: dict):
+        self.__init__(state["dataset_path"], state["annotation_path"])
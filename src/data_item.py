@@ -4,7 +4,10 @@
 from typing import Any
 from typing_ import DataItemProtocol
 from dataclasses import dataclass, asdict
+from functools import cached_property
+from typing import Iterator
 from PIL import Image
+import numpy as np
 
 
 @dataclass
@@ -31,6 +34,94 @@ class Box:
     h: float
 
 
+class BoxArray:
+    """Columnar bounding boxes, one NumPy array per field.
+
+    Coordinates are normalized, with (x, y) being the top-left corner.
+    """
+    __slots__ = ("class_id", "x", "y", "w", "h")
+
+    def __init__(
+        self,
+        class_id: np.ndarray,
+        x: np.ndarray,
+        y: np.ndarray,
+        w: np.ndarray,
+        h: np.ndarray,
+    ):
+        self.class_id = class_id
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+
+    @classmethod
+    def empty(cls) -> "BoxArray":
+        return cls.from_rows(np.empty((0, 5)))
+
+    @classmethod
+    def from_rows(cls, rows: np.ndarray, center: bool = False) -> "BoxArray":
+        """Build from an (N, 5) array of (class_id, x, y, w, h)."""
+        x, y, w, h = rows[:, 1], rows[:, 2], rows[:, 3], rows[:, 4]
+        if center:
+            # convert center coordinates to top-left coordinates
+            x = x - w / 2
+            y = y - h / 2
+        return cls(rows[:, 0].astype(np.int32), x, y, w, h)
+
+    @classmethod
+    def from_yolo(cls, text: str | None, center: bool = True) -> "BoxArray":
+        """Parse YOLO lines `class_id x y w h` in bulk.
+
+        With `center`, (x, y) is the box center as in YOLO labels,
+        otherwise it is the top-left corner.
+        """
+        if not text or not text.strip():
+            return cls.empty()
+        lines = list(map(str.split, text.strip().splitlines()))
+        if all(len(parts) == 5 for parts in lines):
+            # fast path: every line holds exactly 5 fields, converted in one call
+            try:
+                return cls.from_rows(np.array(lines, dtype=np.float64), center=center)
+            except ValueError:
+                pass  # a field is not a number, convert line by line
+        # skip blank, short or non-numeric lines, ignore extra fields
+        rows = []
+        for parts in lines:
+            if len(parts) < 5:
+                continue
+            try:
+                rows.append([float(value) for value in parts[:5]])
+            except ValueError:
+                continue
+        return cls.from_rows(np.array(rows, dtype=np.float64).reshape(-1, 5), center=center)
+
+    @classmethod
+    def from_boxes(cls, boxes: list[Box]) -> "BoxArray":
+        rows = np.array(
+            [(b.class_id, b.x, b.y, b.w, b.h) for b in boxes], dtype=np.float64
+        ).reshape(-1, 5)
+        return cls.from_rows(rows)
+
+    def __len__(self) -> int:
+        return len(self.class_id)
+
+    def __iter__(self) -> Iterator[Box]:
+        return iter(self.to_boxes())
+
+    def to_boxes(self) -> list[Box]:
+        return [
+            Box(*fields)
+            for fields in zip(
+                self.class_id.tolist(),
+                self.x.tolist(),
+                self.y.tolist(),
+                self.w.tolist(),
+                self.h.tolist(),
+            )
+        ]
+
+
 @dataclass
 class AnnotatedImageItem:
     name: str
@@ -38,21 +129,13 @@ class AnnotatedImageItem:
     annotation: str | None
     source: str
 
+    @cached_property
+    def box_array(self) -> BoxArray:
+        """Boxes parsed once from the YOLO annotation (center coordinates)."""
+        return BoxArray.from_yolo(self.annotation)
+
     def boxes(self) -> list[Box]:
-        result = []
-        if self.annotation:
-            for line in self.annotation.split("\n"):
-                # center coordinates and width/height
-                # (class_id, x0, y0, w, h)
-                parts = line.split()
-                if len(parts) >= 4:
-                    class_id = int(parts[0])
-                    x0, y0, w, h = map(float, parts[1:])
-                    # convert center coordinates to top-left coordinates
-                    x1 = x0 - w / 2
-                    y1 = y0 - h / 2
-                    result.append(Box(class_id, x1, y1, w, h))
-        return result
+        return self.box_array.to_boxes()
 
     def as_dict(self) -> dict[str, Any]:
         return asdict(self)
@@ -4,10 +4,27 @@
 
 from PIL import Image
 from typing_ import DataLoaderProtocol
-from data_item import ImageItem, AnnotatedImageItem
+from data_item import AnnotatedImageItem
+from profiler import stage
+from image_backend import Size, fit_size, get_backend, is_decoded_for
+from tar_index import TarIndex, list_shards
+from zip_index import IMAGE_EXTENSIONS, MemberStream, MemoryReader, ZipIndex, is_supported, read_member
+from typing import Callable, Iterator, TYPE_CHECKING
+from bisect import bisect_left, insort
+import io
+import mmap
 import os
+import threading
 import zipfile
+import zlib
 import re
+import numpy as np
+
+if TYPE_CHECKING:
+    from folder_watch import FolderChanges, FolderWatcher
+
+# aerial tiles of 20k x 20k pixels and more are expected, not decompression bombs
+Image.MAX_IMAGE_PIXELS = 1 << 30
 
 
 def name_with_left_pad(path: str, pad_width: int = 10) -> str:
@@ -17,40 +34,174 @@ def name_with_left_pad(path: str, pad_width: int = 10) -> str:
     return re.sub(r'(\d+)', lambda m: m.group(0).zfill(pad_width), name)
 
 
+def folder_sort_key(name: str) -> tuple:
+    """Position of `name` in the order `FolderLoader.scan` lists a folder in.
+
+    Directories are walked depth-first with the images of a directory before
+    its subdirectories, which are in sorted order; images by natural name.
+    """
+    *directories, _ = name.split(os.sep)
+    return (*((1, directory) for directory in directories), (0, name_with_left_pad(name)))
+
+
+def open_image(fp, target_size: Size | None = None) -> Image.Image:
+    """Open an image with the selected backend, see `PILBackend.open_image`."""
+    return get_backend().open_image(fp, target_size)
+
+
+def content_stamp(*parts: int) -> int:
+    """Fold e.g. (size, mtime) or (size, crc) into a non-zero 64-bit change stamp."""
+    stamp = zlib.crc32(repr(parts).encode()) | (zlib.adler32(repr(parts).encode()) << 32)
+    return stamp or 1
+
+
 class FolderLoader(DataLoaderProtocol):
-    def __init__(self, folder_path: str):
+    def __init__(self, folder_path: str, recursive: bool = True, eager: bool = True):
+        """Load images under `folder_path`, paired with `.txt` annotations.
+
+        With `eager=False` the folder is not walked here, call `scan()`
+        to list it incrementally, e.g., from a background thread.
+        """
         self._folder_path = folder_path
-        self._file_name_list = [
-            f for f in os.listdir(folder_path)
-            if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif'))
+        self._recursive = recursive
+        self._file_name_list: list[str] = []
+        self._annotation_name_set: set[str] = set()
+        if eager:
+            for _ in self.scan():
+                pass
+
+    def scan(self, batch_size: int = 1000) -> Iterator[list[str]]:
+        """Walk the folder with `os.scandir`, appending images and yielding them in batches.
+
+        Directories are walked depth-first with the images of a directory before
+        its subdirectories, so the list is sorted by (directory, natural name)
+        at every point of the walk and indices of listed items never change.
+        """
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            image_names, dir_names = [], []
+            try:
+                with os.scandir(os.path.join(self._folder_path, rel_dir)) as entries:
+                    for entry in entries:
+                        name = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                        if entry.is_dir(follow_symlinks=False):
+                            dir_names.append(name)
+                        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                            image_names.append(name)
+                        elif entry.name.endswith('.txt'):
+                            self._annotation_name_set.add(name)
+            except OSError:
+                continue  # e.g., permission denied, skip the directory
+            if self._recursive:
+                stack.extend(sorted(dir_names, reverse=True))
+
+            image_names.sort(key=name_with_left_pad)
+            for start in range(0, len(image_names), batch_size):
+                batch = image_names[start:start + batch_size]
+                self._file_name_list.extend(batch)
+                yield batch
+
+    def watch(self) -> tuple["FolderWatcher", "FolderChanges"]:
+        """A watcher to poll the folder for changes, and the changes since it was listed.
+
+        Call after `scan()` has finished; apply the changes with `apply_changes`.
+        """
+        from folder_watch import FolderWatcher
+
+        watcher = FolderWatcher(self._folder_path, self._recursive)
+        changes = watcher.snapshot(set(self._file_name_list), set(self._annotation_name_set))
+        return watcher, changes
+
+    def apply_changes(self, changes: "FolderChanges") -> tuple[np.ndarray, list[int]]:
+        """Merge changes found by a `FolderWatcher` into the sorted list, in place.
+
+        Returns the new index of every old item, -1 if removed, and the new
+        indices of the items that were added or whose image or annotation changed.
+        """
+        names = self._file_name_list
+        old_length = len(names)
+        removed_positions = [
+            position for position in map(self._position, changes.removed) if position >= 0
         ]
-        self._file_name_list.sort(key=lambda x: (os.path.dirname(x), name_with_left_pad(x)))
-    
+        if len(removed_positions) > 64:
+            removed = set(removed_positions)
+            names[:] = [name for position, name in enumerate(names) if position not in removed]
+        else:
+            for position in sorted(removed_positions, reverse=True):
+                del names[position]
+        # an image reported again, e.g., listed by the walk meanwhile, is only touched
+        added, present = [], []
+        for name in dict.fromkeys(changes.added):
+            (present if self._position(name) >= 0 else added).append(name)
+        for name in added:
+            insort(names, name, key=folder_sort_key)
+        self._annotation_name_set.difference_update(changes.removed_annotations)
+        self._annotation_name_set.update(changes.added_annotations)
+
+        added_positions = [self._position(name) for name in added]
+        # items that stayed keep their relative order
+        mapping = np.full(old_length, -1, dtype=np.int64)
+        kept = np.ones(old_length, dtype=bool)
+        kept[removed_positions] = False
+        moved = np.ones(len(names), dtype=bool)
+        moved[added_positions] = False
+        mapping[kept] = np.flatnonzero(moved)
+        touched = set(added_positions) | {
+            position for position in map(self._position, changes.modified + present) if position >= 0
+        }
+        return mapping, sorted(touched)
+
+    def _position(self, name: str) -> int:
+        """Index of `name` by bisecting the sorted list, or -1."""
+        names = self._file_name_list
+        key = folder_sort_key(name)
+        position = bisect_left(names, key, key=folder_sort_key)
+        while position < len(names) and folder_sort_key(names[position]) == key:
+            if names[position] == name:
+                return position
+            position += 1
+        return -1
+
     @property
     def data_item_name_list(self) -> list[str]:
         return self._file_name_list
     
-    def get_item_by_index(self, index: int) -> ImageItem:
+    def get_item_by_index(self, index: int, target_size: Size | None = None) -> AnnotatedImageItem:
         name = self._file_name_list[index]
         source = os.path.join(self._folder_path, name)
-        return ImageItem(
+        return AnnotatedImageItem(
             name=name,
             source=source,
-            image=Image.open(source),
+            image=open_image(source, target_size),
+            annotation=self.read_annotation(index)
         )
 
+    def read_annotation(self, index: int) -> str | None:
+        annotation_name = to_annotation_path(self._file_name_list[index])
+        if annotation_name not in self._annotation_name_set:
+            return None
+        with open(os.path.join(self._folder_path, annotation_name), encoding='utf-8') as f:
+            return f.read()
+
+    def annotation_stamp(self, index: int) -> int:
+        annotation_name = to_annotation_path(self._file_name_list[index])
+        if annotation_name not in self._annotation_name_set:
+            return 0
+        try:
+            stat = os.stat(os.path.join(self._folder_path, annotation_name))
+        except OSError:
+            return 0
+        return content_stamp(stat.st_size, stat.st_mtime_ns)
+
+    def image_stamp(self, index: int) -> int:
+        stat = os.stat(os.path.join(self._folder_path, self._file_name_list[index]))
+        return content_stamp(stat.st_size, stat.st_mtime_ns)
+
     def __len__(self):
         return len(self._file_name_list)
 
 
-def in_zipfile(path: str, zipfile: zipfile.ZipFile) -> bool:
-    try:
-        zipfile.getinfo(path)
-        return True
-    except KeyError:
-        return False
-    
-
 def to_annotation_path(image_path: str, annotation_ext: str = "txt") -> str:
     """Get the annotation path for an image."""
     base = image_path.rsplit('.', 1)[0] 
@@ -58,40 +209,219 @@ def to_annotation_path(image_path: str, annotation_ext: str = "txt") -> str:
 
 
 class ZipLoader(DataLoaderProtocol):
-    def __init__(self, zip_path: str):
+    def __init__(
+        self,
+        zip_path: str,
+        progress: Callable[[int, int], None] | None = None,
+        cancel: threading.Event | None = None,
+    ):
+        """Open `zip_path`, indexing it first if needed, see `ZipIndex.open`."""
         self._zip_path = zip_path
-        self._zip_ref = zipfile.ZipFile(zip_path, 'r')
-        
-        self._file_name_list = list(filter(
-                lambda name: name.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')), 
-                self._zip_ref.namelist()
-            ))
-        self._file_name_list.sort(key=lambda x: (os.path.dirname(x), name_with_left_pad(x)))
+        # sorted names, member offsets and annotation pairing, persisted next to the archive
+        self._index = ZipIndex.open(zip_path, progress, cancel)
+        self._file_name_list = self._index.image_names
+        # Members are read from a read-only memory map, which is safe to share
+        # between threads: stored members are not copied, deflated ones are
+        # inflated straight from the mapped bytes.
+        self._file = open(zip_path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        # per-thread handles, only for members `read_member` cannot read (e.g., LZMA)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._zip_refs: list[zipfile.ZipFile] = []
 
     @property
     def data_item_name_list(self) -> list[str]:
         return self._file_name_list
     
-    def get_item_by_index(self, index: int) -> AnnotatedImageItem:
+    def get_item_by_index(self, index: int, target_size: Size | None = None) -> AnnotatedImageItem:
         name = self._file_name_list[index]
         source = os.path.join(self._zip_path, name)
-        image = self._zip_ref.open(name)
-
-        if in_zipfile(to_annotation_path(name), self._zip_ref):
-            annotation = self._zip_ref.read(to_annotation_path(name)).decode('utf-8')
-        else:
-            annotation = None
+        image = MemoryReader(self._read_entry(self._index.images[index], name))
 
         return AnnotatedImageItem(
             name=name,
             source=source,
-            image=Image.open(image),
-            annotation=annotation
+            image=open_image(image, target_size),
+            annotation=self.read_annotation(index)
         )
+
+    def read_annotation(self, index: int) -> str | None:
+        annotation_index = self._index.annotation_of[index]
+        if annotation_index < 0:
+            return None
+        entry = self._index.annotations[annotation_index]
+        annotation_name = to_annotation_path(self._file_name_list[index])
+        return str(self._read_entry(entry, annotation_name), 'utf-8')
+
+    def annotation_stamp(self, index: int) -> int:
+        annotation_index = self._index.annotation_of[index]
+        if annotation_index < 0:
+            return 0
+        entry = self._index.annotations[annotation_index]
+        return content_stamp(int(entry['file_size']), int(entry['crc']))
+
+    def image_stamp(self, index: int) -> int:
+        entry = self._index.images[index]
+        return content_stamp(int(entry['file_size']), int(entry['crc']))
+
+    @property
+    def json_names(self) -> list[str]:
+        """JSON members of the archive, e.g., COCO annotations."""
+        return self._index.json_names
+
+    def open_json(self, name: str) -> io.RawIOBase:
+        """Stream a JSON member, inflating it as it is read."""
+        entry = self._index.json_members[self._index.json_names.index(name)]
+        if is_supported(entry):
+            return MemberStream(self._buffer, entry)
+        # through the loader's handle, which outlives the stream and is closed with the loader
+        return self._zip_ref().open(name)
+
+    def _read_entry(self, entry, name: str) -> bytes | memoryview:
+        with stage("zip.read"):
+            if is_supported(entry):
+                return read_member(self._buffer, entry)
+            return self._zip_ref().read(name)
+
+    def _zip_ref(self) -> zipfile.ZipFile:
+        """This thread's handle to the archive, opened once."""
+        zip_ref = getattr(self._local, 'zip_ref', None)
+        if zip_ref is None:
+            zip_ref = self._local.zip_ref = zipfile.ZipFile(self._zip_path, 'r')
+            with self._lock:
+                self._zip_refs.append(zip_ref)
+        return zip_ref
     
     def __len__(self):
         return len(self._file_name_list)
 
+    def __getstate__(self) -> dict:
+        # the memory map and handles cannot be pickled, reopen from the (indexed) archive
+        return {'zip_path': self._zip_path}
+
+    def __setstate__(self, state: dict):
+        self.__init__(state['zip_path'])
+
     def __del__(self):
         """Ensure the zip file is closed when the loader is deleted."""
-        self._zip_ref.close()
+        for zip_ref in getattr(self, '_zip_refs', []):
+            zip_ref.close()
+        if getattr(self, '_buffer', None) is not None:
+            self._buffer.release()
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # images still reference stored members, unmapped on collection
+        if getattr(self, '_file', None) is not None:
+            self._file.close()
+
+
+class TarLoader(DataLoaderProtocol):
+    def __init__(
+        self,
+        folder_path: str,
+        progress: Callable[[int, int], None] | None = None,
+        cancel: threading.Event | None = None,
+    ):
+        """Open a directory of `.tar` shards as one dataset, see `TarIndex.open`."""
+        self._folder_path = folder_path
+        self._index = TarIndex.open(folder_path, progress, cancel)
+        self._file_name_list = self._index.image_names
+        # shards are memory-mapped on first read, members are slices of the maps
+        self._buffers: dict[int, memoryview] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def data_item_name_list(self) -> list[str]:
+        return self._file_name_list
+
+    def get_item_by_index(self, index: int, target_size: Size | None = None) -> AnnotatedImageItem:
+        name = self._file_name_list[index]
+        entry = self._index.images[index]
+        shard_name = self._index.shards[int(entry['shard'])][0]
+        return AnnotatedImageItem(
+            name=name,
+            source=os.path.join(self._folder_path, shard_name, name),
+            image=open_image(MemoryReader(self._read_member(entry)), target_size),
+            annotation=self.read_annotation(index)
+        )
+
+    def read_annotation(self, index: int) -> str | None:
+        annotation_index = self._index.annotation_of[index]
+        if annotation_index < 0:
+            return None
+        return str(self._read_member(self._index.annotations[annotation_index]), 'utf-8')
+
+    def annotation_stamp(self, index: int) -> int:
+        annotation_index = self._index.annotation_of[index]
+        if annotation_index < 0:
+            return 0
+        entry = self._index.annotations[annotation_index]
+        return content_stamp(int(entry['size']), int(entry['mtime']), int(entry['offset']))
+
+    def image_stamp(self, index: int) -> int:
+        entry = self._index.images[index]
+        return content_stamp(int(entry['size']), int(entry['mtime']), int(entry['offset']))
+
+    def _read_member(self, entry) -> memoryview:
+        with stage("tar.read"):
+            shard = int(entry['shard'])
+            buffer = self._buffers.get(shard)
+            if buffer is None:
+                with self._lock:
+                    buffer = self._buffers.get(shard)
+                    if buffer is None:
+                        path = os.path.join(self._folder_path, self._index.shards[shard][0])
+                        with open(path, 'rb') as f:  # the map stays valid after closing
+                            buffer = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                        self._buffers[shard] = buffer
+            offset = int(entry['offset'])
+            return buffer[offset:offset + int(entry['size'])]
+
+    def __len__(self):
+        return len(self._file_name_list)
+
+    def __getstate__(self) -> dict:
+        # the memory maps cannot be pickled, reopen from the (indexed) shards
+        return {'folder_path': self._folder_path}
+
+    def __setstate__(self, state: dict):
+        self.__init__(state['folder_path'])
+
+
+def is_tar_dataset(folder_path: str) -> bool:
+    """Whether a folder holds `.tar` shards, i.e., no images of its own at the top level."""
+    if not list_shards(folder_path):
+        return False
+    with os.scandir(folder_path) as entries:
+        return not any(entry.name.lower().endswith(IMAGE_EXTENSIONS) for entry in entries)
+
+
+def open_data_loader(
+    path: str,
+    progress: Callable[[int, int], None] | None = None,
+    cancel: threading.Event | None = None,
+    eager: bool = True,
+) -> DataLoaderProtocol:
+    """Open a dataset folder or zip archive with the matching loader.
+
+    Datasets with a COCO file, see `coco.find_coco_json`, get a `CocoLoader`.
+    `progress` and `cancel` are passed on to indexing, see `ZipIndex.open`;
+    with `eager=False` a plain folder is not walked, see `FolderLoader.scan`.
+    """
+    from coco import CocoLoader, find_coco_json, is_coco_name
+
+    if os.path.isdir(path):
+        if find_coco_json(path) is not None:
+            return CocoLoader(path, progress=progress, cancel=cancel)
+        if is_tar_dataset(path):
+            return TarLoader(path, progress=progress, cancel=cancel)
+        return FolderLoader(path, eager=eager)
+    if path.lower().endswith('.zip'):
+        data_loader = ZipLoader(path, progress=progress, cancel=cancel)
+        if any(is_coco_name(name) for name in data_loader.json_names):
+            return CocoLoader(path, progress=progress, cancel=cancel)
+        return data_loader
+    raise ValueError(f"Unsupported dataset: {path}")
@@ -0,0 +1,261 @@
+# Author: Tao Wen
+# Description:
+#   dataset statistics computed from the annotation text only,
+#   in a process pool, and cached per item so reopening a dataset
+#   only rescans the annotations that changed.
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+from typing_ import DataLoaderProtocol
+from data_item import BoxArray
+from annotation_status import AnnotationStatus, classify_annotation
+from zip_index import CACHE_DIR
+import hashlib
+import json
+import multiprocessing
+import os
+import zlib
+import numpy as np
+
+STATUS_CODES = {status: code for code, status in enumerate(AnnotationStatus)}
+STATUSES = list(AnnotationStatus)
+OUT_OF_RANGE_TOLERANCE = 1e-6
+SIZE_BINS = np.linspace(0.0, 1.0, 21)  # sqrt(w * h), normalized
+ASPECT_BINS = np.linspace(-4.0, 4.0, 17)  # log2(w / h)
+
+# per-item columns, in item order
+ITEM_FIELDS = {
+    "key": np.uint64,  # hash of the item name
+    "stamp": np.uint64,  # loader's annotation_stamp
+    "status": np.int8,  # STATUS_CODES
+    "n_boxes": np.int32,
+    "n_out_of_range": np.int32,
+}
+# per-box columns, concatenated in item order
+BOX_FIELDS = {
+    "class_id": np.int32,
+    "w": np.float32,
+    "h": np.float32,
+}
+
+
+def name_key(name: str) -> int:
+    data = name.encode("utf-8")
+    return zlib.crc32(data) | (zlib.adler32(data) << 32)
+
+
+def stats_cache_path(dataset_path: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(dataset_path).encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"stats-{digest}.npz")
+
+
+def scan_annotations(data_loader: DataLoaderProtocol, indices) -> dict[str, np.ndarray]:
+    """Parse the annotations of `indices` into item and box columns."""
+    indices = list(indices)
+    items = {field: np.zeros(len(indices), dtype) for field, dtype in ITEM_FIELDS.items()}
+    boxes: list[BoxArray] = []
+    for row, index in enumerate(indices):
+        text = data_loader.read_annotation(index)
+        status = classify_annotation(text)
+        items["status"][row] = STATUS_CODES[status]
+        if status is not AnnotationStatus.ANNOTATED:
+            continue
+        box_array = BoxArray.from_yolo(text)
+        out_of_range = (
+            (box_array.x < -OUT_OF_RANGE_TOLERANCE)
+            | (box_array.y < -OUT_OF_RANGE_TOLERANCE)
+            | (box_array.x + box_array.w > 1 + OUT_OF_RANGE_TOLERANCE)
+            | (box_array.y + box_array.h > 1 + OUT_OF_RANGE_TOLERANCE)
+            | (box_array.w <= 0)
+            | (box_array.h <= 0)
+        )
+        items["n_boxes"][row] = len(box_array)
+        items["n_out_of_range"][row] = np.count_nonzero(out_of_range)
+        boxes.append(box_array)
+
+    columns = dict(items)
+    for field, dtype in BOX_FIELDS.items():
+        parts = [getattr(box_array, field).astype(dtype) for box_array in boxes]
+        columns[field] = np.concatenate(parts) if parts else np.zeros(0, dtype)
+    return columns
+
+
+# Per-process state of the pool workers, set by `_init_worker`
+_worker_state: dict = {}
+
+
+def _init_worker(data_loader: DataLoaderProtocol):
+    _worker_state["data_loader"] = data_loader
+
+
+def _scan_chunk(indices: list[int]) -> dict[str, np.ndarray]:
+    return scan_annotations(_worker_state["data_loader"], indices)
+
+
+def concat_columns(parts: list[dict[str, np.ndarray]]) -> dict[str, np.ndarray]:
+    fields = {**ITEM_FIELDS, **BOX_FIELDS}
+    return {
+        field: np.concatenate([part[field] for part in parts]) if parts else np.zeros(0, dtype)
+        for field, dtype in fields.items()
+    }
+
+
+def gather_columns(columns: dict[str, np.ndarray], rows: np.ndarray) -> dict[str, np.ndarray]:
+    """Select item `rows`, together with their boxes, from item/box columns."""
+    starts = np.concatenate([[0], np.cumsum(columns["n_boxes"], dtype=np.int64)[:-1]])
+    counts = columns["n_boxes"][rows].astype(np.int64)
+    # box positions of every selected item, without a Python loop
+    box_rows = (
+        np.repeat(starts[rows] - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+        + np.arange(counts.sum())
+    )
+    result = {field: columns[field][rows] for field in ITEM_FIELDS}
+    result.update({field: columns[field][box_rows] for field in BOX_FIELDS})
+    return result
+
+
+class DatasetStatistics:
+    """Statistics of all annotations of a dataset, from item and box columns."""
+
+    def __init__(self, columns: dict[str, np.ndarray], rescanned: int = 0):
+        self.columns = columns
+        self.rescanned = rescanned  # items parsed, i.e., not taken from the cache
+
+    @classmethod
+    def compute(
+        cls,
+        data_loader: DataLoaderProtocol,
+        cache_path: str | None = None,
+        workers: int | None = None,
+        chunk_size: int = 2000,
+        min_parallel: int = 20000,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> "DatasetStatistics":
+        """Scan all annotations, reusing cached results of unchanged items.
+
+        Items are matched to the cache by name and `annotation_stamp`. Scans of
+        at least `min_parallel` items run in a process pool, smaller ones inline.
+        """
+        total = len(data_loader)
+        keys = np.fromiter(
+            (name_key(name) for name in data_loader.data_item_name_list), np.uint64, total
+        )
+        stamps = np.fromiter(
+            (data_loader.annotation_stamp(index) for index in range(total)), np.uint64, total
+        )
+
+        cached = cls._load_cache(cache_path)
+        reused = np.full(total, -1, dtype=np.int64)  # row in the cache, or -1
+        if cached is not None:
+            cached_row = {key: row for row, key in enumerate(cached["key"].tolist())}
+            rows = np.fromiter((cached_row.get(key, -1) for key in keys.tolist()), np.int64, total)
+            hit = rows >= 0
+            hit[hit] = cached["stamp"][rows[hit]] == stamps[hit]
+            reused[hit] = rows[hit]
+
+        to_scan = np.flatnonzero(reused < 0).tolist()
+        chunks = [to_scan[i:i + chunk_size] for i in range(0, len(to_scan), chunk_size)]
+        parts = []
+        if len(to_scan) >= min_parallel:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(
+                max_workers=workers or os.cpu_count(),
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(data_loader,),
+            ) as executor:
+                for part in executor.map(_scan_chunk, chunks):
+                    parts.append(part)
+                    if progress is not None:
+                        progress(sum(len(p["status"]) for p in parts), len(to_scan))
+        else:
+            for chunk in chunks:
+                parts.append(scan_annotations(data_loader, chunk))
+                if progress is not None:
+                    progress(sum(len(p["status"]) for p in parts), len(to_scan))
+        scanned = concat_columns(parts)
+
+        # merge cached and scanned items back into item order
+        if cached is not None and np.any(reused >= 0):
+            pool = concat_columns([cached, scanned])
+            source = reused.copy()
+            source[reused < 0] = len(cached["key"]) + np.arange(len(to_scan))
+            columns = gather_columns(pool, source)
+        else:
+            columns = scanned
+        columns["key"] = keys
+        columns["stamp"] = stamps
+
+        statistics = cls(columns, rescanned=len(to_scan))
+        if cache_path is not None and to_scan:
+            statistics.save_cache(cache_path)
+        return statistics
+
+    @staticmethod
+    def _load_cache(cache_path: str | None) -> dict[str, np.ndarray] | None:
+        if cache_path is None:
+            return None
+        try:
+            with np.load(cache_path) as data:
+                return {field: data[field] for field in {**ITEM_FIELDS, **BOX_FIELDS}}
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def save_cache(self, cache_path: str):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+        np.savez(temp_path, **self.columns)
+        os.replace(temp_path, cache_path)
+
+    @property
+    def n_items(self) -> int:
+        return len(self.columns["status"])
+
+    @property
+    def n_boxes(self) -> int:
+        return len(self.columns["class_id"])
+
+    def status_counts(self) -> dict[str, int]:
+        counts = np.bincount(self.columns["status"], minlength=len(STATUSES))
+        return {status.value: int(count) for status, count in zip(STATUSES, counts)}
+
+    def class_histogram(self) -> dict[int, int]:
+        # `unique` rather than `bincount`, e.g., for huge ids, or negative ones in a cache of an older scan
+        class_ids, counts = np.unique(self.columns["class_id"], return_counts=True)
+        return {int(class_id): int(count) for class_id, count in zip(class_ids, counts)}
+
+    def boxes_per_image_histogram(self) -> dict[int, int]:
+        counts = np.bincount(self.columns["n_boxes"])
+        return {n_boxes: int(count) for n_boxes, count in enumerate(counts) if count}
+
+    def box_size_histogram(self) -> tuple[list[int], list[float]]:
+        """Histogram of sqrt(w * h), i.e., the normalized box side length."""
+        sizes = np.sqrt(np.clip(self.columns["w"] * self.columns["h"], 0, None))
+        counts, edges = np.histogram(sizes, bins=SIZE_BINS)
+        return counts.tolist(), edges.tolist()
+
+    def aspect_histogram(self) -> tuple[list[int], list[float]]:
+        """Histogram of log2(w / h) of boxes with a positive size."""
+        w, h = self.columns["w"], self.columns["h"]
+        valid = (w > 0) & (h > 0)
+        counts, edges = np.histogram(np.log2(w[valid] / h[valid]), bins=ASPECT_BINS)
+        return counts.tolist(), edges.tolist()
+
+    def to_dict(self) -> dict:
+        size_counts, size_edges = self.box_size_histogram()
+        aspect_counts, aspect_edges = self.aspect_histogram()
+        return {
+            "n_items": self.n_items,
+            "n_boxes": self.n_boxes,
+            "status_counts": self.status_counts(),
+            "n_out_of_range_boxes": int(self.columns["n_out_of_range"].sum()),
+            "n_items_with_out_of_range_boxes": int(np.count_nonzero(self.columns["n_out_of_range"])),
+            "class_histogram": self.class_histogram(),
+            "boxes_per_image_histogram": self.boxes_per_image_histogram(),
+            "box_size_histogram": {"counts": size_counts, "bin_edges": size_edges},
+            "box_aspect_log2_histogram": {"counts": aspect_counts, "bin_edges": aspect_edges},
+        }
+
+    def export_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
@@ -0,0 +1,248 @@
+# Author: Tao Wen
+# Description:
+#   find duplicate and near-duplicate images by perceptual hashes,
+#   e.g., repeated frames extracted from video. Hashes are computed
+#   from reduced decodes in a process pool and cached per item.
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from typing import Callable
+from typing_ import DataLoaderProtocol
+from dataset_stats import name_key
+from zip_index import CACHE_DIR
+from PIL import Image
+import hashlib
+import multiprocessing
+import os
+import numpy as np
+
+HASH_BITS = 64
+DECODE_SIZE = (64, 64)  # hashes need at most 32x32 pixels, so decode at 1/2 to 1/8
+
+
+def _bits_to_hash(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def average_hash(image: Image.Image) -> int:
+    """aHash: which pixels of an 8x8 thumbnail are brighter than its mean."""
+    pixels = np.asarray(image.convert("L").resize((8, 8), Image.Resampling.BOX), dtype=np.float32)
+    return _bits_to_hash(pixels > pixels.mean())
+
+
+def difference_hash(image: Image.Image) -> int:
+    """dHash: whether brightness increases between horizontal neighbours of a 9x8 thumbnail."""
+    pixels = np.asarray(image.convert("L").resize((9, 8), Image.Resampling.BOX), dtype=np.int16)
+    return _bits_to_hash(pixels[:, 1:] > pixels[:, :-1])
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    return np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)).astype(np.float32)
+
+
+_DCT_32 = _dct_matrix(32)
+
+
+def perceptual_hash(image: Image.Image) -> int:
+    """pHash: the 8x8 lowest frequencies of the DCT of a 32x32 thumbnail, against their median."""
+    pixels = np.asarray(image.convert("L").resize((32, 32), Image.Resampling.BOX), dtype=np.float32)
+    low = (_DCT_32 @ pixels @ _DCT_32.T)[:8, :8]
+    return _bits_to_hash(low > np.median(low))
+
+
+HASHES: dict[str, Callable[[Image.Image], int]] = {
+    "ahash": average_hash,
+    "dhash": difference_hash,
+    "phash": perceptual_hash,
+}
+
+
+def hash_cache_path(dataset_path: str, method: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(dataset_path).encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"hashes-{method}-{digest}.npz")
+
+
+def hash_items(data_loader: DataLoaderProtocol, indices, method: str) -> tuple[np.ndarray, np.ndarray]:
+    """Hashes of `indices`, and whether each image could be decoded."""
+    indices = list(indices)
+    function = HASHES[method]
+    hashes = np.zeros(len(indices), np.uint64)
+    valid = np.zeros(len(indices), np.bool_)
+    for row, index in enumerate(indices):
+        try:
+            item = data_loader.get_item_by_index(index, target_size=DECODE_SIZE)
+            hashes[row] = function(item.image)
+            valid[row] = True
+        except (OSError, ValueError):  # missing, truncated or not an image
+            pass
+    return hashes, valid
+
+
+# Per-process state of the pool workers, set by `_init_worker`
+_worker_state: dict = {}
+
+
+def _init_worker(data_loader: DataLoaderProtocol, method: str):
+    _worker_state["data_loader"] = data_loader
+    _worker_state["method"] = method
+
+
+def _hash_chunk(indices: list[int]) -> tuple[np.ndarray, np.ndarray]:
+    return hash_items(_worker_state["data_loader"], indices, _worker_state["method"])
+
+
+def compute_hashes(
+    data_loader: DataLoaderProtocol,
+    method: str = "dhash",
+    cache_path: str | None = None,
+    workers: int | None = None,
+    chunk_size: int = 500,
+    min_parallel: int = 2000,
+    progress: Callable[[int, int], None] | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Hash every item, reusing cached hashes of unchanged images.
+
+    Items are matched to the cache by name and `image_stamp`. At least
+    `min_parallel` images are hashed in a process pool, fewer inline.
+    Returns the hashes and whether each image could be decoded.
+    """
+    total = len(data_loader)
+    keys = np.fromiter(
+        (name_key(name) for name in data_loader.data_item_name_list), np.uint64, total
+    )
+    stamps = np.fromiter(
+        (data_loader.image_stamp(index) for index in range(total)), np.uint64, total
+    )
+    hashes = np.zeros(total, np.uint64)
+    valid = np.zeros(total, np.bool_)
+    done = np.zeros(total, np.bool_)
+
+    cached = _load_cache(cache_path)
+    if cached is not None:
+        cached_row = {key: row for row, key in enumerate(cached["key"].tolist())}
+        rows = np.fromiter((cached_row.get(key, -1) for key in keys.tolist()), np.int64, total)
+        done = rows >= 0
+        done[done] = cached["stamp"][rows[done]] == stamps[done]
+        hashes[done] = cached["hash"][rows[done]]
+        valid[done] = cached["valid"][rows[done]]
+
+    to_hash = np.flatnonzero(~done).tolist()
+    chunks = [to_hash[i:i + chunk_size] for i in range(0, len(to_hash), chunk_size)]
+    if len(to_hash) >= min_parallel:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(data_loader, method),
+        ) as executor:
+            results = executor.map(_hash_chunk, chunks)
+            _collect(chunks, results, hashes, valid, progress)
+    else:
+        results = (hash_items(data_loader, chunk, method) for chunk in chunks)
+        _collect(chunks, results, hashes, valid, progress)
+
+    if cache_path is not None and to_hash:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+        np.savez(temp_path, key=keys, stamp=stamps, hash=hashes, valid=valid)
+        os.replace(temp_path, cache_path)
+    return hashes, valid
+
+
+def _collect(chunks, results, hashes: np.ndarray, valid: np.ndarray, progress):
+    finished, total = 0, sum(len(chunk) for chunk in chunks)
+    for chunk, (chunk_hashes, chunk_valid) in zip(chunks, results):
+        hashes[chunk] = chunk_hashes
+        valid[chunk] = chunk_valid
+        finished += len(chunk)
+        if progress is not None:
+            progress(finished, total)
+
+
+def _load_cache(cache_path: str | None) -> dict[str, np.ndarray] | None:
+    if cache_path is None:
+        return None
+    try:
+        with np.load(cache_path) as data:
+            return {field: data[field] for field in ("key", "stamp", "hash", "valid")}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def hamming_distance(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.bitwise_count(np.bitwise_xor(a, b))
+
+
+def near_pairs(hashes: np.ndarray, max_distance: int) -> tuple[np.ndarray, np.ndarray]:
+    """Pairs (i, j), i < j, of distinct `hashes` within `max_distance` bits, by multi-index hashing.
+
+    The bits are split into `m` chunks about log2(n) bits wide, so a chunk
+    value is shared by few hashes. Two hashes within `max_distance` bits
+    differ in at most `max_distance // m` bits of some chunk, so each hash
+    only looks up the chunk values that close to its own, in sorted chunks.
+    """
+    n = len(hashes)
+    n_chunks = max(1, HASH_BITS // max(1, int(np.ceil(np.log2(max(n, 2))))))
+    radius = max_distance // n_chunks
+    widths = [HASH_BITS // n_chunks + (c < HASH_BITS % n_chunks) for c in range(n_chunks)]
+    first_parts, second_parts = [], []
+    shift = 0
+    for width in widths:
+        values = (hashes >> np.uint64(shift)) & np.uint64((1 << width) - 1)
+        shift += width
+        order = np.argsort(values)
+        sorted_values = values[order]
+        for flips in range(radius + 1):
+            for bits in combinations(range(width), flips):
+                mask = np.uint64(sum(1 << bit for bit in bits))
+                probes = values ^ mask
+                low = np.searchsorted(sorted_values, probes, "left")
+                counts = np.searchsorted(sorted_values, probes, "right") - low
+                # every hash against every hash in its probed bucket
+                i = np.repeat(np.arange(n), counts)
+                j = order[np.repeat(low - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+                keep = i < j
+                i, j = i[keep], j[keep]
+                near = hamming_distance(hashes[i], hashes[j]) <= max_distance
+                first_parts.append(i[near])
+                second_parts.append(j[near])
+    pairs = np.stack([np.concatenate(first_parts), np.concatenate(second_parts)], axis=1)
+    # a pair close in several chunks is found several times
+    pairs = np.unique(pairs, axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def connected_components(n: int, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Label of every node, i.e., the smallest node of its component, by min-label propagation."""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[first], labels[second])
+        updated = labels.copy()
+        np.minimum.at(updated, first, low)
+        np.minimum.at(updated, second, low)
+        updated = updated[updated]  # pointer jumping
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def find_duplicates(hashes: np.ndarray, valid: np.ndarray, max_distance: int = 0) -> list[np.ndarray]:
+    """Groups of item indices whose hashes are within `max_distance` bits, largest first.
+
+    Identical hashes are grouped first, so near-duplicates are only searched
+    among distinct hashes.
+    """
+    items = np.flatnonzero(valid)
+    distinct, inverse = np.unique(hashes[items], return_inverse=True)
+    if max_distance > 0:
+        labels = connected_components(len(distinct), *near_pairs(distinct, max_distance))
+    else:
+        labels = np.arange(len(distinct))
+    item_labels = labels[inverse]
+    order = np.argsort(item_labels, kind="stable")
+    _, starts, counts = np.unique(item_labels[order], return_index=True, return_counts=True)
+    groups = [items[order[start:start + count]] for start, count in zip(starts, counts) if count > 1]
+    groups.sort(key=len, reverse=True)
+    return groups
@@ -0,0 +1,189 @@
+# Author: Tao Wen
+# Description:
+#   detect images and annotations added, removed or modified in a folder
+#   while a job is still writing to it, by polling directory mtimes and
+#   diffing `os.scandir` listings of only the directories that changed.
+
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from zip_index import IMAGE_EXTENSIONS
+import os
+
+
+@dataclass
+class FolderChanges:
+    """Names, relative to the folder, of the images that changed since the last poll."""
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    modified: list[str] = field(default_factory=list)  # the image, or its annotation, changed
+    added_annotations: list[str] = field(default_factory=list)
+    removed_annotations: list[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.added or self.removed or self.modified
+            or self.added_annotations or self.removed_annotations
+        )
+
+
+def _is_tracked(name: str) -> bool:
+    return name.lower().endswith(IMAGE_EXTENSIONS) or name.endswith(".txt")
+
+
+def _stamp(stat: os.stat_result) -> int:
+    return stat.st_mtime_ns * 1_000_003 + stat.st_size
+
+
+class FolderWatcher:
+    """Snapshot of the directories, images and annotations of a folder, diffed by `poll()`.
+
+    Adding, removing or renaming a file changes the mtime of its directory,
+    so a poll stats every directory but lists only the changed ones. Files
+    rewritten in place do not touch their directory, so each poll also
+    re-lists a slice of about `sweep_entries` files, round robin.
+    """
+
+    def __init__(self, folder_path: str, recursive: bool = True, sweep_entries: int = 5000):
+        self._folder_path = folder_path
+        self._recursive = recursive
+        self._sweep_entries = sweep_entries
+        self._dir_mtimes: dict[str, int] = {}
+        self._entries: dict[str, dict[str, int]] = {}  # directory -> {name: stamp}
+        self._subdirs: dict[str, set[str]] = {}
+        self._sweep_order: list[str] = []  # sorted directories
+        self._sweep_next = ""  # the directory the next sweep starts at, kept by name across re-sorts
+
+    def snapshot(self, images: set[str] = frozenset(), annotations: set[str] = frozenset()) -> FolderChanges:
+        """Record the current state, once before polling, e.g., in a background thread.
+
+        Returns the changes against `images` and `annotations`, e.g., those a
+        loader listed before, so files written meanwhile are not missed.
+        """
+        self._walk("", FolderChanges())
+        self._sweep_order = sorted(self._dir_mtimes)
+
+        found = [name for entries in self._entries.values() for name in entries]
+        found_images = {name for name in found if not name.endswith(".txt")}
+        found_annotations = set(found) - found_images
+        changes = FolderChanges(
+            added=sorted(found_images - images),
+            removed=sorted(images - found_images),
+            added_annotations=sorted(found_annotations - annotations),
+            removed_annotations=sorted(annotations - found_annotations),
+        )
+        changed = set(changes.added_annotations) | set(changes.removed_annotations)
+        if changed:
+            changes.modified = [
+                name for name in found_images & images if name.rsplit(".", 1)[0] + ".txt" in changed
+            ]
+        return changes
+
+    def poll(self) -> FolderChanges:
+        changes = FolderChanges()
+        stale = []
+        for rel_dir, mtime in list(self._dir_mtimes.items()):
+            try:
+                if os.stat(self._path(rel_dir)).st_mtime_ns != mtime:
+                    stale.append(rel_dir)
+            except OSError:
+                stale.append(rel_dir)  # removed, listed below as empty
+
+        order = self._sweep_order
+        if order:
+            # the first directory at or after the one due, which may have been removed meanwhile
+            position = bisect_left(order, self._sweep_next) % len(order)
+            swept = visited = 0
+            while swept < self._sweep_entries and visited < len(order):
+                rel_dir = order[(position + visited) % len(order)]
+                visited += 1
+                stale.append(rel_dir)
+                swept += len(self._entries.get(rel_dir, ())) + 1
+            self._sweep_next = order[(position + visited) % len(order)]
+        for rel_dir in dict.fromkeys(stale):
+            if rel_dir in self._dir_mtimes:  # not removed with its parent meanwhile
+                self._rescan(rel_dir, changes)
+        if stale and changes:
+            self._sweep_order = sorted(self._dir_mtimes)
+        return changes
+
+    def _path(self, rel_dir: str) -> str:
+        return os.path.join(self._folder_path, rel_dir) if rel_dir else self._folder_path
+
+    def _list(self, rel_dir: str) -> tuple[int, dict[str, int], set[str]] | None:
+        try:
+            mtime = os.stat(self._path(rel_dir)).st_mtime_ns
+            entries, subdirs = {}, set()
+            with os.scandir(self._path(rel_dir)) as scan:
+                for entry in scan:
+                    name = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.add(name)
+                    elif _is_tracked(entry.name):
+                        entries[name] = _stamp(entry.stat())
+        except OSError:
+            return None
+        return mtime, entries, subdirs
+
+    def _walk(self, rel_dir: str, changes: FolderChanges):
+        """Record a directory that is new to the snapshot, and everything under it."""
+        listing = self._list(rel_dir)
+        if listing is None:
+            return
+        self._dir_mtimes[rel_dir], entries, subdirs = listing
+        self._entries[rel_dir] = entries
+        self._subdirs[rel_dir] = subdirs if self._recursive else set()
+        self._sort_changes(entries, {}, changes)
+        for subdir in self._subdirs[rel_dir]:
+            self._walk(subdir, changes)
+
+    def _forget(self, rel_dir: str, changes: FolderChanges):
+        """Drop a removed directory, and everything under it, from the snapshot."""
+        self._dir_mtimes.pop(rel_dir, None)
+        self._sort_changes({}, self._entries.pop(rel_dir, {}), changes)
+        for subdir in self._subdirs.pop(rel_dir, ()):
+            self._forget(subdir, changes)
+
+    def _rescan(self, rel_dir: str, changes: FolderChanges):
+        listing = self._list(rel_dir)
+        if listing is None:
+            if rel_dir:
+                self._forget(rel_dir, changes)
+            return
+        self._dir_mtimes[rel_dir], entries, subdirs = listing
+        self._sort_changes(entries, self._entries[rel_dir], changes)
+        self._entries[rel_dir] = entries
+        if self._recursive:
+            old_subdirs = self._subdirs[rel_dir]
+            self._subdirs[rel_dir] = subdirs
+            for subdir in old_subdirs - subdirs:
+                self._forget(subdir, changes)
+            for subdir in subdirs - old_subdirs:
+                self._walk(subdir, changes)
+
+    @staticmethod
+    def _sort_changes(new: dict[str, int], old: dict[str, int], changes: FolderChanges):
+        """Diff two listings of one directory into image and annotation changes."""
+        # images by annotation name, i.e., `to_annotation_path`
+        images_of: dict[str, list[str]] = {}
+        for name in new.keys() | old.keys():
+            if not name.endswith(".txt"):
+                images_of.setdefault(name.rsplit(".", 1)[0] + ".txt", []).append(name)
+
+        touched = set()
+        for name in new.keys() - old.keys():
+            if name.endswith(".txt"):
+                changes.added_annotations.append(name)
+                touched.update(images_of.get(name, ()))
+            else:
+                changes.added.append(name)
+        for name in old.keys() - new.keys():
+            if name.endswith(".txt"):
+                changes.removed_annotations.append(name)
+                touched.update(images_of.get(name, ()))
+            else:
+                changes.removed.append(name)
+        for name in new.keys() & old.keys():
+            if new[name] != old[name]:
+                touched.update(images_of.get(name, ()) if name.endswith(".txt") else (name,))
+        # added or removed images are reported as such, not as modified
+        changes.modified.extend(name for name in touched if name in new and name in old)
@@ -0,0 +1,155 @@
+# Author: Tao Wen
+# Description:
+#   keep recently used decoded and rendered images in memory,
+#   bounded by a byte budget instead of an entry count.
+
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, TYPE_CHECKING
+import threading
+
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+
+MiB = 1024 * 1024
+
+
+def image_nbytes(image: "Image.Image") -> int:
+    """Approximate the memory held by a decoded image."""
+    width, height = image.size
+    return width * height * len(image.getbands())
+
+
+def item_nbytes(item: Any) -> int:
+    """Approximate the memory held by a data item and its image."""
+    nbytes = image_nbytes(item.image)
+    annotation = getattr(item, "annotation", None)
+    if annotation:
+        nbytes += len(annotation)
+    return nbytes
+
+
+def frame_nbytes(frame: tuple[Any, "Image.Image"]) -> int:
+    """Approximate the memory held by a rendered frame, i.e., (item, image)."""
+    _, image = frame
+    return image_nbytes(image)
+
+
+class LRUCache:
+    """Thread-safe LRU cache evicting the least recently used entries over `max_bytes`."""
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int]):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key: Hashable) -> Any | None:
+        """Like `get`, without counting a hit or miss, e.g., to re-check after a counted lookup."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        nbytes = self._sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return  # never cache a single entry larger than the whole budget
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+
+    def discard(self, predicate: Callable[[Hashable], bool]):
+        """Remove all entries whose key matches `predicate`."""
+        with self._lock:
+            for key in [k for k in self._entries if predicate(k)]:
+                self.nbytes -= self._entries.pop(key)[1]
+
+    def remap(self, function: Callable[[Hashable], Hashable | None]):
+        """Re-key all entries by `function(key)`, in LRU order; entries mapped to None are removed."""
+        with self._lock:
+            entries = self._entries
+            self._entries = OrderedDict()
+            for key, (value, nbytes) in entries.items():
+                new_key = function(key)
+                if new_key is None:
+                    self.nbytes -= nbytes
+                else:
+                    self._entries[new_key] = (value, nbytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "nbytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class FrameCache:
+    """Two-level cache: decoded items by index and rendered frames by (index, size)."""
+
+    def __init__(self, original_budget: int = 512 * MiB, rendered_budget: int = 128 * MiB):
+        self.originals = LRUCache(original_budget, item_nbytes)
+        self.rendered = LRUCache(rendered_budget, frame_nbytes)
+
+    def invalidate(self, indices: Iterable[int]):
+        """Drop everything cached for the given items, e.g., edited ones."""
+        indices = set(indices)
+        if indices:
+            self.originals.discard(lambda key: key in indices)
+            self.rendered.discard(lambda key: key[0] in indices)
+
+    def remap(self, mapping: "np.ndarray"):
+        """Follow items to new indices, e.g., after a folder changed; `mapping[i]` is -1 if removed."""
+        def new_index(index: int) -> int | None:
+            if index >= len(mapping) or mapping[index] < 0:
+                return None
+            return int(mapping[index])
+
+        self.originals.remap(new_index)
+        self.rendered.remap(
+            lambda key: None if (index := new_index(key[0])) is None else (index, key[1])
+        )
+
+    def clear(self):
+        self.originals.clear()
+        self.rendered.clear()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {
+            "originals": self.originals.stats(),
+            "rendered": self.rendered.stats(),
+        }
@@ -0,0 +1,321 @@
+# Author: Tao Wen
+# Description:
+#   decode, resize and draw images through PIL or OpenCV,
+#   selected at runtime, e.g., whichever benchmarks faster here.
+
+from PIL import Image, ImageDraw, ImageFont
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Iterator
+import math
+import os
+import threading
+import time
+import numpy as np
+
+Size = tuple[int, int]
+
+BACKEND_ENV = "IMAGE_BACKEND"  # inherited by worker processes
+DPI = 96  # Standard DPI for most displays
+PPI = 72  # Points per inch, used in font metrics
+
+
+def fit_size(size: Size, bound: Size) -> Size:
+    """Largest size with the aspect ratio of `size` that fits in `bound`."""
+    width, height = size
+    scale = min(bound[0] / width, bound[1] / height)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def is_decoded_for(image: Image.Image, target_size: Size | None) -> bool:
+    """Check whether `image` has enough resolution to be shown at `target_size`."""
+    full_size = image.info.get("full_size")
+    if full_size is None:
+        return True
+    if target_size is None:
+        return False
+    width, height = fit_size(full_size, target_size)
+    return image.size[0] >= width and image.size[1] >= height
+
+
+def bound_factor(size: Size, max_size: Size) -> int:
+    """Smallest integer factor that shrinks `size` to fit in `max_size`."""
+    return max(1, math.ceil(max(size[0] / max_size[0], size[1] / max_size[1])))
+
+
+def reduce_by(image: Image.Image, factor: int) -> Image.Image:
+    """`image` shrunk by an integer `factor`, averaging where `Image.reduce` supports the mode."""
+    try:
+        return image.reduce(factor)
+    except ValueError:  # e.g., palette indices, which cannot be averaged
+        size = (math.ceil(image.size[0] / factor), math.ceil(image.size[1] / factor))
+        return image.resize(size, Image.Resampling.NEAREST)
+
+
+_decode_bound = threading.local()  # set by `bound_decoding`
+
+
+@contextmanager
+def bound_decoding(max_size: Size) -> Iterator[None]:
+    """Decode images opened without a `target_size` in this thread to fit in `max_size`,
+    e.g., to zoom into images too large to hold whole. Other threads are unaffected.
+    """
+    previous = getattr(_decode_bound, "max_size", None)
+    _decode_bound.max_size = max_size
+    try:
+        yield
+    finally:
+        _decode_bound.max_size = previous
+
+
+def get_line_height(font_size: float) -> float:
+    return font_size * DPI / PPI
+
+
+@lru_cache(maxsize=16)
+def load_font(font_size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    """Load the label font once per size, falling back to PIL's default font."""
+    try:
+        return ImageFont.truetype("arial.ttf", font_size)
+    except OSError:
+        return ImageFont.load_default(font_size)
+
+
+@lru_cache(maxsize=1024)
+def label_mask(text: str, font_size: int) -> Image.Image:
+    """Render a label once as a mask, so drawing it is a cheap `paste`."""
+    font = load_font(font_size)
+    _, _, right, bottom = font.getbbox(text)
+    mask = Image.new("L", (max(1, int(right)), max(1, int(bottom))))
+    ImageDraw.Draw(mask).text((0, 0), text, fill=255, font=font)
+    return mask
+
+
+@lru_cache(maxsize=64)
+def to_rgb(color: str) -> tuple[int, int, int]:
+    """`#RRGGBB` to an (r, g, b) tuple."""
+    value = int(color.lstrip("#"), 16)
+    return value >> 16, (value >> 8) & 0xFF, value & 0xFF
+
+
+class PILBackend:
+    name = "pil"
+
+    def open_image(self, fp, target_size: Size | None = None) -> Image.Image:
+        """Open an image, decoding at reduced resolution when it is shown at `target_size`.
+
+        JPEG uses DCT scaling (`Image.draft`), so only 1/2, 1/4 or 1/8 of the pixels
+        are decoded. Other formats are `reduce`d by an integer factor after decoding.
+        The full size of a reduced image is kept in `image.info["full_size"]`.
+        Without `target_size`, the image is decoded at full resolution, or to fit
+        the bound of `bound_decoding`: JPEG by DCT scaling, other formats are
+        decoded whole and reduced at once.
+        """
+        image = Image.open(fp)
+        full_size = image.size
+        if target_size is None:
+            max_size = getattr(_decode_bound, "max_size", None)
+            if max_size is None or bound_factor(full_size, max_size) == 1:
+                return image
+            if image.format == "JPEG":
+                # the DCT scale at or above the factor, `draft` picks it from the requested size
+                scale = min(8, 1 << (bound_factor(full_size, max_size) - 1).bit_length())
+                image.draft(None, (max(1, full_size[0] // scale), max(1, full_size[1] // scale)))
+            factor = bound_factor(image.size, max_size)
+            if factor >= 2:
+                image = reduce_by(image, factor)
+        else:
+            width, height = fit_size(full_size, target_size)
+            if image.format == "JPEG":
+                image.draft(None, (width, height))
+            elif image.mode in ("L", "RGB", "RGBA") and not getattr(image, "is_animated", False):
+                factor = min(full_size[0] // width, full_size[1] // height)
+                if factor >= 2:
+                    image = image.reduce(factor)
+
+        if image.size != full_size:
+            image.info["full_size"] = full_size
+        return image
+
+    def resize(self, image: Image.Image, size: Size) -> Image.Image:
+        return image.resize(fit_size(image.size, size), Image.Resampling.LANCZOS)
+
+    def draw_boxes(
+        self,
+        image: Image.Image,
+        class_ids: np.ndarray,
+        left: np.ndarray,
+        top: np.ndarray,
+        right: np.ndarray,
+        bottom: np.ndarray,
+        colors: list[str],
+        line_width: int,
+        font_size: int,
+    ) -> Image.Image:
+        """Draw boxes given as arrays of pixel coordinates in `image`, in place."""
+        draw = ImageDraw.Draw(image)
+        line_height = get_line_height(font_size)
+        for class_id, x1, y1, x2, y2 in zip(
+            class_ids.tolist(), left.tolist(), top.tolist(), right.tolist(), bottom.tolist()
+        ):
+            color = colors[class_id % len(colors)]
+            draw.rectangle([(x1, y1), (x2, y2)], outline=color, width=line_width)
+            image.paste(color, (int(x1), int(y1 - line_height)), label_mask(f"Class {class_id}", font_size))
+        return image
+
+
+class OpenCVBackend:
+    """`cv2.imdecode` with reduced decoding, `cv2.resize` with INTER_AREA and
+    `cv2.rectangle`/`putText` on the pixel array. Images are PIL images in and out.
+    """
+    name = "opencv"
+
+    REDUCED_FLAGS = {1: "IMREAD_COLOR", 2: "IMREAD_REDUCED_COLOR_2",
+                     4: "IMREAD_REDUCED_COLOR_4", 8: "IMREAD_REDUCED_COLOR_8"}
+
+    def __init__(self):
+        import cv2
+
+        self._cv2 = cv2
+
+    def open_image(self, fp, target_size: Size | None = None) -> Image.Image:
+        """Decode with `cv2.imdecode`, at 1/2, 1/4 or 1/8 when shown at `target_size`,
+        or to fit the bound of `bound_decoding` without one.
+
+        `fp` is a path or a `MemoryReader` over member bytes, read without copying.
+        Formats OpenCV cannot decode, e.g., GIF, fall back to PIL.
+        """
+        cv2 = self._cv2
+        if isinstance(fp, str):
+            data = np.fromfile(fp, dtype=np.uint8)
+        else:
+            data = np.frombuffer(fp.getbuffer(), dtype=np.uint8)
+
+        factor = 1
+        full_size = None
+        max_size = None if target_size is not None else getattr(_decode_bound, "max_size", None)
+        if target_size is not None or max_size is not None:
+            with Image.open(fp) as header:  # size only, nothing is decoded
+                full_size = header.size
+        if target_size is not None:
+            width, height = fit_size(full_size, target_size)
+            ratio = min(full_size[0] // width, full_size[1] // height)
+            while factor * 2 <= min(ratio, 8):
+                factor *= 2
+        elif max_size is not None:
+            factor = min(8, 1 << (bound_factor(full_size, max_size) - 1).bit_length())
+        pixels = cv2.imdecode(data, getattr(cv2, self.REDUCED_FLAGS[factor]))
+        if pixels is None:
+            if not isinstance(fp, str):
+                fp.seek(0)
+            return PILBackend().open_image(fp, target_size)
+
+        image = Image.fromarray(cv2.cvtColor(pixels, cv2.COLOR_BGR2RGB))
+        if max_size is not None and bound_factor(image.size, max_size) > 1:  # beyond 1/8
+            image = reduce_by(image, bound_factor(image.size, max_size))
+        if full_size is not None and image.size != full_size:
+            image.info["full_size"] = full_size
+        return image
+
+    def resize(self, image: Image.Image, size: Size) -> Image.Image:
+        # cv2 sees the raw array, e.g., palette indices of "P" or 16-bit "I;16" values
+        if image.mode not in ("L", "RGB", "RGBA"):
+            has_alpha = "A" in image.mode or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+        width, height = fit_size(image.size, size)
+        # INTER_AREA averages when shrinking, but is nearest-like when enlarging
+        interpolation = (
+            self._cv2.INTER_AREA if width < image.size[0] else self._cv2.INTER_LINEAR
+        )
+        return Image.fromarray(
+            self._cv2.resize(np.asarray(image), (width, height), interpolation=interpolation)
+        )
+
+    def draw_boxes(
+        self,
+        image: Image.Image,
+        class_ids: np.ndarray,
+        left: np.ndarray,
+        top: np.ndarray,
+        right: np.ndarray,
+        bottom: np.ndarray,
+        colors: list[str],
+        line_width: int,
+        font_size: int,
+    ) -> Image.Image:
+        """Draw boxes given as arrays of pixel coordinates on a copy of `image`."""
+        cv2 = self._cv2
+        pixels = np.array(image.convert("RGB"))
+        font_scale = font_size / 30  # HERSHEY_SIMPLEX is about 30 px high at scale 1
+        corners = np.stack([left, top, right, bottom], axis=1).round().astype(np.int32)
+        for class_id, (x1, y1, x2, y2) in zip(class_ids.tolist(), corners.tolist()):
+            color = to_rgb(colors[class_id % len(colors)])
+            cv2.rectangle(pixels, (x1, y1), (x2, y2), color, line_width)
+            cv2.putText(pixels, f"Class {class_id}", (x1, y1 - line_width),
+                        cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, 2, cv2.LINE_AA)
+        return Image.fromarray(pixels)
+
+
+BACKENDS = {"pil": PILBackend, "opencv": OpenCVBackend}
+_backend = None
+_thread_backend = threading.local()  # set by `use_backend`
+
+
+def get_backend() -> PILBackend | OpenCVBackend:
+    """The backend of this thread, see `use_backend`, else the selected one,
+    `$IMAGE_BACKEND` or PIL by default."""
+    backend = getattr(_thread_backend, "backend", None)
+    if backend is not None:
+        return backend
+    global _backend
+    if _backend is None:
+        _backend = BACKENDS[os.environ.get(BACKEND_ENV, "pil")]()
+    return _backend
+
+
+def set_backend(name: str):
+    """Select the backend by name, for this process and the worker processes it starts."""
+    global _backend
+    _backend = BACKENDS[name]()
+    os.environ[BACKEND_ENV] = name
+
+
+@contextmanager
+def use_backend(backend: PILBackend | OpenCVBackend) -> Iterator[None]:
+    """Decode, resize and draw through `backend` in this thread only, other threads are unaffected."""
+    previous = getattr(_thread_backend, "backend", None)
+    _thread_backend.backend = backend
+    try:
+        yield
+    finally:
+        _thread_backend.backend = previous
+
+
+def benchmark_backends(
+    data_loader: Any, visualizer: Any, size: Size | None, samples: int = 20
+) -> dict[str, float]:
+    """Seconds per item to decode, resize and draw a sample of `data_loader` with each backend.
+
+    Each backend runs as a thread-local instance, see `use_backend`, so the
+    selected backend is never switched under other threads. The backends
+    take turns going first on each item, so neither always reads from a
+    page cache the other has warmed. Backends that cannot be loaded, e.g.,
+    without opencv-python, are left out.
+    """
+    step = max(1, len(data_loader) // samples)
+    indices = range(0, len(data_loader), step)[:samples]
+    backends = {}
+    for name, backend_class in BACKENDS.items():
+        try:
+            backends[name] = backend_class()
+        except ImportError:
+            continue
+    elapsed = dict.fromkeys(backends, 0.0)
+    for turn, index in enumerate(indices):
+        names = list(backends)
+        for name in names[turn % len(names):] + names[:turn % len(names)]:
+            with use_backend(backends[name]):
+                start = time.perf_counter()
+                visualizer.to_drawn_image(data_loader.get_item_by_index(index, target_size=size), size)
+                elapsed[name] += time.perf_counter() - start
+    return {name: seconds / max(1, len(indices)) for name, seconds in elapsed.items()}
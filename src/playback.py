@@ -0,0 +1,128 @@
+# Author: Tao Wen
+# Description:
+#   play a dataset as a sequence at a target frame rate, rendering
+#   upcoming frames in background threads and dropping late ones.
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from tkinter import Misc
+from typing import Any, Callable
+import time
+
+Size = tuple[int, int] | None
+RenderFunc = Callable[[int, Size], Any]
+FrameCallback = Callable[[int, Any], None]
+
+
+class PlaybackScheduler:
+    """Show frames at `fps` from a decode-ahead queue filled by worker threads.
+
+    Each frame has a deadline on the playback clock. On every tick the newest
+    frame that is due and ready is shown, and the due frames before it are
+    dropped, so a slow render skips frames instead of slowing playback down.
+    All methods and callbacks run on the Tk thread.
+    """
+
+    def __init__(
+        self,
+        master: Misc,
+        render: RenderFunc,
+        on_frame: FrameCallback,
+        fps: float = 30.0,
+        depth: int = 8,
+        max_workers: int = 2,
+    ):
+        self._master = master
+        self._render = render
+        self._on_frame = on_frame
+        self.fps = fps
+        self._depth = depth
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="playback"
+        )
+        self._queue: dict[int, Future] = {}
+        self._timer: str | None = None
+        self._shown_times: deque[float] = deque(maxlen=60)
+        self.on_end: Callable[[], None] | None = None
+        self.dropped = 0
+
+    @property
+    def playing(self) -> bool:
+        return self._timer is not None
+
+    def start(self, index: int, length: int, size: Size):
+        """Play from the frame after `index`, which is the one on screen."""
+        self.stop()
+        self._length = length
+        self._size = size
+        self._start_index = self._shown = index
+        self._start_time = time.perf_counter()
+        self._shown_times.clear()
+        self.dropped = 0
+        self._fill(index + 1)
+        self._timer = self._master.after(self._delay_to(index + 1), self._tick)
+
+    def stop(self):
+        if self._timer is not None:
+            self._master.after_cancel(self._timer)
+            self._timer = None
+        for future in self._queue.values():
+            future.cancel()
+        self._queue.clear()
+
+    def shutdown(self):
+        self.stop()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def achieved_fps(self) -> float:
+        """Frames shown per second over the last couple of seconds."""
+        if len(self._shown_times) < 2:
+            return 0.0
+        return (len(self._shown_times) - 1) / (self._shown_times[-1] - self._shown_times[0])
+
+    def _due_index(self, now: float) -> int:
+        return min(self._start_index + int((now - self._start_time) * self.fps), self._length - 1)
+
+    def _delay_to(self, index: int) -> int:
+        """Milliseconds until the deadline of frame `index`."""
+        deadline = self._start_time + (index - self._start_index) / self.fps
+        return max(1, int((deadline - time.perf_counter()) * 1000))
+
+    def _fill(self, first: int):
+        """Queue rendering of the next `depth` frames from `first`, dropping older ones.
+
+        Late frames still being rendered are kept, so they can be shown if
+        nothing newer is ready by the next tick.
+        """
+        for index in [i for i in self._queue if i < first]:
+            future = self._queue[index]
+            if index <= self._shown or future.cancel() or future.done():
+                del self._queue[index]
+        for index in range(first, min(first + self._depth, self._length)):
+            if index not in self._queue:
+                self._queue[index] = self._executor.submit(self._render, index, self._size)
+
+    def _tick(self):
+        now = time.perf_counter()
+        due = self._due_index(now)
+        for index in range(due, self._shown, -1):
+            future = self._queue.get(index)
+            if future is not None and future.done() and not future.cancelled() and future.exception() is None:
+                self.dropped += index - self._shown - 1
+                self._shown = index
+                self._shown_times.append(now)
+                self._on_frame(index, future.result())
+                break
+
+        last = self._queue.get(self._length - 1)
+        if self._shown >= self._length - 1 or (
+            due == self._length - 1 and last is not None and last.done() and last.exception() is not None
+        ):
+            self.dropped += self._length - 1 - self._shown
+            self._timer = None
+            self.stop()
+            if self.on_end is not None:
+                self.on_end()
+            return
+        self._fill(max(self._shown + 1, due))
+        self._timer = self._master.after(self._delay_to(max(self._shown, due) + 1), self._tick)
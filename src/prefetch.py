@@ -0,0 +1,131 @@
+# Author: Tao Wen
+# Description:
+#   render neighbor frames in background threads,
+#   so that navigation does not block the Tk thread.
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from tkinter import Misc
+from typing import Any, Callable
+import threading
+
+Size = tuple[int, int] | None
+FrameKey = tuple[int, Size]
+RenderFunc = Callable[[int, Size], Any]
+FrameCallback = Callable[[Any], None]
+
+
+class PrefetchScheduler:
+    """Render the next/previous frames ahead of navigation in a bounded thread pool.
+
+    Finished frames are handed back to Tk through `master.after()`,
+    so callbacks always run on the Tk thread.
+    """
+
+    def __init__(
+        self,
+        master: Misc,
+        render: RenderFunc,
+        depth: int = 4,
+        max_workers: int = 2,
+    ):
+        self._master = master
+        self._render = render
+        self._depth = depth
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="prefetch"
+        )
+        self._lock = threading.RLock()
+        self._pending: dict[FrameKey, Future] = {}
+        self._ready: dict[FrameKey, Any] = {}
+        self._generation = 0
+
+    def reset(self):
+        """Drop all pending and finished work, e.g., when the dataset changes."""
+        with self._lock:
+            self._generation += 1
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+            self._ready.clear()
+
+    def request(self, index: int, size: Size, callback: FrameCallback):
+        """Render `index` with priority and call `callback(frame)` on the Tk thread."""
+        key = (index, size)
+        with self._lock:
+            frame = self._ready.get(key)
+            if frame is None:
+                future = self._pending.get(key)
+                if future is None or future.cancelled():
+                    future = self._submit(key)
+                future.add_done_callback(
+                    lambda f, g=self._generation: self._on_done(key, g, f, callback)
+                )
+                return
+        callback(frame)
+
+    def schedule(self, index: int, size: Size, direction: int, length: int):
+        """Prefetch `depth` items after `index` in the scroll `direction`.
+
+        Work outside of the new window is cancelled (if not yet started)
+        and finished frames outside of the window are released.
+        """
+        wanted = {
+            ((index + direction * step) % length, size)
+            for step in range(1, min(self._depth, length - 1) + 1)
+        }
+        keep = wanted | {(index, size)}
+        with self._lock:
+            for key in list(self._pending):
+                if key not in keep:
+                    self._pending.pop(key).cancel()
+            for key in list(self._ready):
+                if key not in keep:
+                    del self._ready[key]
+            for key in sorted(wanted, key=lambda k: (k[0] - index) * direction % length):
+                if key not in self._pending and key not in self._ready:
+                    self._submit(key)
+
+    def shutdown(self):
+        self.reset()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, key: FrameKey) -> Future:
+        # NOTE: must be called with the lock held
+        future = self._executor.submit(self._render, *key)
+        self._pending[key] = future
+        future.add_done_callback(
+            lambda f, g=self._generation: self._on_done(key, g, f, None)
+        )
+        return future
+
+    def _on_done(
+        self,
+        key: FrameKey,
+        generation: int,
+        future: Future,
+        callback: FrameCallback | None,
+    ):
+        # NOTE: runs in the worker thread
+        if future.cancelled():
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            if self._pending.get(key) is future:
+                del self._pending[key]
+            error = future.exception()
+            if error is None:
+                self._ready[key] = future.result()
+        if callback is None:
+            return
+        try:
+            if error is None:
+                self._master.after(0, callback, future.result())
+            else:
+                self._master.after(0, _reraise, error)
+        except RuntimeError:
+            pass  # main loop is gone
+
+
+def _reraise(error: BaseException):
+    raise error
@@ -0,0 +1,104 @@
+# Author: Tao Wen
+# Description:
+#   time the stages of loading and showing an image, e.g., zip read,
+#   decode, box parsing, drawing and resizing, with rolling percentiles
+#   and an export as Chrome trace events (chrome://tracing, Perfetto).
+
+from collections import deque
+from contextlib import nullcontext
+import json
+import os
+import threading
+import time
+
+_DISABLED = nullcontext()
+
+
+class _Span:
+    __slots__ = ("_profiler", "_name", "_start")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+
+    def __exit__(self, *exc_info):
+        self._profiler.record(self._name, self._start, time.perf_counter_ns())
+
+
+class Profiler:
+    """Per-stage durations in rolling windows, and the spans as trace events.
+
+    Disabled, `stage()` returns a shared no-op context manager, so the
+    instrumented code pays one call and nothing is recorded.
+    """
+
+    def __init__(self, window: int = 200, max_events: int = 100_000):
+        self.enabled = False
+        self._window = window
+        self._durations: dict[str, deque[int]] = {}
+        self._events: deque[tuple[str, int, int, int]] = deque(maxlen=max_events)
+        self._thread_names: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str):
+        """Time the `with` block as stage `name`."""
+        if not self.enabled:
+            return _DISABLED
+        return _Span(self, name)
+
+    def record(self, name: str, start_ns: int, end_ns: int):
+        thread = threading.current_thread()
+        durations = self._durations.get(name)
+        if durations is None:
+            with self._lock:
+                durations = self._durations.setdefault(name, deque(maxlen=self._window))
+        durations.append(end_ns - start_ns)
+        self._events.append((name, start_ns, end_ns, thread.ident))
+        self._thread_names.setdefault(thread.ident, thread.name)
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._events.clear()
+
+    def summary(self) -> dict[str, tuple[float, float, int]]:
+        """(p50, p95) in milliseconds and the number of samples, per stage."""
+        import numpy as np
+
+        with self._lock:
+            stages = list(self._durations.items())
+        result = {}
+        for name, durations in stages:
+            samples = np.array(durations, dtype=np.float64) / 1e6
+            if len(samples):
+                p50, p95 = np.percentile(samples, [50, 95])
+                result[name] = (float(p50), float(p95), len(samples))
+        return result
+
+    def format_summary(self) -> str:
+        return "  ".join(
+            f"{name} {p50:.1f}/{p95:.1f}ms" for name, (p50, p95, _) in self.summary().items()
+        )
+
+    def export_chrome_trace(self, path: str):
+        """Write the recorded spans as complete ("X") events of the Trace Event Format."""
+        pid = os.getpid()
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in list(self._thread_names.items())
+        ]
+        events.extend(
+            {"name": name, "ph": "X", "pid": pid, "tid": tid,
+             "ts": start / 1000, "dur": (end - start) / 1000}
+            for name, start, end, tid in list(self._events)
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+# shared by the loaders, the visualizer and the browser
+PROFILER = Profiler()
+stage = PROFILER.stage
@@ -0,0 +1,205 @@
+# Author: Tao Wen
+# Description:
+#   inverted index over a dataset for instant filtering, i.e.,
+#   class_id -> item indices, box counts and a sorted name array,
+#   and a loader view showing only the matching items.
+
+from bisect import bisect_left, insort
+from collections.abc import Sequence
+from typing_ import DataLoaderProtocol, DataItemProtocol
+from annotation_status import AnnotationStatus, classify_annotation
+from data_item import BoxArray
+from dataset_stats import DatasetStatistics
+import re
+import numpy as np
+
+QUERY_TOKEN = re.compile(r"(class|boxes|name|re)\s*(:|>=|<=|>|<|=)\s*(\S+)")
+
+
+class SearchIndex:
+    """Class postings, box counts and sorted names of all items of a loader."""
+
+    def __init__(self, names: Sequence[str], n_boxes: np.ndarray, class_items: dict[int, np.ndarray]):
+        self._names = names
+        self._n_boxes = n_boxes
+        self._class_items = class_items  # sorted unique item indices per class
+        self._name_order = sorted(range(len(names)), key=names.__getitem__)
+
+    @classmethod
+    def from_statistics(cls, names: Sequence[str], stats: DatasetStatistics) -> "SearchIndex":
+        columns = stats.columns
+        n_boxes = columns["n_boxes"].astype(np.int32)
+        box_items = np.repeat(np.arange(len(n_boxes), dtype=np.int64), n_boxes)
+        # unique (class, item) pairs sorted by class, then item
+        pairs = np.unique(np.stack([columns["class_id"].astype(np.int64), box_items], axis=1), axis=0)
+        class_ids, starts = np.unique(pairs[:, 0], return_index=True)
+        ends = np.append(starts[1:], len(pairs))
+        class_items = {
+            int(class_id): pairs[start:end, 1]
+            for class_id, start, end in zip(class_ids, starts, ends)
+        }
+        return cls(names, n_boxes, class_items)
+
+    @classmethod
+    def build(cls, data_loader: DataLoaderProtocol, cache_path: str | None = None) -> "SearchIndex":
+        stats = DatasetStatistics.compute(data_loader, cache_path=cache_path)
+        return cls.from_statistics(data_loader.data_item_name_list, stats)
+
+    def __len__(self) -> int:
+        return len(self._n_boxes)
+
+    def class_ids(self) -> list[int]:
+        return sorted(self._class_items)
+
+    def items_with_class(self, class_id: int) -> np.ndarray:
+        return self._class_items.get(class_id, np.zeros(0, dtype=np.int64))
+
+    def items_with_box_count(self, low: int = 0, high: int | None = None) -> np.ndarray:
+        """Items with `low <= n_boxes <= high`."""
+        mask = self._n_boxes >= low
+        if high is not None:
+            mask &= self._n_boxes <= high
+        return np.flatnonzero(mask)
+
+    def items_with_prefix(self, prefix: str) -> np.ndarray:
+        """Items whose name starts with `prefix`, by bisecting the sorted names."""
+        key = self._names.__getitem__
+        low = bisect_left(self._name_order, prefix, key=key)
+        high = bisect_left(self._name_order, prefix + chr(0x10FFFF), key=key)
+        return np.sort(np.array(self._name_order[low:high], dtype=np.int64))
+
+    def items_matching(self, pattern: str) -> np.ndarray:
+        search = re.compile(pattern).search
+        return np.fromiter(
+            (index for index, name in enumerate(self._names) if search(name)), np.int64
+        )
+
+    def update_item(self, index: int, annotation: str | None):
+        """Re-index one item after its annotation changed, without rebuilding.
+
+        Like `DatasetStatistics`, an item without a well-formed annotation has no boxes.
+        """
+        if classify_annotation(annotation) is AnnotationStatus.ANNOTATED:
+            boxes = BoxArray.from_yolo(annotation)
+        else:
+            boxes = BoxArray.empty()
+        new_classes = set(np.unique(boxes.class_id).tolist())
+        for class_id, items in list(self._class_items.items()):
+            position = np.searchsorted(items, index)
+            present = position < len(items) and items[position] == index
+            if present and class_id not in new_classes:
+                self._class_items[class_id] = np.delete(items, position)
+            elif not present and class_id in new_classes:
+                self._class_items[class_id] = np.insert(items, position, index)
+        for class_id in new_classes - set(self._class_items):
+            self._class_items[class_id] = np.array([index], dtype=np.int64)
+        self._n_boxes[index] = len(boxes)
+
+    def remap(self, mapping: np.ndarray, length: int):
+        """Follow items to new indices, e.g., after a watched folder changed; `mapping[i]` is -1 if removed.
+
+        The names are expected to be the loader's list, already updated to
+        `length` items. Added items have no boxes until `update_item` indexes them.
+        """
+        kept = mapping >= 0
+        n_boxes = np.zeros(length, dtype=self._n_boxes.dtype)
+        n_boxes[mapping[kept]] = self._n_boxes[kept]
+        self._n_boxes = n_boxes
+        for class_id, items in list(self._class_items.items()):
+            items = mapping[items]
+            items = items[items >= 0]  # still sorted, as kept items keep their order
+            if len(items):
+                self._class_items[class_id] = items
+            else:
+                del self._class_items[class_id]
+
+        order = mapping[np.asarray(self._name_order, dtype=np.int64)]
+        self._name_order = order[order >= 0].tolist()
+        added = np.ones(length, dtype=bool)
+        added[mapping[kept]] = False
+        for index in np.flatnonzero(added).tolist():
+            insort(self._name_order, index, key=self._names.__getitem__)
+
+    def query(self, text: str) -> np.ndarray:
+        """Items matching all terms of `text`, e.g., `class:7 boxes>50 name:train/`.
+
+        Terms: `class:ID`, `boxes` with `>`, `>=`, `<`, `<=` or `=`, `name:PREFIX`
+        and `re:PATTERN`. A bare word is a name prefix.
+        """
+        result: np.ndarray | None = None
+        position = 0
+        terms = []
+        for match in QUERY_TOKEN.finditer(text):
+            terms.extend(("name", ":", word) for word in text[position:match.start()].split())
+            terms.append(match.groups())
+            position = match.end()
+        terms.extend(("name", ":", word) for word in text[position:].split())
+
+        for field, operator, value in terms:
+            if field == "class":
+                items = self.items_with_class(int(value))
+            elif field == "boxes":
+                count = int(value)
+                items = {
+                    ">": lambda: self.items_with_box_count(count + 1),
+                    ">=": lambda: self.items_with_box_count(count),
+                    "<": lambda: self.items_with_box_count(0, count - 1),
+                    "<=": lambda: self.items_with_box_count(0, count),
+                    "=": lambda: self.items_with_box_count(count, count),
+                    ":": lambda: self.items_with_box_count(count, count),
+                }[operator]()
+            elif field == "name":
+                items = self.items_with_prefix(value)
+            else:
+                items = self.items_matching(value)
+            result = items if result is None else np.intersect1d(result, items, assume_unique=True)
+        return np.arange(len(self)) if result is None else result
+
+
+class IndexedNames(Sequence):
+    """Names of the selected items, read lazily from the full name list."""
+
+    def __init__(self, names: Sequence[str], indices: np.ndarray):
+        self._names = names
+        self._indices = indices
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._names[index] for index in self._indices[position].tolist()]
+        return self._names[int(self._indices[position])]
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+
+class LoaderView(DataLoaderProtocol):
+    """The items `indices` of a loader, e.g., a search result, as a loader itself."""
+
+    def __init__(self, data_loader: DataLoaderProtocol, indices: np.ndarray):
+        self.base = data_loader
+        self.indices = indices
+        self._names = IndexedNames(data_loader.data_item_name_list, indices)
+
+    @property
+    def data_item_name_list(self) -> IndexedNames:
+        return self._names
+
+    def base_index(self, index: int) -> int:
+        return int(self.indices[index])
+
+    def get_item_by_index(
+        self, index: int, target_size: tuple[int, int] | None = None
+    ) -> DataItemProtocol:
+        return self.base.get_item_by_index(self.base_index(index), target_size=target_size)
+
+    def read_annotation(self, index: int) -> str | None:
+        return self.base.read_annotation(self.base_index(index))
+
+    def annotation_stamp(self, index: int) -> int:
+        return self.base.annotation_stamp(self.base_index(index))
+
+    def image_stamp(self, index: int) -> int:
+        return self.base.image_stamp(self.base_index(index))
+
+    def __len__(self) -> int:
+        return len(self.indices)
@@ -0,0 +1,166 @@
+# Author: Tao Wen
+# Description:
+#   persistent index of a directory of tar shards, e.g., WebDataset,
+#   i.e., the sorted image list, the shard/offset/size of every member
+#   and the image -> annotation pairing, so reopening reads no tar headers.
+
+from typing import Callable
+from zip_index import CACHE_DIR, IMAGE_EXTENSIONS, Cancelled, load_index_file, save_index_file
+import hashlib
+import os
+import tarfile
+import threading
+import numpy as np
+
+INDEX_MAGIC = b"TIDX"
+INDEX_VERSION = 1
+INDEX_NAME = ".tar.idx"
+SHARD_EXTENSION = ".tar"
+
+MEMBER_DTYPE = np.dtype([
+    ("shard", "<i4"),
+    ("offset", "<i8"),  # of the member data in the shard
+    ("size", "<i8"),
+    ("mtime", "<i8"),
+])
+
+
+def list_shards(folder_path: str) -> list[tuple[str, int, int]]:
+    """(name, size, mtime_ns) of the `.tar` shards in `folder_path`, sorted by name."""
+    from data_loader import name_with_left_pad
+
+    shards = []
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(SHARD_EXTENSION) and entry.is_file():
+                stat = entry.stat()
+                shards.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    shards.sort(key=lambda shard: name_with_left_pad(shard[0]))
+    return shards
+
+
+def index_paths(folder_path: str) -> list[str]:
+    """Candidate index locations: inside the shard directory, then the user cache."""
+    folder_path = os.path.abspath(folder_path)
+    digest = hashlib.sha1(folder_path.encode("utf-8")).hexdigest()
+    return [os.path.join(folder_path, INDEX_NAME), os.path.join(CACHE_DIR, digest + INDEX_NAME)]
+
+
+class TarIndex:
+    """Sorted image names and member locations of the tar shards of a directory."""
+
+    def __init__(
+        self,
+        image_names: list[str],
+        images: np.ndarray,
+        annotations: np.ndarray,
+        annotation_of: np.ndarray,
+        shards: list[tuple[str, int, int]],
+    ):
+        self.image_names = image_names
+        self.images = images  # MEMBER_DTYPE, one per image
+        self.annotations = annotations  # MEMBER_DTYPE, one per paired annotation
+        self.annotation_of = annotation_of  # int32, index into annotations or -1
+        self.shards = shards  # (name, size, mtime_ns), the stamp of the index
+
+    @classmethod
+    def open(
+        cls,
+        folder_path: str,
+        progress: Callable[[int, int], None] | None = None,
+        cancel: threading.Event | None = None,
+    ) -> "TarIndex":
+        """Load the persisted index if no shard has changed, otherwise (re)build it.
+
+        While building, `progress(done, total)` is called after every shard
+        and setting `cancel` raises `Cancelled`.
+        """
+        shards = list_shards(folder_path)
+        for path in index_paths(folder_path):
+            index = cls.load(path, shards)
+            if index is not None:
+                return index
+
+        index = cls.build(folder_path, shards, progress, cancel)
+        for path in index_paths(folder_path):
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                index.save(path)
+                break
+            except OSError:
+                continue  # e.g., read-only dataset folder, try the user cache
+        return index
+
+    @classmethod
+    def build(
+        cls,
+        folder_path: str,
+        shards: list[tuple[str, int, int]],
+        progress: Callable[[int, int], None] | None = None,
+        cancel: threading.Event | None = None,
+    ) -> "TarIndex":
+        """Read the member headers of every shard; the member data is skipped, not read."""
+        # imported here to avoid a circular import with data_loader
+        from data_loader import name_with_left_pad, to_annotation_path
+
+        images, annotations = [], {}
+        for shard, (shard_name, _, _) in enumerate(shards):
+            if cancel is not None and cancel.is_set():
+                raise Cancelled(folder_path)
+            with tarfile.open(os.path.join(folder_path, shard_name), "r:") as tar:
+                for member in tar:
+                    if not member.isfile():
+                        continue
+                    entry = (shard, member.offset_data, member.size, int(member.mtime))
+                    name = member.name
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        images.append((name, entry))
+                    elif name.endswith(".txt"):
+                        annotations[(shard, name)] = entry
+            if progress is not None:
+                progress(shard + 1, len(shards))
+
+        # same order as ZipIndex, shards only break ties between equal names
+        images.sort(key=lambda image: (os.path.dirname(image[0]), name_with_left_pad(image[0]), image[1][0]))
+        annotation_entries = []
+        annotation_of = np.full(len(images), -1, dtype=np.int32)
+        for i, (name, entry) in enumerate(images):
+            annotation = annotations.get((entry[0], to_annotation_path(name)))
+            if annotation is not None:
+                annotation_of[i] = len(annotation_entries)
+                annotation_entries.append(annotation)
+
+        return cls(
+            image_names=[name for name, _ in images],
+            images=np.array([entry for _, entry in images], dtype=MEMBER_DTYPE),
+            annotations=np.array(annotation_entries, dtype=MEMBER_DTYPE),
+            annotation_of=annotation_of,
+            shards=shards,
+        )
+
+    ARRAY_DTYPES = {
+        "images": MEMBER_DTYPE,
+        "annotations": MEMBER_DTYPE,
+        "annotation_of": np.dtype("<i4"),
+    }
+
+    def save(self, path: str):
+        """Write the index atomically, see `save_index_file`."""
+        header = {"shards": [list(shard) for shard in self.shards]}
+        arrays = {name: getattr(self, name) for name in self.ARRAY_DTYPES}
+        save_index_file(path, INDEX_MAGIC, INDEX_VERSION, header, self.image_names, arrays)
+
+    @classmethod
+    def load(cls, path: str, shards: list[tuple[str, int, int]]) -> "TarIndex | None":
+        """Memory-map a persisted index, or return None if it is missing or stale."""
+        loaded = load_index_file(
+            path, INDEX_MAGIC, INDEX_VERSION, cls.ARRAY_DTYPES,
+            lambda header: [tuple(shard) for shard in header["shards"]] == shards,
+        )
+        if loaded is None:
+            return None
+        _, image_names, arrays = loaded
+        return cls(image_names=image_names, shards=shards, **arrays)
+
+    def __len__(self) -> int:
+        return len(self.image_names)
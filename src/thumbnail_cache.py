@@ -0,0 +1,171 @@
+# Author: Tao Wen
+# Description:
+#   thumbnails of dataset items, rendered in worker threads with reduced
+#   decoding and kept in a content-addressed, size-capped on-disk cache.
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from tkinter import Misc
+from typing import Callable
+from typing_ import DataLoaderProtocol
+from zip_index import CACHE_DIR
+from PIL import Image
+import hashlib
+import os
+import threading
+
+MiB = 1024 * 1024
+
+
+class ThumbnailCache:
+    """JPEG thumbnails on disk, addressed by the source and its size/mtime or CRC stamp.
+
+    Least recently used files are evicted once the cache grows over `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = os.path.join(CACHE_DIR, "thumbnails"),
+        max_bytes: int = 1024 * MiB,
+        thumbnail_size: tuple[int, int] = (160, 160),
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.thumbnail_size = thumbnail_size
+        self._lock = threading.Lock()
+        self._written = 0  # bytes written since the last eviction pass
+
+    def key(self, source: str, stamp: int) -> str:
+        width, height = self.thumbnail_size
+        return hashlib.sha1(f"{source}\0{stamp}\0{width}x{height}".encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".jpg")
+
+    def get(self, key: str) -> Image.Image | None:
+        path = self.path(key)
+        try:
+            image = Image.open(path)
+            image.load()
+        except (OSError, SyntaxError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used for eviction
+        except OSError:
+            pass
+        return image
+
+    def put(self, key: str, image: Image.Image):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        image.convert("RGB").save(temp_path, "JPEG", quality=85)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._written += os.path.getsize(path)
+            should_evict = self._written > self.max_bytes // 10
+            if should_evict:
+                self._written = 0
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """Delete the least recently used thumbnails until the cache is under 90% of its cap."""
+        files = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+ThumbnailCallback = Callable[[int, Image.Image], None]
+
+
+class ThumbnailLoader:
+    """Produce thumbnails of a loader's items in a thread pool, through a `ThumbnailCache`.
+
+    Callbacks run on the Tk thread through `master.after()`.
+    """
+
+    def __init__(
+        self,
+        master: Misc,
+        data_loader: DataLoaderProtocol,
+        dataset_path: str,
+        cache: ThumbnailCache,
+        max_workers: int = 4,
+    ):
+        self._master = master
+        self._data_loader = data_loader
+        self._dataset_path = dataset_path
+        self._cache = cache
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="thumbnail"
+        )
+        self._lock = threading.Lock()
+        self._pending: dict[int, Future] = {}
+        self._shut_down = False
+
+    def request(self, index: int, callback: ThumbnailCallback):
+        with self._lock:
+            if index in self._pending:
+                return
+            future = self._executor.submit(self._load, index)
+            self._pending[index] = future
+        future.add_done_callback(lambda f: self._on_done(index, f, callback))
+
+    def cancel_except(self, indices: set[int]):
+        """Cancel pending thumbnails that are no longer needed, e.g., scrolled out of view."""
+        with self._lock:
+            for index in list(self._pending):
+                if index not in indices:
+                    self._pending.pop(index).cancel()
+
+    def shutdown(self):
+        """Cancel all work; thumbnails still being made are not delivered either."""
+        self._shut_down = True
+        self.cancel_except(set())
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _load(self, index: int) -> Image.Image:
+        name = self._data_loader.data_item_name_list[index]
+        source = os.path.join(self._dataset_path, name)
+        key = self._cache.key(source, self._data_loader.image_stamp(index))
+        thumbnail = self._cache.get(key)
+        if thumbnail is None:
+            item = self._data_loader.get_item_by_index(index, target_size=self._cache.thumbnail_size)
+            thumbnail = item.image.convert("RGB")
+            thumbnail.thumbnail(self._cache.thumbnail_size)
+            self._cache.put(key, thumbnail)
+        return thumbnail
+
+    def _on_done(self, index: int, future: Future, callback: ThumbnailCallback):
+        with self._lock:
+            if self._pending.get(index) is future:
+                del self._pending[index]
+        if future.cancelled() or future.exception() is not None:
+            return
+        try:
+            self._master.after(0, self._deliver, callback, index, future.result())
+        except RuntimeError:
+            pass  # main loop is gone
+
+    def _deliver(self, callback: ThumbnailCallback, index: int, thumbnail: Image.Image):
+        if not self._shut_down:  # e.g., indices have moved since
+            callback(index, thumbnail)
@@ -0,0 +1,206 @@
+# Author: Tao Wen
+# Description:
+#   multi-resolution tile pyramid of a large image, for zoom and pan with
+#   memory bounded by the viewport, and a spatial index of its boxes.
+
+from data_item import BoxArray
+from frame_cache import LRUCache, MiB, image_nbytes
+from PIL import Image
+import math
+import tempfile
+import threading
+import numpy as np
+
+Rect = tuple[float, float, float, float]  # left, top, right, bottom
+
+
+class TilePyramid:
+    """Levels of an image, each half the size of the one below, read in tiles.
+
+    Level 0 is copied once to a temporary memory-mapped file, and coarser
+    levels are built from the level below on first use. Tiles are sliced from
+    the maps on demand and kept in a byte-bounded LRU cache, so only the pages
+    in view stay resident once the source image is released.
+
+    PIL decodes most formats whole, so building holds the full bitmap of
+    `image`; bound its size when decoding, e.g., with `bound_decoding`.
+    """
+
+    BAND_ROWS = 256
+
+    def __init__(self, image: Image.Image, tile_size: int = 512, cache_bytes: int = 128 * MiB):
+        self.size = image.size
+        self.full_size = image.info.get("full_size")  # of the source, if `image` is reduced
+        self.tile_size = tile_size
+        self.n_levels = 1
+        while max(self.level_size(self.n_levels - 1)) > tile_size:
+            self.n_levels += 1
+        self._levels: list[np.ndarray | None] = [None] * self.n_levels
+        self._files = []
+        self._lock = threading.Lock()
+        self._tiles = LRUCache(cache_bytes, image_nbytes)
+
+        width, height = self.size
+        level = self._new_level(self.size)
+        image.load()  # decoded whole here; the bands below bound only the RGB copies
+        for top in range(0, height, self.BAND_ROWS):
+            band = image.crop((0, top, width, min(top + self.BAND_ROWS, height)))
+            level[top:top + band.size[1]] = np.asarray(band.convert("RGB"))
+        self._levels[0] = level
+
+    def level_size(self, level: int) -> tuple[int, int]:
+        width, height = self.size
+        return max(1, width >> level), max(1, height >> level)
+
+    def level_for_scale(self, scale: float) -> int:
+        """The coarsest level with at least `scale` display pixels per source pixel."""
+        if scale >= 1:
+            return 0
+        return min(int(math.log2(1 / scale)), self.n_levels - 1)
+
+    def level(self, level: int) -> np.ndarray:
+        with self._lock:
+            return self._build_level(level)
+
+    def _build_level(self, level: int) -> np.ndarray:
+        pixels = self._levels[level]
+        if pixels is not None:
+            return pixels
+        source = self._build_level(level - 1)
+        width, height = self.level_size(level)
+        pixels = self._new_level((width, height))
+        for top in range(0, height, self.BAND_ROWS):
+            bottom = min(top + self.BAND_ROWS, height)
+            # average 2x2 blocks; an odd last row or column is dropped
+            block = source[2 * top:2 * bottom, :2 * width].astype(np.uint16)
+            pixels[top:bottom] = (
+                (block[0::2, 0::2] + block[1::2, 0::2] + block[0::2, 1::2] + block[1::2, 1::2] + 2) >> 2
+            ).astype(np.uint8)
+        self._levels[level] = pixels
+        return pixels
+
+    def _new_level(self, size: tuple[int, int]) -> np.ndarray:
+        width, height = size
+        file = tempfile.TemporaryFile(prefix="pyramid-")
+        self._files.append(file)
+        return np.memmap(file, dtype=np.uint8, mode="w+", shape=(height, width, 3))
+
+    def tile(self, level: int, column: int, row: int) -> Image.Image:
+        key = (level, column, row)
+        tile = self._tiles.get(key)
+        if tile is None:
+            pixels = self.level(level)
+            top, left = row * self.tile_size, column * self.tile_size
+            tile = Image.fromarray(np.ascontiguousarray(
+                pixels[top:top + self.tile_size, left:left + self.tile_size]
+            ))
+            self._tiles.put(key, tile)
+        return tile
+
+    def region(self, level: int, box: tuple[int, int, int, int]) -> Image.Image:
+        """Pixels of `box` at `level`, composed from the tiles it intersects."""
+        left, top, right, bottom = box
+        region = Image.new("RGB", (right - left, bottom - top))
+        size = self.tile_size
+        for row in range(top // size, (bottom - 1) // size + 1):
+            for column in range(left // size, (right - 1) // size + 1):
+                region.paste(self.tile(level, column, row), (column * size - left, row * size - top))
+        return region
+
+    def render(self, view: Rect, size: tuple[int, int], background: str = "#303030") -> Image.Image:
+        """Draw the source rectangle `view` into an image of `size`.
+
+        Reads from the coarsest level that still has enough resolution, so the
+        pixels touched are bounded by about twice the viewport whatever the zoom.
+        """
+        view_left, view_top, view_right, view_bottom = view
+        scale = size[0] / (view_right - view_left)
+        level = self.level_for_scale(scale)
+        factor = 1 << level
+        width, height = self.level_size(level)
+
+        # view in level pixels, clipped to the image
+        left = max(0, math.floor(view_left / factor))
+        top = max(0, math.floor(view_top / factor))
+        right = min(width, math.ceil(view_right / factor))
+        bottom = min(height, math.ceil(view_bottom / factor))
+
+        canvas = Image.new("RGB", size, background)
+        if right <= left or bottom <= top:
+            return canvas
+        region = self.region(level, (left, top, right, bottom))
+        level_scale = scale * factor  # display pixels per level pixel
+        x = round((left * factor - view_left) * scale)
+        y = round((top * factor - view_top) * scale)
+        region_size = (
+            max(1, round((right - left) * level_scale)),
+            max(1, round((bottom - top) * level_scale)),
+        )
+        # keep pixels sharp when zoomed in past 1:1
+        resample = Image.Resampling.NEAREST if scale >= 1 else Image.Resampling.BILINEAR
+        canvas.paste(region.resize(region_size, resample), (x, y))
+        return canvas
+
+    def close(self):
+        self._tiles.clear()
+        self._levels = [None] * self.n_levels
+        for file in self._files:
+            file.close()
+        self._files.clear()
+
+
+class BoxGrid:
+    """Spatial hash of boxes on a uniform grid, to find the boxes in view
+    without testing all of them.
+
+    Each cell lists the boxes overlapping it, stored as CSR arrays, i.e.,
+    box ids sorted by cell and the start of each cell.
+    """
+
+    def __init__(self, boxes: BoxArray, cells: int = 64):
+        self.boxes = boxes
+        self._cells = cells
+        self._left = boxes.x
+        self._top = boxes.y
+        self._right = boxes.x + boxes.w
+        self._bottom = boxes.y + boxes.h
+
+        first_column, last_column = self._cell_range(self._left, self._right)
+        first_row, last_row = self._cell_range(self._top, self._bottom)
+        n_columns = last_column - first_column + 1
+        counts = n_columns * (last_row - first_row + 1)
+        box_ids = np.repeat(np.arange(len(boxes), dtype=np.int64), counts)
+        offsets = np.arange(len(box_ids)) - np.repeat(np.cumsum(counts) - counts, counts)
+        columns = first_column[box_ids] + offsets % n_columns[box_ids]
+        rows = first_row[box_ids] + offsets // n_columns[box_ids]
+        cell_ids = rows * cells + columns
+
+        order = np.argsort(cell_ids, kind="stable")
+        self._box_ids = box_ids[order]
+        self._starts = np.searchsorted(cell_ids[order], np.arange(cells * cells + 1))
+
+    def _cell_range(self, low: np.ndarray, high: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        last = self._cells - 1
+        return (
+            np.clip(np.floor(low * self._cells), 0, last).astype(np.int64),
+            np.clip(np.floor(high * self._cells), 0, last).astype(np.int64),
+        )
+
+    def query(self, view: Rect) -> np.ndarray:
+        """Ids of the boxes overlapping `view`, in normalized coordinates."""
+        left, top, right, bottom = view
+        (first_column,), (last_column,) = self._cell_range(np.array([left]), np.array([right]))
+        (first_row,), (last_row,) = self._cell_range(np.array([top]), np.array([bottom]))
+        candidates = [
+            self._box_ids[self._starts[row * self._cells + first_column]:
+                          self._starts[row * self._cells + last_column + 1]]
+            for row in range(first_row, last_row + 1)
+        ]
+        if not candidates:
+            return np.zeros(0, dtype=np.int64)
+        ids = np.unique(np.concatenate(candidates))
+        overlaps = (
+            (self._left[ids] < right) & (self._right[ids] > left)
+            & (self._top[ids] < bottom) & (self._bottom[ids] > top)
+        )
+        return ids[overlaps]
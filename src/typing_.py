@@ -1,8 +1,10 @@
 # Author: Tao Wen
 # Description: 
 #   define interfaces for this project
-from typing import Protocol, Any
-from PIL import Image
+from typing import Protocol, Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PIL import Image  # annotations only, PIL is loaded on first use
 
 class DataItemProtocol(Protocol):
     """Represents a data item that can be loaded from a source"""
@@ -17,8 +19,10 @@ class DataItemProtocol(Protocol):
 
 class DataVisualizerProtocol(Protocol):
     """Interface for visualizing data items"""
-    def to_drawn_image(self, item: DataItemProtocol) -> Image.Image:
-        """Convert data item to image"""
+    def to_drawn_image(
+        self, item: DataItemProtocol, size: tuple[int, int] | None = None
+    ) -> "Image.Image":
+        """Convert data item to image, optionally drawn to fit in `size`"""
         ...
 
 
@@ -29,10 +33,24 @@ class DataLoaderProtocol(Protocol):
         """Return list of item names"""
         ...
     
-    def get_item_by_index(self, index: int) -> DataItemProtocol:
-        """Get data item by index"""
+    def get_item_by_index(
+        self, index: int, target_size: tuple[int, int] | None = None
+    ) -> DataItemProtocol:
+        """Get data item by index, optionally decoded just large enough for `target_size`"""
         ...
     
+    def read_annotation(self, index: int) -> str | None:
+        """Read the raw annotation of an item without decoding its image"""
+        ...
+
+    def annotation_stamp(self, index: int) -> int:
+        """Cheap value that changes whenever the annotation of an item changes, 0 if it has none"""
+        ...
+
+    def image_stamp(self, index: int) -> int:
+        """Cheap value that changes whenever the image of an item changes"""
+        ...
+
     def __len__(self) -> int:
         """Number of items available"""
         ...
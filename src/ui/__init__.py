@@ -2,4 +2,9 @@
 # Description: 
 #   use built-in tkinter widgets to create simple UI elements
 
-from .image_display import ImageDisplay
\ No newline at end of file
+from .image_display import ImageDisplay
+from .virtual_list import VirtualList
+from .stats_panel import StatsPanel
+from .duplicates_panel import DuplicatesPanel
+from .thumbnail_grid import ThumbnailGrid
+from .zoom_view import ZoomView
@@ -0,0 +1,80 @@
+import tkinter as tk
+from tkinter import filedialog
+from typing import Callable, Sequence, TYPE_CHECKING
+from .virtual_list import VirtualList
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class GroupRows:
+    """Row texts of duplicate groups, formatted when drawn, i.e., `count x first name`."""
+
+    def __init__(self, groups: list["np.ndarray"], names: Sequence[str]):
+        self._groups = groups
+        self._names = names
+
+    def __getitem__(self, index: int) -> str:
+        group = self._groups[index]
+        return f"{len(group):>4} x {self._names[int(group[0])]}"
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+
+class DuplicatesPanel(tk.Toplevel):
+    """List groups of duplicate items; selecting one shows its items in the browser."""
+
+    def __init__(
+        self,
+        parent,
+        groups: list["np.ndarray"],
+        names: Sequence[str],
+        on_select: Callable[["np.ndarray"], None],
+        title: str = "Duplicates",
+    ):
+        super().__init__(parent)
+        self.title(title)
+        self._groups = groups
+        self._names = names
+        self._on_select = on_select
+
+        button_frame = tk.Frame(self)
+        button_frame.pack(side="top", fill="x")
+        tk.Button(button_frame, text="Show All", command=self.show_all).pack(side="left")
+        tk.Button(button_frame, text="Export JSON", command=self.export_json).pack(side="left")
+        n_items = sum(len(group) for group in groups)
+        tk.Label(
+            button_frame, text=f"{len(groups)} groups, {n_items - len(groups)} removable items"
+        ).pack(side="left", padx=5)
+
+        self._list = VirtualList(self, width=400, height=500)
+        scrollbar = tk.Scrollbar(self, command=self._list.yview)
+        self._list.yscrollcommand = scrollbar.set
+        scrollbar.pack(side="right", fill="y")
+        self._list.pack(side="left", fill="both", expand=True)
+        self._list.set_items(GroupRows(groups, names))
+        self._list.bind("<<ListboxSelect>>", self._on_select_group)
+
+    def show_all(self):
+        """All duplicate items, group after group."""
+        import numpy as np
+
+        if self._groups:
+            self._on_select(np.concatenate(self._groups))
+
+    def export_json(self):
+        import json
+
+        path = filedialog.asksaveasfilename(
+            parent=self, defaultextension=".json", filetypes=[("JSON files", "*.json")]
+        )
+        if path:
+            groups = [[self._names[index] for index in group.tolist()] for group in self._groups]
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"groups": groups}, f, indent=2)
+
+    def _on_select_group(self, event):
+        selection = self._list.curselection()
+        if selection:
+            self._on_select(self._groups[selection[0]])
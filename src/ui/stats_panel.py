@@ -0,0 +1,66 @@
+import tkinter as tk
+from tkinter import filedialog
+
+
+def format_histogram(histogram: dict, limit: int = 20) -> str:
+    rows = sorted(histogram.items())
+    lines = [f"    {key:>8}: {count}" for key, count in rows[:limit]]
+    if len(rows) > limit:
+        lines.append(f"    ... {len(rows) - limit} more")
+    return "\n".join(lines)
+
+
+def format_binned(histogram: dict) -> str:
+    edges, counts = histogram["bin_edges"], histogram["counts"]
+    return "\n".join(
+        f"    [{low:6.2f}, {high:6.2f}): {count}"
+        for low, high, count in zip(edges[:-1], edges[1:], counts)
+    )
+
+
+class StatsPanel(tk.Toplevel):
+    """Show dataset statistics, i.e., `DatasetStatistics.to_dict()`, with a JSON export."""
+
+    def __init__(self, parent, stats: dict, title: str = "Dataset Statistics"):
+        super().__init__(parent)
+        self.title(title)
+        self._stats = stats
+
+        button_frame = tk.Frame(self)
+        button_frame.pack(side="top", fill="x")
+        tk.Button(button_frame, text="Export JSON", command=self.export_json).pack(side="left")
+
+        text = tk.Text(self, width=60, height=40)
+        scrollbar = tk.Scrollbar(self, command=text.yview)
+        text.config(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        text.pack(side="left", fill="both", expand=True)
+        text.insert("end", self._format())
+        text.config(state="disabled")
+
+    def _format(self) -> str:
+        stats = self._stats
+        status_counts = "\n".join(
+            f"    {status:>12}: {count}" for status, count in stats["status_counts"].items()
+        )
+        return (
+            f"Items: {stats['n_items']}\n"
+            f"Boxes: {stats['n_boxes']}\n"
+            f"Out-of-range boxes: {stats['n_out_of_range_boxes']} "
+            f"(in {stats['n_items_with_out_of_range_boxes']} items)\n\n"
+            f"Annotation status:\n{status_counts}\n\n"
+            f"Boxes per class:\n{format_histogram(stats['class_histogram'])}\n\n"
+            f"Images per box count:\n{format_histogram(stats['boxes_per_image_histogram'])}\n\n"
+            f"Box size, sqrt(w * h):\n{format_binned(stats['box_size_histogram'])}\n\n"
+            f"Box aspect, log2(w / h):\n{format_binned(stats['box_aspect_log2_histogram'])}\n"
+        )
+
+    def export_json(self):
+        import json
+
+        path = filedialog.asksaveasfilename(
+            parent=self, defaultextension=".json", filetypes=[("JSON files", "*.json")]
+        )
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self._stats, f, indent=2)
@@ -0,0 +1,173 @@
+import tkinter as tk
+from typing import Callable, Sequence, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PIL import Image, ImageTk
+
+RequestFunc = Callable[[int, Callable[[int, "Image.Image"], None]], None]
+
+
+class ThumbnailGrid(tk.Canvas):
+    """A scrollable grid of thumbnails that only requests and draws the visible tiles.
+
+    Thumbnails come from `request(index, callback)`, e.g., `ThumbnailLoader.request`,
+    and tiles scrolled out of view are released and passed to `cancel_except`.
+    """
+
+    def __init__(self, parent, tile_size: tuple[int, int] = (160, 160), padding: int = 6, **kwargs):
+        kwargs.setdefault("background", "#303030")
+        kwargs.setdefault("highlightthickness", 0)
+        super().__init__(parent, **kwargs)
+        self._tile_width = tile_size[0] + 2 * padding
+        self._tile_height = tile_size[1] + 2 * padding
+        self._padding = padding
+        self._items: Sequence[str] = []
+        self._request: RequestFunc | None = None
+        self._cancel_except: Callable[[set[int]], None] | None = None
+        self._photos: dict[int, "ImageTk.PhotoImage"] = {}
+        self._top_row = 0
+        self._selection: int | None = None
+        self._refresh_pending = False
+        self.yscrollcommand: Callable[[float, float], None] | None = None
+        self.on_select: Callable[[int], None] | None = None
+
+        self.bind("<Configure>", lambda e: self.refresh())
+        self.bind("<Button-1>", self._on_click)
+        # scroll the grid, rather than the app's image navigation
+        self.bind("<MouseWheel>", lambda e: self._on_wheel(-1 * (e.delta // 120)))
+        self.bind("<Button-4>", lambda e: self._on_wheel(-1))
+        self.bind("<Button-5>", lambda e: self._on_wheel(1))
+
+    def set_source(
+        self,
+        items: Sequence[str],
+        request: RequestFunc,
+        cancel_except: Callable[[set[int]], None] | None = None,
+        mapping: Sequence[int] | None = None,
+        touched: Sequence[int] = (),
+    ):
+        """Show `items`; with `mapping`, the new index of every old tile or -1, e.g.,
+        after the folder changed, thumbnails follow their items, except the
+        `touched` ones, and the scroll position is kept.
+        """
+        self._items = items
+        self._request = request
+        self._cancel_except = cancel_except
+        if mapping is None:
+            self._photos.clear()
+            self._top_row = 0
+        else:
+            touched = set(touched)
+            self._photos = {
+                int(mapping[index]): photo for index, photo in self._photos.items()
+                if index < len(mapping) and mapping[index] >= 0 and int(mapping[index]) not in touched
+            }
+            self._top_row = max(0, min(self._top_row, self.total_rows() - self.visible_rows()))
+        self.refresh()
+
+    def columns(self) -> int:
+        return max(1, self.winfo_width() // self._tile_width)
+
+    def visible_rows(self) -> int:
+        return max(1, self.winfo_height() // self._tile_height)
+
+    def total_rows(self) -> int:
+        return -(-len(self._items) // self.columns())
+
+    def visible_indices(self) -> range:
+        first = self._top_row * self.columns()
+        last = (self._top_row + self.visible_rows() + 1) * self.columns()
+        return range(first, min(last, len(self._items)))
+
+    def yview(self, *args) -> tuple[float, float] | None:
+        if not args:
+            total = max(1, self.total_rows())
+            return self._top_row / total, min(1.0, (self._top_row + self.visible_rows()) / total)
+        if args[0] == "moveto":
+            self._scroll_to(int(float(args[1]) * self.total_rows()))
+        elif args[0] == "scroll":
+            self.yview_scroll(int(args[1]), args[2])
+        return None
+
+    def yview_scroll(self, number: int, what: str):
+        step = self.visible_rows() if what == "pages" else 1
+        self._scroll_to(self._top_row + int(number) * step)
+
+    def see(self, index: int):
+        row = index // self.columns()
+        if row < self._top_row:
+            self._scroll_to(row)
+        elif row >= self._top_row + self.visible_rows():
+            self._scroll_to(row - self.visible_rows() + 1)
+
+    def selection_set(self, index: int):
+        self._selection = index
+        self.refresh()
+
+    def refresh(self):
+        """Redraw the visible tiles and request their missing thumbnails."""
+        self._refresh_pending = False
+        self.delete("all")
+        visible = self.visible_indices()
+        columns = self.columns()
+        for index in visible:
+            row, column = divmod(index, columns)
+            x = column * self._tile_width
+            y = (row - self._top_row) * self._tile_height
+            if index == self._selection:
+                self.create_rectangle(
+                    x + 1, y + 1, x + self._tile_width - 1, y + self._tile_height - 1,
+                    outline="#0078d7", width=3,
+                )
+            photo = self._photos.get(index)
+            if photo is None:
+                self.create_rectangle(
+                    x + self._padding, y + self._padding,
+                    x + self._tile_width - self._padding, y + self._tile_height - self._padding,
+                    outline="#505050",
+                )
+                if self._request is not None:
+                    self._request(index, self._on_thumbnail)
+            else:
+                self.create_image(
+                    x + self._tile_width // 2, y + self._tile_height // 2, image=photo
+                )
+
+        # release tiles out of view, so memory is bounded by the viewport
+        visible_set = set(visible)
+        for index in [i for i in self._photos if i not in visible_set]:
+            del self._photos[index]
+        if self._cancel_except is not None:
+            self._cancel_except(visible_set)
+        if self.yscrollcommand is not None:
+            self.yscrollcommand(*self.yview())
+
+    def _on_thumbnail(self, index: int, image: "Image.Image"):
+        from PIL import ImageTk
+
+        if index in self.visible_indices():
+            self._photos[index] = ImageTk.PhotoImage(image)
+            if not self._refresh_pending:
+                # coalesce thumbnails arriving together into one redraw
+                self._refresh_pending = True
+                self.after_idle(self.refresh)
+
+    def _on_wheel(self, rows: int) -> str:
+        self.yview_scroll(rows, "units")
+        return "break"
+
+    def _scroll_to(self, top_row: int):
+        top_row = max(0, min(top_row, self.total_rows() - self.visible_rows()))
+        if top_row != self._top_row:
+            self._top_row = top_row
+            self.refresh()
+
+    def _on_click(self, event):
+        column = event.x // self._tile_width
+        if column >= self.columns():
+            return
+        index = (self._top_row + event.y // self._tile_height) * self.columns() + column
+        if index < len(self._items):
+            self.selection_set(index)
+            if self.on_select is not None:
+                self.on_select(index)
@@ -0,0 +1,162 @@
+import tkinter as tk
+from tkinter import font as tkfont
+from typing import Callable, Sequence
+
+
+class VirtualList(tk.Canvas):
+    """A Listbox-like list that only draws the visible rows.
+
+    Rows are read from a sequence (e.g., a loader's `data_item_name_list`)
+    on demand, so redraw cost does not depend on its length. Row colors take
+    one byte per row, an index into the few colors in use.
+    It mirrors the subset of the `Listbox` API used by the app and
+    generates `<<ListboxSelect>>` when a row is clicked.
+    """
+
+    def __init__(self, parent, **kwargs):
+        kwargs.setdefault("background", "white")
+        kwargs.setdefault("highlightthickness", 0)
+        super().__init__(parent, **kwargs)
+        self._font = tkfont.nametofont("TkDefaultFont")
+        self._row_height = self._font.metrics("linespace") + 2
+        self._items: Sequence[str] = []
+        self._colors: list[str | None] = [None]  # distinct row colors, None for the default
+        self._color_codes = bytearray()  # per row, an index into `_colors`, grown on demand
+        self._top = 0  # index of the first visible row
+        self._selection: int | None = None
+        self._rows: list[tuple[int, int]] = []  # (background, text) canvas items
+        self._refresh_pending = False
+        self.yscrollcommand: Callable[[float, float], None] | None = None
+
+        self.bind("<Configure>", lambda e: self.refresh())
+        self.bind("<Button-1>", self._on_click)
+
+    def set_items(self, items: Sequence[str], mapping: Sequence[int] | None = None):
+        """Show `items`, keeping a reference, so appending to it only needs `refresh()`.
+
+        With `mapping`, the new index of every old row or -1, e.g., after the
+        folder changed, row colors follow their rows and the scroll position is kept.
+        """
+        self._items = items
+        if mapping is None:
+            self._color_codes = bytearray()
+            self._top = 0
+        else:
+            import numpy as np  # loaded already, `mapping` is an array
+
+            old_codes = np.frombuffer(self._color_codes, dtype=np.uint8)[:len(mapping)]
+            mapping = np.asarray(mapping)[:len(old_codes)]
+            kept = mapping >= 0
+            codes = np.zeros(len(items), dtype=np.uint8)
+            codes[mapping[kept]] = old_codes[kept]
+            self._color_codes = bytearray(codes.tobytes())
+            self._top = max(0, min(self._top, self.size() - self.visible_rows()))
+        self._selection = None
+        self.refresh()
+
+    def size(self) -> int:
+        return len(self._items)
+
+    def itemconfig(self, index: int, fg: str | None = None):
+        """Set the text color of a row (note: `itemconfigure` is still the Canvas one)."""
+        if fg not in self._colors:
+            self._colors.append(fg)
+        code = self._colors.index(fg)
+        if index >= len(self._color_codes):
+            if code == 0:
+                return
+            self._color_codes.extend(bytes(index + 1 - len(self._color_codes)))
+        self._color_codes[index] = code
+        if self._is_visible(index) and not self._refresh_pending:
+            # coalesce many row updates into one redraw
+            self._refresh_pending = True
+            self.after_idle(self.refresh)
+
+    def visible_rows(self) -> int:
+        return max(1, self.winfo_height() // self._row_height)
+
+    def nearest(self, y: int) -> int:
+        index = self._top + int(y) // self._row_height
+        return max(0, min(index, self.size() - 1))
+
+    def yview(self, *args) -> tuple[float, float] | None:
+        """Return the visible fraction, or handle scrollbar `moveto`/`scroll` commands."""
+        if not args:
+            total = max(1, self.size())
+            return self._top / total, min(1.0, (self._top + self.visible_rows()) / total)
+        if args[0] == "moveto":
+            self._scroll_to(int(float(args[1]) * self.size()))
+        elif args[0] == "scroll":
+            self.yview_scroll(int(args[1]), args[2])
+        return None
+
+    def yview_scroll(self, number: int, what: str):
+        step = self.visible_rows() if what == "pages" else 1
+        self._scroll_to(self._top + int(number) * step)
+
+    def see(self, index: int):
+        """Scroll as little as possible, in O(1), to make `index` visible."""
+        if index < self._top:
+            self._scroll_to(index)
+        elif index >= self._top + self.visible_rows():
+            self._scroll_to(index - self.visible_rows() + 1)
+
+    def selection_set(self, index: int, last=None):
+        self._selection = int(index)
+        self.refresh()
+
+    def selection_clear(self, first=0, last=None):
+        self._selection = None
+        self.refresh()
+
+    def curselection(self) -> tuple[int, ...]:
+        return () if self._selection is None else (self._selection,)
+
+    def refresh(self):
+        """Redraw the visible rows, reusing the canvas items."""
+        self._refresh_pending = False
+        n_visible = self.visible_rows() + 1
+        width = self.winfo_width()
+        while len(self._rows) < n_visible:
+            y = len(self._rows) * self._row_height
+            background = self.create_rectangle(0, y, width, y + self._row_height, width=0)
+            text = self.create_text(2, y + 1, anchor="nw", font=self._font)
+            self._rows.append((background, text))
+
+        for row, (background, text) in enumerate(self._rows):
+            index = self._top + row
+            y = row * self._row_height
+            self.coords(background, 0, y, width, y + self._row_height)
+            if row >= n_visible or index >= self.size():
+                self.itemconfigure(background, fill="")
+                self.itemconfigure(text, text="")
+                continue
+            selected = index == self._selection
+            self.itemconfigure(background, fill="#0078d7" if selected else "")
+            self.itemconfigure(
+                text,
+                text=self._items[index],
+                fill="white" if selected else self._row_color(index),
+            )
+
+        if self.yscrollcommand is not None:
+            self.yscrollcommand(*self.yview())
+
+    def _row_color(self, index: int) -> str:
+        code = self._color_codes[index] if index < len(self._color_codes) else 0
+        return self._colors[code] or "black"
+
+    def _scroll_to(self, top: int):
+        top = max(0, min(top, self.size() - self.visible_rows()))
+        if top != self._top:
+            self._top = top
+            self.refresh()
+
+    def _is_visible(self, index: int) -> bool:
+        return self._top <= index < self._top + self.visible_rows() + 1
+
+    def _on_click(self, event):
+        if self.size() == 0:
+            return
+        self.selection_set(self.nearest(event.y))
+        self.event_generate("<<ListboxSelect>>")
@@ -0,0 +1,150 @@
+import tkinter as tk
+from typing import Callable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PIL import Image, ImageTk
+    import numpy as np
+
+# (image, class_ids, left, top, right, bottom) -> drawn image
+DrawBoxes = Callable[["Image.Image", "np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray"], "Image.Image"]
+
+
+class ZoomView(tk.Canvas):
+    """Zoom and pan over a `TilePyramid`, drawing only the tiles and boxes in view.
+
+    The wheel zooms around the pointer, dragging pans and a double click fits
+    the whole image again.
+    """
+
+    MAX_SCALE = 16.0
+
+    def __init__(self, parent, **kwargs):
+        kwargs.setdefault("background", "#303030")
+        kwargs.setdefault("highlightthickness", 0)
+        super().__init__(parent, **kwargs)
+        self._pyramid = None
+        self._box_grid = None
+        self._draw_boxes: DrawBoxes | None = None
+        self._center = (0.0, 0.0)  # in source pixels
+        self._scale = 1.0  # display pixels per source pixel
+        self._drag_start: tuple[int, int] | None = None
+        self._photo: "ImageTk.PhotoImage | None" = None
+        self._refresh_pending = False
+        self._fitted = False  # keep fitting the image on resize until the user zooms or pans
+
+        self.bind("<Configure>", lambda e: self.fit() if self._fitted else self._schedule_refresh())
+        self.bind("<ButtonPress-1>", self._on_press)
+        self.bind("<B1-Motion>", self._on_drag)
+        self.bind("<Double-Button-1>", lambda e: self.fit())
+        self.bind("<MouseWheel>", lambda e: self._on_wheel(e, e.delta))
+        self.bind("<Button-4>", lambda e: self._on_wheel(e, 120))
+        self.bind("<Button-5>", lambda e: self._on_wheel(e, -120))
+
+    def set_pyramid(self, pyramid, box_grid=None, draw_boxes: DrawBoxes | None = None):
+        """Show `pyramid`, with the boxes of `box_grid` drawn by `draw_boxes`."""
+        if self._pyramid is not None and self._pyramid is not pyramid:
+            self._pyramid.close()
+        self._pyramid = pyramid
+        self._box_grid = box_grid
+        self._draw_boxes = draw_boxes
+        self.fit()
+
+    def clear(self):
+        self.set_pyramid(None)
+
+    def fit(self):
+        if self._pyramid is None:
+            self.delete("all")
+            self._photo = None
+            return
+        width, height = self._pyramid.size
+        self._center = (width / 2, height / 2)
+        self._scale = min(self._viewport()[0] / width, self._viewport()[1] / height)
+        self._fitted = True
+        self._schedule_refresh()
+
+    def zoom(self, factor: float, x: int, y: int):
+        """Zoom by `factor`, keeping the source pixel under (x, y) in place."""
+        if self._pyramid is None:
+            return
+        width, height = self._pyramid.size
+        min_scale = min(self._viewport()[0] / width, self._viewport()[1] / height) / 2
+        scale = min(max(self._scale * factor, min_scale), self.MAX_SCALE)
+        source_x, source_y = self._to_source(x, y)
+        view_width, view_height = self._viewport()
+        self._center = (
+            source_x - (x - view_width / 2) / scale,
+            source_y - (y - view_height / 2) / scale,
+        )
+        self._scale = scale
+        self._fitted = False
+        self._schedule_refresh()
+
+    def pan(self, dx: int, dy: int):
+        self._center = (self._center[0] - dx / self._scale, self._center[1] - dy / self._scale)
+        self._fitted = False
+        self._schedule_refresh()
+
+    def view(self) -> tuple[float, float, float, float]:
+        """The visible rectangle in source pixels, i.e., (left, top, right, bottom)."""
+        view_width, view_height = self._viewport()
+        center_x, center_y = self._center
+        half_width, half_height = view_width / 2 / self._scale, view_height / 2 / self._scale
+        return center_x - half_width, center_y - half_height, center_x + half_width, center_y + half_height
+
+    def refresh(self):
+        from PIL import ImageTk
+
+        self._refresh_pending = False
+        self.delete("all")
+        if self._pyramid is None:
+            return
+        size = self._viewport()
+        view = self.view()
+        image = self._pyramid.render(view, size)
+        if self._box_grid is not None and self._draw_boxes is not None:
+            image = self._draw_boxes_in_view(image, view)
+        self._photo = ImageTk.PhotoImage(image)
+        self.create_image(0, 0, image=self._photo, anchor="nw")
+
+    def _draw_boxes_in_view(self, image: "Image.Image", view: tuple[float, float, float, float]) -> "Image.Image":
+        width, height = self._pyramid.size
+        left, top, right, bottom = view
+        ids = self._box_grid.query((left / width, top / height, right / width, bottom / height))
+        if len(ids) == 0:
+            return image
+        boxes = self._box_grid.boxes
+        x, y = boxes.x[ids] * width, boxes.y[ids] * height
+        return self._draw_boxes(
+            image,
+            boxes.class_id[ids],
+            (x - left) * self._scale,
+            (y - top) * self._scale,
+            (x + boxes.w[ids] * width - left) * self._scale,
+            (y + boxes.h[ids] * height - top) * self._scale,
+        )
+
+    def _schedule_refresh(self):
+        if not self._refresh_pending:
+            # coalesce drag and wheel events into one redraw
+            self._refresh_pending = True
+            self.after_idle(self.refresh)
+
+    def _viewport(self) -> tuple[int, int]:
+        return max(1, self.winfo_width()), max(1, self.winfo_height())
+
+    def _to_source(self, x: int, y: int) -> tuple[float, float]:
+        left, top, _, _ = self.view()
+        return left + x / self._scale, top + y / self._scale
+
+    def _on_press(self, event):
+        self._drag_start = (event.x, event.y)
+
+    def _on_drag(self, event):
+        if self._drag_start is not None:
+            self.pan(event.x - self._drag_start[0], event.y - self._drag_start[1])
+        self._drag_start = (event.x, event.y)
+
+    def _on_wheel(self, event, delta: int) -> str:
+        self.zoom(1.25 if delta > 0 else 0.8, event.x, event.y)
+        return "break"
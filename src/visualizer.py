@@ -1,16 +1,12 @@
 # Author: Tao Wen
 # Description: 
 #   visualize dataitem converting them to image_object
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 from typing_ import DataVisualizerProtocol
-from data_item import AnnotatedImageItem
-
-DPI = 96  # Standard DPI for most displays
-PPI = 72  # Points per inch, used in font metrics
-
-
-def get_line_height(font_size: float) -> float:
-    return font_size * DPI / PPI
+from data_item import AnnotatedImageItem, BoxArray
+from image_backend import get_backend
+from profiler import stage
+import numpy as np
 
 
 class AnnotatedImageVisualizer(DataVisualizerProtocol):
@@ -21,41 +17,58 @@ class AnnotatedImageVisualizer(DataVisualizerProtocol):
     LINE_WIDTH = 4
     FONT_SIZE = 24
 
-    def to_drawn_image(self, item: AnnotatedImageItem) -> Image.Image:
-        # Create a copy of the image to draw on
-        image = item.image.copy()
+    def to_drawn_image(
+        self, item: AnnotatedImageItem, size: tuple[int, int] | None = None
+    ) -> Image.Image:
+        """Draw the boxes of `item` on a copy of its image.
+
+        If `size` is given, the image is first resized to fit in it and the boxes
+        are drawn at that resolution, so line width and font size are in display
+        pixels and the cost does not depend on the source resolution.
+        """
+        if size is None:
+            # Create a copy of the image to draw on
+            image = item.image.copy()
+        else:
+            with stage("resize"):
+                image = get_backend().resize(item.image, size)
 
         if not hasattr(item, 'boxes'):
             return image
 
-        draw = ImageDraw.Draw(image)
-        # Get original dimensions
-        orig_width, orig_height = image.size
-        # Draw boxes before resizing
-        for box in item.boxes():
-            # Convert normalized coordinates to pixel coordinates
-            x1 = box.x * orig_width
-            y1 = box.y * orig_height
-            w = box.w * orig_width
-            h = box.h * orig_height
-            
-            # Get color for class
-            color = self.COLORS[box.class_id % len(self.COLORS)]
-            
-            # Draw rectangle
-            draw.rectangle(
-                [(x1, y1), (x1 + w, y1 + h)],
-                outline=color,
-                width=self.LINE_WIDTH
-            )
-            
-            # Draw label
-            label = f"Class {box.class_id}"
-            font = ImageFont.truetype("arial.ttf", self.FONT_SIZE)
-            draw.text(
-                (x1, y1 - get_line_height(self.FONT_SIZE)),
-                label,
-                fill=color,
-                font=font
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB")  # colored boxes on grayscale/palette images
+        with stage("boxes.parse"):
+            boxes = getattr(item, 'box_array', None)
+            if boxes is None:
+                boxes = BoxArray.from_boxes(item.boxes())
+
+        width, height = image.size
+        # Convert normalized coordinates to pixel coordinates
+        return self.draw_boxes(
+            image,
+            boxes.class_id,
+            boxes.x * width,
+            boxes.y * height,
+            (boxes.x + boxes.w) * width,
+            (boxes.y + boxes.h) * height,
+        )
+
+    def draw_boxes(
+        self,
+        image: Image.Image,
+        class_ids: np.ndarray,
+        left: np.ndarray,
+        top: np.ndarray,
+        right: np.ndarray,
+        bottom: np.ndarray,
+    ) -> Image.Image:
+        """Draw boxes given as arrays of pixel coordinates in `image`, with their labels.
+
+        Returns the drawn image, which depending on the backend is `image` or a copy.
+        """
+        with stage("draw"):
+            return get_backend().draw_boxes(
+                image, class_ids, left, top, right, bottom,
+                self.COLORS, self.LINE_WIDTH, self.FONT_SIZE,
             )
-        return image
\ No newline at end of file
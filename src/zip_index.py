@@ -0,0 +1,391 @@
+# Author: Tao Wen
+# Description:
+#   persistent index of a zip archive, i.e., the sorted image list,
+#   member offsets/sizes/compression and the image -> annotation pairing,
+#   plus JSON members, e.g., a COCO `instances.json`,
+#   so that reopening a huge archive does not parse its central directory.
+
+from typing import Callable
+import hashlib
+import io
+import json
+import os
+import struct
+import zipfile
+import zlib
+import bz2
+import threading
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+INDEX_MAGIC = b"ZIDX"
+INDEX_VERSION = 3
+INDEX_SUFFIX = ".idx"
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "load_per_dataset")
+
+ENTRY_DTYPE = np.dtype([
+    ("header_offset", "<i8"),
+    ("compress_size", "<i8"),
+    ("file_size", "<i8"),
+    ("compress_type", "<i2"),
+    ("flag_bits", "<i2"),
+    ("crc", "<u4"),
+])
+
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")  # zipfile.structFileHeader
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+SUPPORTED_COMPRESSION = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2)
+
+
+class Cancelled(Exception):
+    """Raised when building an index is cancelled through its event."""
+
+
+def to_entry(info: zipfile.ZipInfo) -> tuple[int, int, int, int, int, int]:
+    return (
+        info.header_offset, info.compress_size, info.file_size,
+        info.compress_type, info.flag_bits, info.CRC,
+    )
+
+
+def is_supported(entry: np.void) -> bool:
+    """Whether `read_member` can read the entry, i.e., not encrypted and a known codec."""
+    return not entry["flag_bits"] & 0x1 and entry["compress_type"] in SUPPORTED_COMPRESSION
+
+
+def data_offset(header: bytes, header_offset: int) -> int:
+    """Offset of the member data, given the 30-byte local file header."""
+    fields = LOCAL_HEADER.unpack(header)
+    if fields[0] != LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad local file header at offset {header_offset}")
+    name_length, extra_length = fields[-2], fields[-1]
+    return header_offset + LOCAL_HEADER.size + name_length + extra_length
+
+
+def decompress(data: bytes | memoryview, entry: np.void) -> bytes | memoryview:
+    compress_type = entry["compress_type"]
+    if compress_type == zipfile.ZIP_STORED:
+        return data
+    if compress_type == zipfile.ZIP_DEFLATED:
+        return zlib.decompress(data, -15)
+    if compress_type == zipfile.ZIP_BZIP2:
+        return bz2.decompress(data)
+    raise NotImplementedError(f"Unsupported compression type {compress_type}")
+
+
+def read_member(buffer: memoryview, entry: np.void) -> bytes | memoryview:
+    """Read a member from the memory-mapped archive.
+
+    Stored members are returned as a `memoryview` slice of `buffer` without copying,
+    compressed members are inflated straight from the mapped bytes.
+    """
+    header_offset = int(entry["header_offset"])
+    header = buffer[header_offset:header_offset + LOCAL_HEADER.size]
+    offset = data_offset(bytes(header), header_offset)
+    return decompress(buffer[offset:offset + int(entry["compress_size"])], entry)
+
+
+class MemberStream(io.RawIOBase):
+    """Sequential reader of a member of the memory-mapped archive, inflated as it is read.
+
+    Unlike `read_member`, a large compressed member, e.g., a JSON file of
+    hundreds of MB, is never held in memory as a whole.
+    """
+
+    def __init__(self, buffer: memoryview, entry: np.void, chunk_size: int = 1 << 20):
+        super().__init__()
+        header_offset = int(entry["header_offset"])
+        header = buffer[header_offset:header_offset + LOCAL_HEADER.size]
+        self._offset = data_offset(bytes(header), header_offset)
+        self._end = self._offset + int(entry["compress_size"])
+        self._buffer = buffer
+        self._chunk_size = chunk_size
+        compress_type = entry["compress_type"]
+        if compress_type == zipfile.ZIP_STORED:
+            self._decompressor = None
+        elif compress_type == zipfile.ZIP_DEFLATED:
+            self._decompressor = zlib.decompressobj(-15)
+        elif compress_type == zipfile.ZIP_BZIP2:
+            self._decompressor = bz2.BZ2Decompressor()
+        else:
+            raise NotImplementedError(f"Unsupported compression type {compress_type}")
+        self._pending = b""
+        self.size = int(entry["file_size"])
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        size = self._chunk_size if size is None or size < 0 else size
+        while not self._pending and self._offset < self._end:
+            chunk = self._buffer[self._offset:min(self._offset + self._chunk_size, self._end)]
+            self._offset += len(chunk)
+            self._pending = bytes(chunk) if self._decompressor is None else self._decompressor.decompress(chunk)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    def readinto(self, b) -> int:
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+class MemoryReader(io.RawIOBase):
+    """Seekable read-only file over a buffer, e.g., a stored zip member, without copying it."""
+
+    def __init__(self, buffer: bytes | memoryview):
+        super().__init__()
+        self._view = memoryview(buffer)
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else self._position + size
+        data = bytes(self._view[self._position:end])
+        self._position += len(data)
+        return data
+
+    def readinto(self, b) -> int:
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        elif whence == io.SEEK_END:
+            self._position = len(self._view) + offset
+        else:
+            raise ValueError(f"Invalid whence {whence}")
+        self._position = max(0, self._position)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def getbuffer(self) -> memoryview:
+        return self._view
+
+
+def archive_stamp(zip_path: str) -> tuple[int, int]:
+    stat = os.stat(zip_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def index_paths(zip_path: str) -> list[str]:
+    """Candidate index locations: a sidecar next to the archive, then the user cache."""
+    zip_path = os.path.abspath(zip_path)
+    digest = hashlib.sha1(zip_path.encode("utf-8")).hexdigest()
+    return [zip_path + INDEX_SUFFIX, os.path.join(CACHE_DIR, digest + INDEX_SUFFIX)]
+
+
+def save_index_file(
+    path: str, magic: bytes, version: int, header: dict, names: list[str], arrays: dict[str, np.ndarray]
+):
+    """Write an index atomically: magic, version, JSON `header`, names blob, then raw `arrays`.
+
+    Shared by `ZipIndex` and `TarIndex`, read back by `load_index_file`.
+    """
+    names_blob = "\0".join(names).encode("utf-8")
+    header = {
+        **header,
+        "names_length": len(names_blob),
+        "counts": {name: len(array) for name, array in arrays.items()},
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(magic)
+        f.write(struct.pack("<II", version, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(names_blob)
+        for array in arrays.values():
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(temp_path, path)
+
+
+def load_index_file(
+    path: str,
+    magic: bytes,
+    version: int,
+    dtypes: dict[str, np.dtype],
+    is_current: Callable[[dict], bool],
+) -> tuple[dict, list[str], dict[str, np.ndarray]] | None:
+    """Header, names and memory-mapped arrays of an index written by `save_index_file`.
+
+    None if the file is missing, truncated, of another format or version,
+    or stale, i.e., `is_current(header)` is false.
+    """
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(magic)) != magic:
+                return None
+            file_version, header_length = struct.unpack("<II", f.read(8))
+            if file_version != version:
+                return None
+            header = json.loads(f.read(header_length))
+            if not is_current(header):
+                return None
+            names_blob = f.read(header["names_length"])
+            offset = f.tell()
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+    names = names_blob.decode("utf-8").split("\0") if names_blob else []
+    arrays = {}
+    for name, dtype in dtypes.items():
+        count = header["counts"][name]
+        if count:
+            try:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+            except ValueError:
+                return None  # truncated index file
+        else:
+            arrays[name] = np.empty(0, dtype=dtype)
+        offset += count * dtype.itemsize
+    if len(names) != len(arrays["images"]):
+        return None
+    return header, names, arrays
+
+
+class ZipIndex:
+    """Sorted image names and member entries of a zip archive."""
+
+    def __init__(
+        self,
+        image_names: list[str],
+        images: np.ndarray,
+        annotations: np.ndarray,
+        annotation_of: np.ndarray,
+        stamp: tuple[int, int],
+        json_names: list[str] | None = None,
+        json_members: np.ndarray | None = None,
+    ):
+        self.image_names = image_names
+        self.images = images  # ENTRY_DTYPE, one per image
+        self.annotations = annotations  # ENTRY_DTYPE, one per paired annotation
+        self.annotation_of = annotation_of  # int32, index into annotations or -1
+        self.stamp = stamp
+        self.json_names = json_names or []
+        self.json_members = json_members if json_members is not None else np.empty(0, ENTRY_DTYPE)
+
+    @classmethod
+    def open(
+        cls,
+        zip_path: str,
+        progress: Callable[[int, int], None] | None = None,
+        cancel: threading.Event | None = None,
+    ) -> "ZipIndex":
+        """Load the persisted index if it matches the archive, otherwise (re)build it.
+
+        While building, `progress(done, total)` is called every few thousand
+        images and setting `cancel` raises `Cancelled`.
+        """
+        stamp = archive_stamp(zip_path)
+        for path in index_paths(zip_path):
+            index = cls.load(path, stamp)
+            if index is not None:
+                return index
+
+        index = cls.build(zip_path, progress, cancel)
+        for path in index_paths(zip_path):
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                index.save(path)
+                break
+            except OSError:
+                continue  # e.g., read-only dataset folder, try the user cache
+        return index
+
+    @classmethod
+    def build(
+        cls,
+        zip_path: str,
+        progress: Callable[[int, int], None] | None = None,
+        cancel: threading.Event | None = None,
+        report_every: int = 5000,
+    ) -> "ZipIndex":
+        # imported here to avoid a circular import with data_loader
+        from data_loader import name_with_left_pad, to_annotation_path
+
+        def check(done: int, total: int):
+            if cancel is not None and cancel.is_set():
+                raise Cancelled(zip_path)
+            if progress is not None:
+                progress(done, total)
+
+        stamp = archive_stamp(zip_path)
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            info_list = zip_ref.infolist()
+        info_by_name = {info.filename: info for info in info_list}
+
+        image_infos = [
+            info for info in info_list
+            if info.filename.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+        json_infos = sorted(
+            (info for info in info_list if info.filename.lower().endswith(".json")),
+            key=lambda info: info.filename,
+        )
+        image_infos.sort(
+            key=lambda info: (os.path.dirname(info.filename), name_with_left_pad(info.filename))
+        )
+
+        annotation_entries = []
+        annotation_of = np.full(len(image_infos), -1, dtype=np.int32)
+        for i, info in enumerate(image_infos):
+            if i % report_every == 0:
+                check(i, len(image_infos))
+            annotation_info = info_by_name.get(to_annotation_path(info.filename))
+            if annotation_info is not None:
+                annotation_of[i] = len(annotation_entries)
+                annotation_entries.append(to_entry(annotation_info))
+
+        return cls(
+            image_names=[info.filename for info in image_infos],
+            images=np.array([to_entry(info) for info in image_infos], dtype=ENTRY_DTYPE),
+            annotations=np.array(annotation_entries, dtype=ENTRY_DTYPE),
+            annotation_of=annotation_of,
+            stamp=stamp,
+            json_names=[info.filename for info in json_infos],
+            json_members=np.array([to_entry(info) for info in json_infos], dtype=ENTRY_DTYPE),
+        )
+
+    ARRAY_DTYPES = {
+        "images": ENTRY_DTYPE,
+        "annotations": ENTRY_DTYPE,
+        "annotation_of": np.dtype("<i4"),
+        "json_members": ENTRY_DTYPE,
+    }
+
+    def save(self, path: str):
+        """Write the index atomically, see `save_index_file`."""
+        header = {
+            "archive_size": self.stamp[0],
+            "archive_mtime_ns": self.stamp[1],
+            "json_names": self.json_names,
+        }
+        arrays = {name: getattr(self, name) for name in self.ARRAY_DTYPES}
+        save_index_file(path, INDEX_MAGIC, INDEX_VERSION, header, self.image_names, arrays)
+
+    @classmethod
+    def load(cls, path: str, stamp: tuple[int, int]) -> "ZipIndex | None":
+        """Memory-map a persisted index, or return None if it is missing or stale."""
+        loaded = load_index_file(
+            path, INDEX_MAGIC, INDEX_VERSION, cls.ARRAY_DTYPES,
+            lambda header: (header["archive_size"], header["archive_mtime_ns"]) == tuple(stamp),
+        )
+        if loaded is None:
+            return None
+        header, image_names, arrays = loaded
+        return cls(image_names=image_names, stamp=stamp, json_names=header["json_names"], **arrays)
+
+    def __len__(self) -> int:
+        return len(self.image_names)
@@ -0,0 +1,63 @@
+import pytest
+
+from annotation_status import AnnotationStatus, AnnotationStatusScanner, classify_annotation
+from data_loader import FolderLoader
+
+
+@pytest.mark.parametrize("text, status", [
+    (None, AnnotationStatus.UNANNOTATED),
+    ("", AnnotationStatus.EMPTY),
+    ("\n  \n", AnnotationStatus.EMPTY),
+    ("person 0.5 0.5 0.1 0.1\n", AnnotationStatus.MALFORMED),
+    ("0 0.5 0.5 0.1 high\n", AnnotationStatus.MALFORMED),
+    ("0.5 0.5 0.5 0.1 0.1\n", AnnotationStatus.MALFORMED),
+    ("0 0.5 0.5 0.1\n", AnnotationStatus.MALFORMED),
+    ("0 0.5 0.5 0.1 0.1 0.9\n", AnnotationStatus.MALFORMED),
+    ("0 0.5 0.5 0.1 0.1\n1 0.5 0.5\n", AnnotationStatus.MALFORMED),
+    ("-1 0.5 0.5 0.1 0.1\n", AnnotationStatus.MALFORMED),
+    ("0 0.5 0.5 0.1 0.1\n", AnnotationStatus.ANNOTATED),
+    ("3 .5 .5 1e-1 .1\n\n12 0.5 0.5 0.2 0.2", AnnotationStatus.ANNOTATED),
+])
+def test_classify_annotation(text, status):
+    assert classify_annotation(text) is status
+
+
+class ImmediateMaster:
+    """Runs `after` callbacks at once, in the scanning thread, instead of on a Tk main loop."""
+
+    def after(self, delay_ms, function, *args):
+        function(*args)
+
+
+def test_scanner_delivers_every_status_in_chunks(tmp_path):
+    labels = [None, "", "x 0.5 0.5 0.1 0.1", "0 0.5 0.5 0.1 0.1", None]
+    for i, label in enumerate(labels):
+        (tmp_path / f"img{i}.jpg").write_bytes(b"never decoded")
+        if label is not None:
+            (tmp_path / f"img{i}.txt").write_text(label)
+    data_loader = FolderLoader(str(tmp_path))
+    chunks = []
+    scanner = AnnotationStatusScanner(
+        ImmediateMaster(), data_loader, lambda *chunk: chunks.append(chunk), chunk_size=2
+    )
+    assert not scanner.finished
+    scanner.start()
+    scanner._thread.join()
+    assert [start for start, _ in chunks] == [0, 2, 4]
+    assert [status for _, statuses in chunks for status in statuses] == [
+        AnnotationStatus.UNANNOTATED, AnnotationStatus.EMPTY, AnnotationStatus.MALFORMED,
+        AnnotationStatus.ANNOTATED, AnnotationStatus.UNANNOTATED,
+    ]
+    assert scanner.finished
+
+
+def test_cancelled_scanner_delivers_nothing(tmp_path):
+    (tmp_path / "img0.jpg").write_bytes(b"never decoded")
+    chunks = []
+    scanner = AnnotationStatusScanner(
+        ImmediateMaster(), FolderLoader(str(tmp_path)), lambda *chunk: chunks.append(chunk)
+    )
+    scanner.cancel()
+    scanner.start()
+    scanner._thread.join()
+    assert chunks == [] and not scanner.finished
@@ -0,0 +1,65 @@
+import zipfile
+
+import pytest
+from PIL import Image
+
+from batch import BatchProgress, export_dataset
+from data_loader import FolderLoader, ZipLoader
+
+
+@pytest.fixture
+def images(tmp_path):
+    """40 images with a box each, `img7.jpg` corrupt."""
+    folder = tmp_path / "dataset"
+    folder.mkdir()
+    for i in range(40):
+        Image.new("RGB", (32, 24), (i, 0, 0)).save(folder / f"img{i}.jpg")
+        (folder / f"img{i}.txt").write_text("0 0.5 0.5 0.2 0.2\n")
+    (folder / "img7.jpg").write_bytes(b"not a jpeg")
+    return folder
+
+
+def expected_names(skipped: str) -> set[str]:
+    return {f"img{i}.png" for i in range(40)} - {skipped}
+
+
+def check(result, progress):
+    assert (result.done, result.total, result.exported) == (40, 40, 39)
+    assert [name for name, _ in result.failed] == ["img7.jpg"]
+    assert progress[-1].done == 40
+    assert "1 failed" in str(progress[-1])
+
+
+def test_folder_export_skips_corrupt_items(images, tmp_path):
+    progress = []
+    output = tmp_path / "out"
+    result = export_dataset(
+        FolderLoader(str(images)), str(output), image_format="PNG", workers=2, chunk_size=4,
+        progress=progress.append,
+    )
+    check(result, progress)
+    assert {path.name for path in output.iterdir()} == expected_names("img7.png")
+    with Image.open(output / "img0.png") as image:
+        assert image.size == (32, 24)
+
+
+def test_zip_export_skips_corrupt_items(images, tmp_path):
+    source = tmp_path / "dataset.zip"
+    with zipfile.ZipFile(source, "w") as zf:
+        for path in sorted(images.iterdir()):
+            zf.write(path, path.name)
+    progress = []
+    output = tmp_path / "out.zip"
+    result = export_dataset(
+        ZipLoader(str(source)), str(output), image_format="PNG", workers=2, chunk_size=4,
+        progress=progress.append,
+    )
+    check(result, progress)
+    with zipfile.ZipFile(output) as zf:
+        assert set(zf.namelist()) == expected_names("img7.png")
+
+
+def test_failed_names_are_truncated():
+    progress = BatchProgress(5, 5, 1.0, [(f"img{i}.jpg", "error") for i in range(5)])
+    assert progress.exported == 0
+    assert progress.failed_names(limit=2) == "img0.jpg, img1.jpg, ..."
@@ -0,0 +1,14 @@
+import sys
+
+import benchmark
+
+
+def test_peak_rss_is_unavailable_without_resource(monkeypatch):
+    monkeypatch.setitem(sys.modules, "resource", None)  # as on Windows
+    assert benchmark.peak_rss_mb() is None
+
+
+def test_compare_flags_regressions_by_direction():
+    baseline = {"results": {"load_ms": 10.0, "images_per_s": 100.0, "new_ms": 0}}
+    current = {"results": {"load_ms": 12.0, "images_per_s": 95.0, "new_ms": 5.0}}
+    assert benchmark.compare(baseline, current, threshold=0.1) == ["load_ms"]
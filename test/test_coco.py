@@ -0,0 +1,135 @@
+import io
+import json
+import pickle
+import zipfile
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import coco
+from coco import CocoIndex, CocoLoader, JSONReader, is_coco_name, iter_top_level
+
+DOCUMENT = {
+    "info": {"description": "test", "year": 2024},
+    "images": [
+        {"id": 30, "file_name": "c.png", "width": 100, "height": 50},
+        {"id": 10, "file_name": "sub/a.png", "width": 200, "height": 100},
+        {"id": 20, "file_name": "b.png"},  # no size, so no YOLO text
+    ],
+    "annotations": [
+        {"id": 1, "image_id": 10, "category_id": 7, "bbox": [20, 10, 40, 20]},
+        {"id": 2, "image_id": 30, "category_id": 3, "bbox": [0, 0, 50, 25]},
+        {"id": 3, "image_id": 10, "category_id": 3, "bbox": [0, 50, 100, 50]},
+        {"id": 4, "image_id": 99, "category_id": 3, "bbox": [1, 1, 1, 1]},  # unknown image
+        {"id": 5, "image_id": 30, "category_id": 7, "keypoints": [1, 2, 2]},  # no box
+        {"id": 6, "image_id": 20, "category_id": 5, "bbox": [1.5, 2.5, 3, 4]},
+    ],
+    "categories": [{"id": 7, "name": "dog"}, {"id": 3, "name": "cat"}, {"id": 5, "name": "cow"}],
+}
+
+
+def coco_bytes(document=DOCUMENT) -> bytes:
+    return json.dumps(document, indent=1).encode("utf-8")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 1 << 20])
+def test_iter_top_level_streams_arrays_at_any_chunk_size(chunk_size):
+    document = {"a": [1, 2.5e10, "xé中"], "b": {"c": [1]}, "e": [], "d": -12}
+    reader = JSONReader(io.BytesIO(json.dumps(document).encode("utf-8")), chunk_size)
+    assert list(iter_top_level(reader)) == [
+        ("a", 1), ("a", 2.5e10), ("a", "xé中"), ("b", {"c": [1]}), ("d", -12),
+    ]
+
+
+def test_iter_top_level_rejects_non_objects():
+    with pytest.raises(ValueError):
+        list(iter_top_level(JSONReader(io.BytesIO(b"[1, 2]"))))
+
+
+@pytest.mark.parametrize("chunk_size", [5, 1 << 20])
+def test_parse_groups_boxes_per_image_in_csr_arrays(chunk_size, monkeypatch):
+    original = JSONReader.__init__
+    monkeypatch.setattr(
+        JSONReader, "__init__", lambda self, stream, size=chunk_size: original(self, stream, size)
+    )
+    index = CocoIndex.parse(io.BytesIO(coco_bytes()))
+    assert index.file_names == ["c.png", "sub/a.png", "b.png"]
+    assert index.category_names == ["cat", "cow", "dog"]  # by sorted category id
+    assert index.offsets.tolist() == [0, 1, 3, 4]
+    # c.png: the cat; sub/a.png: dog then cat, in file order; b.png: the cow
+    assert index.class_ids.tolist() == [0, 2, 0, 1]
+    np.testing.assert_allclose(index.boxes[1:3], [[20, 10, 40, 20], [0, 50, 100, 50]])
+    assert index.sizes.tolist() == [[100, 50], [200, 100], [0, 0]]
+
+
+def test_box_array_and_yolo_text():
+    index = CocoIndex.parse(io.BytesIO(coco_bytes()))
+    boxes = index.box_array(1)
+    np.testing.assert_allclose(boxes.x, [0.1, 0.0])
+    np.testing.assert_allclose(boxes.h, [0.2, 0.5])
+    assert index.yolo_text(0) == "0 0.250000 0.250000 0.500000 0.500000\n"
+    assert index.yolo_text(2) is None
+
+
+def test_save_and_load(tmp_path):
+    index = CocoIndex.parse(io.BytesIO(coco_bytes()))
+    path = str(tmp_path / "index.npz")
+    index.save(path, (1, 2))
+    loaded = CocoIndex.load(path, (1, 2))
+    assert loaded.file_names == index.file_names
+    assert loaded.category_names == index.category_names
+    np.testing.assert_array_equal(loaded.offsets, index.offsets)
+    np.testing.assert_array_equal(loaded.boxes, index.boxes)
+    assert CocoIndex.load(path, (1, 3)) is None
+    assert CocoIndex.load(str(tmp_path / "missing.npz"), (1, 2)) is None
+
+
+def test_is_coco_name():
+    assert is_coco_name("annotations/instances_val2017.json")
+    assert is_coco_name("instances.json")
+    assert is_coco_name("annotations/train.json")
+    assert not is_coco_name("labels/meta.json")
+
+
+def png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 4)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(coco, "CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+def test_loader_on_a_folder(tmp_path, cache_dir):
+    dataset = tmp_path / "dataset"
+    (dataset / "sub").mkdir(parents=True)
+    (dataset / "annotations").mkdir()
+    for name in ("c.png", "sub/a.png", "b.png", "unlisted.png"):
+        (dataset / name).write_bytes(png_bytes())
+    (dataset / "annotations" / "instances.json").write_bytes(coco_bytes())
+
+    loader = CocoLoader(str(dataset))
+    assert loader.data_item_name_list == ["b.png", "c.png", "sub/a.png"]  # the folder's order
+    item = loader.get_item_by_index(2)
+    assert item.box_array.class_id.tolist() == [2, 0]
+    assert loader.read_annotation(0) is None
+    assert len(list(cache_dir.iterdir())) == 1
+
+    reopened = pickle.loads(pickle.dumps(loader))  # from the cached index
+    assert reopened.read_annotation(1) == loader.read_annotation(1)
+    assert reopened.annotation_stamp(2) == loader.annotation_stamp(2)
+
+
+def test_loader_on_a_zip(tmp_path, cache_dir):
+    zip_path = tmp_path / "dataset.zip"
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        for name in ("c.png", "sub/a.png"):
+            zf.writestr(name, png_bytes())
+        zf.writestr("annotations/instances.json", coco_bytes(), zipfile.ZIP_DEFLATED)
+    loader = CocoLoader(str(zip_path))
+    assert loader.data_item_name_list == ["c.png", "sub/a.png"]
+    assert loader.get_item_by_index(0).annotation == "0 0.250000 0.250000 0.500000 0.500000\n"
@@ -0,0 +1,39 @@
+import numpy as np
+
+from data_item import Box, BoxArray
+
+
+def test_from_yolo_converts_centers_to_corners():
+    boxes = BoxArray.from_yolo("0 0.5 0.5 0.2 0.4\n3 0.1 0.2 0.1 0.1\n")
+    assert boxes.class_id.tolist() == [0, 3]
+    np.testing.assert_allclose(boxes.x, [0.4, 0.05])
+    np.testing.assert_allclose(boxes.y, [0.3, 0.15])
+    np.testing.assert_allclose(boxes.w, [0.2, 0.1])
+    assert boxes.class_id.dtype == np.int32
+
+
+def test_from_yolo_empty():
+    for text in (None, "", "  \n\n"):
+        assert len(BoxArray.from_yolo(text)) == 0
+
+
+def test_from_yolo_skips_short_lines_even_if_the_total_count_fits():
+    # 4 + 6 fields add up to 2 lines of 5, which must not be re-split across lines
+    boxes = BoxArray.from_yolo("0 .5 .5 .2\n1 .1 .1 .1 .1 .9", center=False)
+    assert boxes.to_boxes() == [Box(1, 0.1, 0.1, 0.1, 0.1)]
+
+
+def test_from_yolo_skips_blank_lines_and_ignores_extra_fields():
+    boxes = BoxArray.from_yolo("\n2 .1 .2 .3 .4 0.99\n\n5 .5 .5 .5 .5\n", center=False)
+    assert boxes.class_id.tolist() == [2, 5]
+    np.testing.assert_allclose(boxes.h, [0.4, 0.5])
+
+
+def test_from_yolo_skips_non_numeric_lines():
+    # 5 fields on every line, as taken by the fast path
+    boxes = BoxArray.from_yolo("person .5 .5 .2 .2\n1 .1 .1 .1 .1", center=False)
+    assert boxes.to_boxes() == [Box(1, 0.1, 0.1, 0.1, 0.1)]
+    # mixed field counts
+    boxes = BoxArray.from_yolo("1 .1 .1 .1 .1\n2 .5 .5 .2 .2 extra\n3 .5 .5 wide .2 .9")
+    assert boxes.class_id.tolist() == [1, 2]
+    assert len(BoxArray.from_yolo("person .5 .5 .2 .2")) == 0
@@ -0,0 +1,75 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from data_loader import FolderLoader
+from dataset_stats import DatasetStatistics
+
+LABELS = {
+    "a": "0 0.5 0.5 0.2 0.2\n1 0.5 0.5 0.4 0.1\n",
+    "b": "1 0.5 0.5 0.2 0.2\n1 0.95 0.5 0.2 0.2\n",  # the second box crosses the right edge
+    "c": "",
+    "d": None,
+    "e": "-1 0.5 0.5 0.1 0.1\n",
+    "f": "person 0.5 0.5 0.1 0.1\n",
+}
+
+
+def make_folder(root, labels: dict[str, str | None]):
+    for name, label in labels.items():
+        (root / f"{name}.jpg").write_bytes(b"not decoded")
+        if label is not None:
+            (root / f"{name}.txt").write_text(label)
+
+
+@pytest.fixture
+def folder(tmp_path):
+    root = tmp_path / "dataset"
+    root.mkdir()
+    make_folder(root, LABELS)
+    return root
+
+
+def test_compute(folder):
+    stats = DatasetStatistics.compute(FolderLoader(str(folder)))
+    assert (stats.n_items, stats.n_boxes, stats.rescanned) == (6, 4, 6)
+    assert stats.status_counts() == {"annotated": 2, "unannotated": 1, "empty": 1, "malformed": 2}
+    assert stats.class_histogram() == {0: 1, 1: 3}
+    assert stats.boxes_per_image_histogram() == {0: 4, 2: 2}
+    assert stats.columns["n_out_of_range"].tolist() == [0, 1, 0, 0, 0, 0]
+
+
+def test_to_dict(folder):
+    result = DatasetStatistics.compute(FolderLoader(str(folder))).to_dict()
+    json.dumps(result)  # plain types only
+    assert result["n_out_of_range_boxes"] == result["n_items_with_out_of_range_boxes"] == 1
+    assert sum(result["box_size_histogram"]["counts"]) == 4
+    assert len(result["box_size_histogram"]["bin_edges"]) == len(result["box_size_histogram"]["counts"]) + 1
+    assert sum(result["box_aspect_log2_histogram"]["counts"]) == 4
+
+
+def test_empty_dataset(tmp_path):
+    result = DatasetStatistics.compute(FolderLoader(str(tmp_path))).to_dict()
+    assert (result["n_items"], result["n_boxes"], result["class_histogram"]) == (0, 0, {})
+
+
+def test_cache_reuses_unchanged_items(folder, tmp_path):
+    cache_path = str(tmp_path / "cache" / "stats.npz")
+    first = DatasetStatistics.compute(FolderLoader(str(folder)), cache_path=cache_path)
+    assert first.rescanned == 6
+    again = DatasetStatistics.compute(FolderLoader(str(folder)), cache_path=cache_path)
+    assert again.rescanned == 0
+
+    (folder / "a.txt").write_text("2 0.5 0.5 0.1 0.1\n")  # modified
+    os.remove(folder / "b.jpg")  # removed, with its annotation
+    os.remove(folder / "b.txt")
+    make_folder(folder, {"g": "3 0.5 0.5 0.1 0.1\n3 0.5 0.5 0.3 0.3\n"})  # added
+    cached = DatasetStatistics.compute(FolderLoader(str(folder)), cache_path=cache_path)
+    assert cached.rescanned == 2
+    fresh = DatasetStatistics.compute(FolderLoader(str(folder)))
+    assert cached.columns.keys() == fresh.columns.keys()
+    for field in fresh.columns:
+        np.testing.assert_array_equal(cached.columns[field], fresh.columns[field], err_msg=field)
+    assert cached.class_histogram() == {2: 1, 3: 2}
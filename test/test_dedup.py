@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import dedup
+from data_loader import FolderLoader
+from dedup import compute_hashes, connected_components, find_duplicates, hamming_distance, near_pairs
+
+
+def clustered_hashes(n: int, seed: int) -> np.ndarray:
+    """Random 64-bit hashes, many of them a few bit flips away from an earlier one."""
+    rng = np.random.default_rng(seed)
+    hashes = rng.integers(0, 2**64, n, dtype=np.uint64, endpoint=False)
+    for i in range(1, n):
+        if rng.random() < 0.6:
+            flips = rng.choice(64, rng.integers(0, 9), replace=False)
+            hashes[i] = hashes[rng.integers(0, i)] ^ np.uint64(sum(1 << int(bit) for bit in flips))
+    return np.unique(hashes)  # near_pairs expects distinct hashes
+
+
+def brute_force_pairs(hashes: np.ndarray, max_distance: int) -> list[tuple[int, int]]:
+    i, j = np.triu_indices(len(hashes), k=1)
+    near = hamming_distance(hashes[i], hashes[j]) <= max_distance
+    return list(zip(i[near].tolist(), j[near].tolist()))
+
+
+@pytest.mark.parametrize("n", [2, 50, 600])
+@pytest.mark.parametrize("max_distance", [0, 1, 3, 4, 8, 12])
+def test_near_pairs_match_brute_force(n, max_distance):
+    hashes = clustered_hashes(n, seed=n * 31 + max_distance)
+    first, second = near_pairs(hashes, max_distance)
+    assert list(zip(first.tolist(), second.tolist())) == brute_force_pairs(hashes, max_distance)
+
+
+@pytest.mark.parametrize("n", [0, 1])
+def test_near_pairs_of_empty_and_single_input(n):
+    first, second = near_pairs(np.arange(n, dtype=np.uint64), 4)
+    assert len(first) == len(second) == 0
+
+
+def test_connected_components_label_by_smallest_node():
+    labels = connected_components(7, np.array([5, 1, 3]), np.array([6, 3, 6]))
+    assert labels.tolist() == [0, 1, 2, 1, 4, 1, 1]
+
+
+def test_connected_components_match_union_find():
+    rng = np.random.default_rng(1)
+    n = 300
+    first, second = rng.integers(0, n, (2, 250))
+    parent = list(range(n))
+
+    def root(node: int) -> int:
+        while parent[node] != node:
+            node = parent[node]
+        return node
+
+    for a, b in zip(first.tolist(), second.tolist()):
+        low, high = sorted((root(a), root(b)))
+        parent[high] = low
+    assert connected_components(n, first, second).tolist() == [root(node) for node in range(n)]
+
+
+def test_find_duplicates_groups_exact_and_near_hashes():
+    hashes = np.array([0b1111, 0b0111, 1 << 40, 0b1111, 0b0011, 1 << 40, 1 << 50], dtype=np.uint64)
+    valid = np.array([True, True, True, True, True, True, False])
+    groups = find_duplicates(hashes, valid, max_distance=1)
+    assert [group.tolist() for group in groups] == [[0, 1, 3, 4], [2, 5]]
+    groups = find_duplicates(hashes, valid, max_distance=0)
+    assert sorted(group.tolist() for group in groups) == [[0, 3], [2, 5]]
+
+
+@pytest.mark.parametrize("n", [0, 1])
+def test_find_duplicates_of_empty_and_single_input(n):
+    assert find_duplicates(np.zeros(n, np.uint64), np.ones(n, np.bool_), max_distance=4) == []
+
+
+def test_compute_hashes_reuses_the_cache(tmp_path, monkeypatch):
+    folder = tmp_path / "dataset"
+    folder.mkdir()
+    rng = np.random.default_rng(0)
+    for i in range(6):
+        Image.fromarray(rng.integers(0, 256, (40, 40), dtype=np.uint8)).save(folder / f"img{i}.png")
+    (folder / "img5.png").write_bytes(b"not an image")
+    hashed = []
+    hash_items = dedup.hash_items
+
+    def counting_hash_items(data_loader, indices, method):
+        hashed.extend(indices)
+        return hash_items(data_loader, indices, method)
+
+    monkeypatch.setattr(dedup, "hash_items", counting_hash_items)
+    cache_path = str(tmp_path / "cache" / "hashes.npz")
+
+    hashes, valid = compute_hashes(FolderLoader(str(folder)), cache_path=cache_path)
+    assert sorted(hashed) == list(range(6))
+    assert valid.tolist() == [True] * 5 + [False]
+    hashed.clear()
+    again = compute_hashes(FolderLoader(str(folder)), cache_path=cache_path)
+    assert hashed == []
+    np.testing.assert_array_equal(again[0], hashes)
+    np.testing.assert_array_equal(again[1], valid)
+
+    Image.new("L", (30, 30)).save(folder / "img2.png")  # changed, with another image stamp
+    updated = compute_hashes(FolderLoader(str(folder)), cache_path=cache_path)
+    assert hashed == [2]
+    fresh = compute_hashes(FolderLoader(str(folder)))
+    np.testing.assert_array_equal(updated[0], fresh[0])
+    np.testing.assert_array_equal(updated[1], fresh[1])
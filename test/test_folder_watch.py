@@ -0,0 +1,160 @@
+import os
+import random
+import shutil
+
+import pytest
+
+from data_loader import FolderLoader, folder_sort_key
+from folder_watch import FolderChanges, FolderWatcher
+
+
+def write(root, name: str, data: bytes = b"x"):
+    path = os.path.join(root, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+@pytest.fixture
+def folder(tmp_path):
+    for directory in ("", "a", "a/b", "c"):
+        for i in range(0, 20, 2):
+            write(tmp_path, os.path.join(directory, f"img{i}.jpg"))
+            if i % 4 == 0:
+                write(tmp_path, os.path.join(directory, f"img{i}.txt"), b"0 .5 .5 .1 .1")
+    return tmp_path
+
+
+def apply_and_check(loader: FolderLoader, changes: FolderChanges, root) -> list[int]:
+    """Apply `changes` and check the list against a fresh walk, and the mapping against the old list."""
+    old = list(loader.data_item_name_list)
+    mapping, touched = loader.apply_changes(changes)
+    fresh = FolderLoader(str(root))
+    assert loader.data_item_name_list == fresh.data_item_name_list
+    assert loader._annotation_name_set == fresh._annotation_name_set
+    for index, name in enumerate(old):
+        if mapping[index] >= 0:
+            assert loader.data_item_name_list[mapping[index]] == name
+        else:
+            assert name in changes.removed
+    return touched
+
+
+def test_folder_sort_key_matches_the_walk(folder):
+    names = FolderLoader(str(folder)).data_item_name_list
+    assert names == sorted(names, key=folder_sort_key)
+    assert names[:2] == ["img0.jpg", "img2.jpg"] and names[-1] == os.path.join("c", "img18.jpg")
+
+
+def test_snapshot_reports_files_written_after_the_walk(folder):
+    loader = FolderLoader(str(folder))
+    write(folder, "late.jpg")
+    write(folder, os.path.join("a", "img2.txt"))
+    watcher, changes = loader.watch()
+    assert changes.added == ["late.jpg"]
+    assert changes.added_annotations == [os.path.join("a", "img2.txt")]
+    assert changes.modified == [os.path.join("a", "img2.jpg")]
+    touched = apply_and_check(loader, changes, folder)
+    assert [loader.data_item_name_list[i] for i in touched] == ["late.jpg", os.path.join("a", "img2.jpg")]
+
+
+def test_random_changes_merge_into_the_sorted_list(folder):
+    rng = random.Random(1)
+    loader = FolderLoader(str(folder))
+    watcher, changes = loader.watch()
+    apply_and_check(loader, changes, folder)
+    for step in range(20):
+        for _ in range(rng.randint(0, 40)):
+            name = os.path.join(rng.choice(["", "a", "a/b", "c", "c/new", "zz"]), f"img{rng.randint(0, 30)}")
+            path = os.path.join(folder, name)
+            operation = rng.random()
+            if operation < 0.4:
+                write(folder, name + ".jpg")
+            elif operation < 0.6 and os.path.exists(path + ".jpg"):
+                os.remove(path + ".jpg")
+            elif operation < 0.8:
+                write(folder, name + ".txt", os.urandom(rng.randint(1, 9)))
+            elif os.path.exists(path + ".txt"):
+                os.remove(path + ".txt")
+        if step == 10:
+            shutil.rmtree(folder / "a" / "b")
+        apply_and_check(loader, watcher.poll(), folder)
+
+
+def test_in_place_rewrite_is_found_on_the_first_poll(folder):
+    loader = FolderLoader(str(folder))
+    watcher, _ = loader.watch()
+    path = os.path.join(folder, "c", "img4.txt")
+    directory_mtime = os.stat(os.path.dirname(path)).st_mtime_ns
+    with open(path, "ab") as f:
+        f.write(b"\n1 .2 .2 .1 .1")
+    assert os.stat(os.path.dirname(path)).st_mtime_ns == directory_mtime
+    assert watcher.poll().modified == [os.path.join("c", "img4.jpg")]
+
+
+def test_sweep_wraps_and_visits_every_directory_once_per_cycle(tmp_path):
+    directories = [f"d{i}" for i in range(7)]
+    for directory in ["", *directories]:
+        write(tmp_path, os.path.join(directory, "img.jpg"))
+    # about 2 directories per poll: each counts its entry plus one
+    watcher = FolderWatcher(str(tmp_path), sweep_entries=3)
+    watcher.snapshot()
+    for cycle in range(3):
+        found = []
+        for directory in ["", *directories]:
+            write(tmp_path, os.path.join(directory, "img.jpg"), b"%d" % (cycle + 10))
+        for _ in range(4):  # 8 directories, 2 per poll
+            found += watcher.poll().modified
+        assert sorted(found) == sorted(os.path.join(d, "img.jpg") for d in ["", *directories])
+
+
+def test_sweep_keeps_its_place_when_directories_are_added(tmp_path):
+    for directory in ("b", "d", "f"):
+        write(tmp_path, os.path.join(directory, "img.jpg"))
+    watcher = FolderWatcher(str(tmp_path), sweep_entries=1)  # one directory per poll
+    watcher.snapshot()
+    watcher.poll()  # sweeps the root
+    write(tmp_path, os.path.join("a", "img.jpg"))  # sorts before the directories due
+    changes = watcher.poll()  # finds "a" by the root mtime, and sweeps "b"
+    assert changes.added == [os.path.join("a", "img.jpg")]
+    write(tmp_path, os.path.join("d", "img.jpg"), b"rewritten")
+    assert watcher.poll().modified == [os.path.join("d", "img.jpg")]
+
+
+def test_apply_changes_ignores_images_reported_twice(folder):
+    loader = FolderLoader(str(folder))
+    write(folder, "new.jpg")
+    _, touched = loader.apply_changes(FolderChanges(added=["new.jpg", "new.jpg"]))
+    new_index = loader.data_item_name_list.index("new.jpg")
+    assert touched == [new_index]
+    # e.g., a repeated event, or a file the walk listed too: nothing moves, the items are touched
+    mapping, touched = loader.apply_changes(FolderChanges(added=["new.jpg", "img0.jpg"]))
+    assert loader.data_item_name_list == FolderLoader(str(folder)).data_item_name_list
+    assert mapping.tolist() == list(range(len(loader)))
+    assert touched == [0, new_index]
+
+
+def test_poll_with_malformed_labels_merges_into_the_search_index(folder):
+    from annotation_status import AnnotationStatus, classify_annotation
+    from search_index import SearchIndex
+
+    loader = FolderLoader(str(folder))
+    index = SearchIndex.build(loader)
+    watcher, _ = loader.watch()
+    write(folder, "new.jpg")
+    write(folder, "new.txt", b"person 0.5 0.5 0.1 0.1\n")
+    write(folder, os.path.join("a", "img0.txt"), b"3 0.5 0.5 0.1 0.1\n3 0.5")  # e.g., still being written
+    changes = watcher.poll()
+    assert changes.added == ["new.jpg"]
+    assert changes.modified == [os.path.join("a", "img0.jpg")]
+
+    # as the app merges them, see `ImageBrowser._merge_folder_changes`
+    mapping, touched = loader.apply_changes(changes)
+    index.remap(mapping, len(loader))
+    for base_index in touched:
+        annotation = loader.read_annotation(base_index)
+        assert classify_annotation(annotation) is AnnotationStatus.MALFORMED
+        index.update_item(base_index, annotation)
+    rebuilt = SearchIndex.build(loader)
+    for text in ("class:0", "class:3", "boxes=0", "boxes=1", "new"):
+        assert index.query(text).tolist() == rebuilt.query(text).tolist(), text
@@ -0,0 +1,101 @@
+import numpy as np
+from PIL import Image
+
+from frame_cache import FrameCache, LRUCache, image_nbytes
+
+
+def test_lru_cache_evicts_least_recently_used_over_budget():
+    cache = LRUCache(max_bytes=3, sizeof=len)
+    cache.put("a", "x")
+    cache.put("b", "xx")
+    cache.get("a")
+    cache.put("c", "x")  # 4 bytes, "b" is the least recently used
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.nbytes == 2
+
+
+def filled_cache(n: int) -> FrameCache:
+    cache = FrameCache()
+    for index in range(n):
+        image = Image.new("L", (2, 2), index)
+        cache.originals.put(index, type("Item", (), {"image": image})())
+        cache.rendered.put((index, (2, 2)), (None, image))
+    return cache
+
+
+def test_invalidate_drops_only_the_given_items():
+    cache = filled_cache(4)
+    cache.invalidate([1, 3])
+    assert sorted(cache.originals._entries) == [0, 2]
+    assert sorted(cache.rendered._entries) == [(0, (2, 2)), (2, (2, 2))]
+    assert cache.originals.nbytes == 2 * image_nbytes(Image.new("L", (2, 2)))
+
+
+def test_remap_follows_items_and_drops_removed_ones():
+    cache = filled_cache(4)
+    cache.remap(np.array([0, -1, 3, 4]))
+    assert list(cache.originals._entries) == [0, 3, 4]
+    assert cache.originals.get(3).image.getpixel((0, 0)) == 2
+    assert cache.rendered.get((4, (2, 2)))[1].getpixel((0, 0)) == 3
+    assert cache.originals.nbytes == 3 * 4
+
+
+def test_peek_does_not_count():
+    cache = LRUCache(max_bytes=10, sizeof=len)
+    cache.put("a", "x")
+    assert cache.peek("a") == "x" and cache.peek("b") is None
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+class ImmediateMaster:
+    def after(self, delay_ms, function, *args):
+        function(*args)
+
+
+def test_displayed_frames_are_counted_once(tmp_path):
+    from app import ImageBrowser
+    from data_loader import FolderLoader
+    from prefetch import PrefetchScheduler
+    from visualizer import AnnotatedImageVisualizer
+
+    for i in range(10):
+        Image.new("RGB", (64, 48), (i, 0, 0)).save(tmp_path / f"img{i}.png")
+
+    class Browser:
+        """The state `show_image` and the render workers use, without a Tk window."""
+        _cache_key = ImageBrowser._cache_key
+        _load_item = ImageBrowser._load_item
+        _render_frame = ImageBrowser._render_frame
+        show_image = ImageBrowser.show_image
+
+        def __init__(self):
+            self.data_loader = self.base_loader = FolderLoader(str(tmp_path))
+            self.frame_cache = FrameCache()
+            self.visualizer = AnnotatedImageVisualizer()
+            self.prefetcher = PrefetchScheduler(ImmediateMaster(), self._render_frame)
+            self.list_generation = 0
+            self.view_mode = "single"
+            self.current_image_index = 0
+            self.scroll_direction = 1
+            self.shown = []
+
+        def _label_size(self):
+            return 32, 24
+
+        def _display_frame(self, index, frame):
+            self.shown.append(index)
+
+    browser = Browser()
+    browser.show_image()  # a miss, rendered in a worker, with 4 neighbors prefetched
+    browser.prefetcher._executor.shutdown(wait=True)  # all rendered
+    assert browser.shown == [0]
+    rendered = browser.frame_cache.rendered
+    assert (rendered.hits, rendered.misses, len(rendered)) == (0, 1, 5)
+
+    browser.prefetcher = PrefetchScheduler(ImmediateMaster(), browser._render_frame)
+    for index in (1, 2):  # prefetched
+        browser.current_image_index = index
+        browser.show_image()
+    browser.prefetcher.shutdown()
+    assert browser.shown == [0, 1, 2]
+    assert (rendered.hits, rendered.misses) == (2, 1)
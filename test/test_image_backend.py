@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+from PIL import Image
+
+from image_backend import BACKENDS, PILBackend, benchmark_backends, bound_decoding, get_backend, use_backend
+
+
+def palette_image() -> Image.Image:
+    """Left half red, right half black, as palette indices 1 and 0."""
+    image = Image.new("P", (40, 40))
+    image.putpalette([0, 0, 0, 255, 0, 0] + [0, 0, 0] * 254)
+    image.paste(1, (0, 0, 20, 40))
+    return image
+
+
+@pytest.mark.parametrize("name", list(BACKENDS))
+def test_resize_converts_palette_images(name):
+    try:
+        backend = BACKENDS[name]()
+    except ImportError:
+        pytest.skip(f"{name} is not installed")
+    resized = backend.resize(palette_image(), (20, 20)).convert("RGB")
+    assert resized.size == (20, 20)
+    assert resized.getpixel((2, 10)) == (255, 0, 0)
+    assert resized.getpixel((18, 10)) == (0, 0, 0)
+
+
+def test_use_backend_is_thread_local():
+    selected = get_backend()
+    backend = PILBackend()
+    seen = []
+    with use_backend(backend):
+        assert get_backend() is backend
+        thread = threading.Thread(target=lambda: seen.append(get_backend()))
+        thread.start()
+        thread.join()
+    assert seen == [selected]
+    assert get_backend() is selected
+
+
+@pytest.mark.parametrize("name", list(BACKENDS))
+@pytest.mark.parametrize("format, mode", [("JPEG", "RGB"), ("PNG", "RGB"), ("PNG", "P")])
+def test_bound_decoding_fits_images_just_over_the_bound(tmp_path, name, format, mode):
+    try:
+        backend = BACKENDS[name]()
+    except ImportError:
+        pytest.skip(f"{name} is not installed")
+    path = str(tmp_path / f"wide.{format.lower()}")
+    Image.new(mode, (16384 + 16, 24)).save(path, format)  # just over the bound
+    with use_backend(backend), bound_decoding((16384, 16384)):
+        image = backend.open_image(path)
+    assert image.size[0] <= 16384
+    assert image.info["full_size"] == (16384 + 16, 24)
+    full = backend.open_image(path)  # no bound outside the context
+    assert full.size == (16384 + 16, 24)
+
+
+def test_bound_decoding_reduces_beyond_the_dct_scales(tmp_path):
+    path = str(tmp_path / "large.jpg")
+    Image.new("RGB", (2000, 900)).save(path)
+    with bound_decoding((200, 200)):  # factor 10, past DCT scaling by 1/8
+        image = PILBackend().open_image(path)
+    assert max(image.size) <= 200
+    assert image.info["full_size"] == (2000, 900)
+
+
+def test_benchmark_backends_alternate_which_goes_first(tmp_path):
+    from data_loader import FolderLoader
+    from visualizer import AnnotatedImageVisualizer
+
+    for i in range(4):
+        Image.new("RGB", (64, 48)).save(tmp_path / f"img{i}.jpg")
+    folder_loader = FolderLoader(str(tmp_path))
+    order = []
+
+    class RecordingLoader:
+        def __len__(self):
+            return len(folder_loader)
+
+        def get_item_by_index(self, index, target_size=None):
+            order.append(get_backend().name)
+            return folder_loader.get_item_by_index(index, target_size)
+
+    timings = benchmark_backends(RecordingLoader(), AnnotatedImageVisualizer(), (32, 24), samples=4)
+    assert set(timings) == set(order)
+    if len(timings) == 2:
+        firsts = order[::2]
+        assert firsts == [firsts[0], firsts[1]] * 2 and firsts[0] != firsts[1]
@@ -0,0 +1,50 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+from PIL import Image
+
+from data_loader import FolderLoader, TarLoader, ZipLoader, open_data_loader
+
+
+def png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (4, 4)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_folder(tmp_path):
+    (tmp_path / "a.png").write_bytes(png_bytes())
+    assert isinstance(open_data_loader(str(tmp_path)), FolderLoader)
+    assert len(open_data_loader(str(tmp_path))) == 1
+    lazy = open_data_loader(str(tmp_path), eager=False)
+    assert len(lazy) == 0
+    assert sum(map(len, lazy.scan())) == 1
+
+
+def test_zip_with_progress(tmp_path):
+    zip_path = tmp_path / "data.zip"
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        zf.writestr("a.png", png_bytes())
+    data_loader = open_data_loader(str(zip_path), progress=lambda done, total: None)
+    assert isinstance(data_loader, ZipLoader)
+    assert data_loader.data_item_name_list == ["a.png"]
+
+
+def test_tar_shards(tmp_path):
+    data = png_bytes()
+    with tarfile.open(tmp_path / "shard-000.tar", "w") as tar:
+        info = tarfile.TarInfo("a.png")
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    data_loader = open_data_loader(str(tmp_path))
+    assert isinstance(data_loader, TarLoader)
+    assert data_loader.get_item_by_index(0).image.size == (4, 4)
+
+
+def test_unsupported(tmp_path):
+    path = tmp_path / "data.rar"
+    path.write_bytes(b"")
+    with pytest.raises(ValueError):
+        open_data_loader(str(path))
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from data_item import BoxArray
+from search_index import IndexedNames, LoaderView, SearchIndex
+
+
+def make_index(names: list[str], annotations: list[str | None]) -> SearchIndex:
+    boxes = [BoxArray.from_yolo(annotation) for annotation in annotations]
+    class_items: dict[int, list[int]] = {}
+    for index, array in enumerate(boxes):
+        for class_id in sorted(set(array.class_id.tolist())):
+            class_items.setdefault(class_id, []).append(index)
+    return SearchIndex(
+        names,
+        np.array([len(array) for array in boxes], dtype=np.int32),
+        {class_id: np.array(items, dtype=np.int64) for class_id, items in class_items.items()},
+    )
+
+
+def box(class_id: int) -> str:
+    return f"{class_id} 0.5 0.5 0.1 0.1\n"
+
+
+NAMES = ["train/a.jpg", "train/b.jpg", "val/c.jpg", "val/d.jpg", "test/e.jpg"]
+ANNOTATIONS = [box(1), box(1) + box(2) + box(2), None, box(7) * 3, box(2)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", [0, 1, 2, 3, 4]),
+    ("class:2", [1, 4]),
+    ("class:9", []),
+    ("boxes>1", [1, 3]),
+    ("boxes>=3", [1, 3]),
+    ("boxes<1", [2]),
+    ("boxes<=1", [0, 2, 4]),
+    ("boxes=3", [1, 3]),
+    ("boxes:0", [2]),
+    ("name:val/", [2, 3]),
+    ("train/", [0, 1]),
+    ("re:[ce]\\.jpg$", [2, 4]),
+    ("class:2 name:train/", [1]),
+    ("val/ boxes >= 1", [3]),
+])
+def test_query(text, expected):
+    assert make_index(NAMES, ANNOTATIONS).query(text).tolist() == expected
+
+
+def test_query_rejects_bad_values():
+    index = make_index(NAMES, ANNOTATIONS)
+    with pytest.raises(ValueError):
+        index.query("class:x")
+
+
+def test_update_item_moves_the_item_between_classes():
+    index = make_index(NAMES, ANNOTATIONS)
+    index.update_item(0, box(2) + box(5))
+    assert index.query("class:1").tolist() == [1]
+    assert index.query("class:2").tolist() == [0, 1, 4]
+    assert index.query("class:5").tolist() == [0]
+    assert index.query("boxes=2").tolist() == [0]
+
+
+
+@pytest.mark.parametrize("annotation", ["person 0.5 0.5 0.1 0.1\n", box(1) + "1 0.5 0.5\n", ""])
+def test_update_item_indexes_malformed_labels_without_boxes(annotation):
+    index = make_index(NAMES, ANNOTATIONS)
+    index.update_item(0, annotation)
+    assert index.query("class:1").tolist() == [1]
+    assert index.query("boxes=0").tolist() == [0, 2]
+
+def test_remap_and_update_match_a_rebuilt_index():
+    names = list(NAMES)
+    index = make_index(names, ANNOTATIONS)
+    # remove val/c.jpg, add train/aa.jpg after train/a.jpg, as the loader's list changes in place
+    names[:] = ["train/a.jpg", "train/aa.jpg", "train/b.jpg", "val/d.jpg", "test/e.jpg"]
+    annotations = [ANNOTATIONS[0], box(7), ANNOTATIONS[1], ANNOTATIONS[3], ANNOTATIONS[4]]
+    index.remap(np.array([0, 2, -1, 3, 4]), len(names))
+    index.update_item(1, annotations[1])
+
+    rebuilt = make_index(names, annotations)
+    for text in ("class:1", "class:2", "class:7", "boxes>0", "boxes=1", "train/", "name:t", "re:a"):
+        assert index.query(text).tolist() == rebuilt.query(text).tolist(), text
+
+
+def test_loader_view_names():
+    view_names = IndexedNames(NAMES, np.array([3, 0]))
+    assert list(view_names) == ["val/d.jpg", "train/a.jpg"]
+    assert view_names[:1] == ["val/d.jpg"]
+
+
+def test_loader_view_maps_to_base_indices():
+    class Loader:
+        data_item_name_list = NAMES
+
+        def read_annotation(self, index):
+            return ANNOTATIONS[index]
+
+    view = LoaderView(Loader(), np.array([4, 1]))
+    assert len(view) == 2
+    assert view.base_index(1) == 1
+    assert view.read_annotation(0) == ANNOTATIONS[4]
@@ -0,0 +1,45 @@
+import io
+import os
+import tarfile
+
+from tar_index import TarIndex, index_paths, list_shards
+
+
+def write_shard(path, members: dict[str, bytes]):
+    with tarfile.open(path, "w") as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+def make_shards(folder):
+    write_shard(folder / "shard-10.tar", {"x/img2.jpg": b"c", "x/img2.txt": b"0 .5 .5 .1 .1"})
+    write_shard(folder / "shard-2.tar", {"x/img10.jpg": b"a", "x/img1.jpg": b"b", "x/img10.txt": b""})
+
+
+def test_build_sorts_naturally_and_pairs_annotations_within_a_shard(tmp_path):
+    make_shards(tmp_path)
+    shards = list_shards(str(tmp_path))
+    assert [name for name, _, _ in shards] == ["shard-2.tar", "shard-10.tar"]
+    index = TarIndex.build(str(tmp_path), shards)
+    assert index.image_names == ["x/img1.jpg", "x/img2.jpg", "x/img10.jpg"]
+    assert index.images["shard"].tolist() == [0, 1, 0]
+    assert index.annotation_of.tolist() == [-1, 0, 1]
+
+    with open(tmp_path / "shard-2.tar", "rb") as f:
+        f.seek(int(index.images[2]["offset"]))
+        assert f.read(int(index.images[2]["size"])) == b"a"
+
+
+def test_open_persists_and_rebuilds_when_a_shard_changes(tmp_path):
+    make_shards(tmp_path)
+    TarIndex.open(str(tmp_path))
+    path = index_paths(str(tmp_path))[0]
+    assert os.path.exists(path)
+    loaded = TarIndex.load(path, list_shards(str(tmp_path)))
+    assert loaded is not None and len(loaded) == 3
+
+    write_shard(tmp_path / "shard-3.tar", {"y/new.png": b"d"})
+    assert TarIndex.load(path, list_shards(str(tmp_path))) is None
+    assert "y/new.png" in TarIndex.open(str(tmp_path)).image_names
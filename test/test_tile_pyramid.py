@@ -0,0 +1,26 @@
+import numpy as np
+from PIL import Image
+
+from tile_pyramid import TilePyramid
+
+
+def gradient(width: int, height: int) -> Image.Image:
+    x = np.arange(width, dtype=np.uint8)[None, :].repeat(height, axis=0)
+    return Image.fromarray(np.stack([x, x, x], axis=2))
+
+
+def test_levels_halve_and_average():
+    pyramid = TilePyramid(gradient(1000, 600), tile_size=256)
+    assert pyramid.n_levels == 3
+    assert pyramid.level_size(2) == (250, 150)
+    level = pyramid.level(1)
+    assert level.shape == (300, 500, 3)
+    assert level[0, 10, 0] == (20 + 21 + 20 + 21 + 2) // 4
+
+
+def test_region_composes_tiles():
+    image = gradient(700, 300)
+    pyramid = TilePyramid(image, tile_size=256)
+    region = pyramid.region(0, (200, 100, 600, 280))
+    np.testing.assert_array_equal(np.asarray(region), np.asarray(image.crop((200, 100, 600, 280))))
+    assert pyramid.full_size is None
@@ -0,0 +1,48 @@
+import os
+import zipfile
+
+import numpy as np
+
+from zip_index import ZipIndex, archive_stamp, index_paths
+
+
+def make_zip(path, names):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name in names:
+            zf.writestr(name, b"data of " + name.encode())
+
+
+def test_build_sorts_naturally_and_pairs_annotations(tmp_path):
+    zip_path = tmp_path / "data.zip"
+    make_zip(zip_path, ["b/img10.jpg", "b/img2.jpg", "a/x.png", "b/img2.txt", "notes.md"])
+    index = ZipIndex.build(str(zip_path))
+    assert index.image_names == ["a/x.png", "b/img2.jpg", "b/img10.jpg"]
+    assert index.annotation_of.tolist() == [-1, 0, -1]
+
+
+def test_open_persists_a_sidecar_and_reloads_it(tmp_path):
+    zip_path = tmp_path / "data.zip"
+    make_zip(zip_path, [f"img{i}.jpg" for i in range(5)] + ["img3.txt", "coco.json"])
+    built = ZipIndex.open(str(zip_path))
+    sidecar = index_paths(str(zip_path))[0]
+    assert os.path.exists(sidecar)
+
+    loaded = ZipIndex.load(sidecar, archive_stamp(str(zip_path)))
+    assert loaded is not None
+    assert loaded.image_names == built.image_names
+    assert loaded.json_names == ["coco.json"]
+    np.testing.assert_array_equal(loaded.images, built.images)
+    np.testing.assert_array_equal(loaded.annotation_of, built.annotation_of)
+
+
+def test_load_rejects_stale_or_truncated_indexes(tmp_path):
+    zip_path = tmp_path / "data.zip"
+    make_zip(zip_path, [f"img{i}.jpg" for i in range(5)])
+    ZipIndex.open(str(zip_path))
+    sidecar = index_paths(str(zip_path))[0]
+    size, mtime = archive_stamp(str(zip_path))
+    assert ZipIndex.load(sidecar, (size + 1, mtime)) is None
+
+    with open(sidecar, "r+b") as f:
+        f.truncate(os.path.getsize(sidecar) - 8)
+    assert ZipIndex.load(sidecar, (size, mtime)) is None
@@ -0,0 +1,99 @@
+import io
+import json
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from data_loader import ZipLoader
+
+
+def png_bytes(value: int = 0) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (4, 4), value).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_open_json_streams_every_compression(tmp_path):
+    zip_path = tmp_path / "data.zip"
+    document = {"images": [], "annotations": [], "categories": [{"id": 1, "name": "a"}]}
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        zf.writestr("img1.png", png_bytes())
+        zf.writestr("deflated.json", json.dumps(document), zipfile.ZIP_DEFLATED)
+        # read by zipfile rather than from the memory map
+        zf.writestr("lzma.json", json.dumps(document), zipfile.ZIP_LZMA)
+    loader = ZipLoader(str(zip_path))
+    assert sorted(loader.json_names) == ["deflated.json", "lzma.json"]
+    for name in loader.json_names:
+        for _ in range(3):
+            with loader.open_json(name) as stream:
+                assert json.loads(stream.read()) == document
+    # the fallback goes through one handle per thread, owned by the loader
+    assert len(loader._zip_refs) == 1
+
+
+COMPRESSIONS = {
+    "stored": zipfile.ZIP_STORED,
+    "deflated": zipfile.ZIP_DEFLATED,
+    "bzip2": zipfile.ZIP_BZIP2,
+    "lzma": zipfile.ZIP_LZMA,
+}
+
+
+def make_archive(zip_path, compression: int, n: int = 12) -> dict[str, tuple[int, str | None]]:
+    """Images `img{i}.png` of value `5 * i`, with an annotation for even `i`."""
+    expected = {}
+    with zipfile.ZipFile(zip_path, "w", compression) as zf:
+        for i in range(n):
+            zf.writestr(f"img{i}.png", png_bytes(i * 5))
+            annotation = f"{i % 3} 0.5 0.5 0.1 0.1\n" if i % 2 == 0 else None
+            if annotation is not None:
+                zf.writestr(f"img{i}.txt", annotation)
+            expected[f"img{i}.png"] = (i * 5, annotation)
+    return expected
+
+
+def check_item(loader: ZipLoader, index: int, expected: dict[str, tuple[int, str | None]]):
+    item = loader.get_item_by_index(index)
+    value, annotation = expected[item.name]
+    assert item.image.getpixel((1, 1)) == value
+    assert item.annotation == annotation
+    assert loader.read_annotation(index) == annotation
+
+
+@pytest.mark.parametrize("compression", list(COMPRESSIONS))
+def test_round_trip(tmp_path, compression):
+    zip_path = tmp_path / "data.zip"
+    expected = make_archive(zip_path, COMPRESSIONS[compression])
+    loader = ZipLoader(str(zip_path))
+    assert sorted(loader.data_item_name_list) == sorted(expected)
+    for index in range(len(loader)):
+        check_item(loader, index, expected)
+
+    entry = loader._index.images[0]
+    data = loader._read_entry(entry, loader.data_item_name_list[0])
+    if compression == "stored":
+        assert isinstance(data, memoryview) and data.obj is loader._mmap  # not copied
+    # only members the memory map cannot inflate go through zipfile
+    assert len(loader._zip_refs) == (1 if compression == "lzma" else 0)
+
+
+@pytest.mark.parametrize("compression", list(COMPRESSIONS))
+def test_concurrent_reads(tmp_path, compression):
+    zip_path = tmp_path / "data.zip"
+    expected = make_archive(zip_path, COMPRESSIONS[compression], n=40)
+    loader = ZipLoader(str(zip_path))
+    barrier = threading.Barrier(4)
+
+    def read_all(offset: int):
+        barrier.wait()  # all threads read at once
+        for step in range(len(loader)):
+            check_item(loader, (offset + step) % len(loader), expected)
+
+    with ThreadPoolExecutor(4) as executor:
+        for future in [executor.submit(read_all, offset * 10) for offset in range(4)]:
+            future.result()
+    # a handle per reading thread for LZMA, as a ZipFile is not safe to share
+    assert len(loader._zip_refs) == (4 if compression == "lzma" else 0)